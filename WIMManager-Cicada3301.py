@@ -1,22 +1,47 @@
+import time
+
+_START = time.perf_counter()   # точка отсчёта для --startup-timing
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from tkinter import scrolledtext
-import subprocess
-import threading
+from tkinter import scrolledtext, simpledialog
 import os
 import sys
-import urllib.request
-import zipfile
-import tempfile
-import webbrowser
+import threading
+
+from wimcore.backend import (BackendError, select_backend, operation_features, mount_cmd, unmount_cmd,
+                             info_cmd, export_cmd, capture_cmd, apply_cmd, optimize_cmd, split_cmd, join_cmds,
+                             creationflags, DEFAULT_SPLIT_MB)
+from wimcore.compression import (PROFILES, DEFAULT_PROFILE, CompressionError, get_profile,
+                                 benchmark_header, benchmark_profiles)
+from wimcore.wiminfo import (read_wim_info, format_wim_info, read_split_set, split_source,
+                             WimParseError)
+from wimcore import installer
+from wimcore.process import Progress
+from wimcore.tools import ToolRegistry, DISM, WIMLIB
+from wimcore.cache import MetadataCache, app_data_dir
+from wimcore.logsink import LogSink, RotatingLogFile, TextLogView
+from wimcore.uibridge import UiBridge
+# verify, catalog, mounts, update, browser, telemetry и jobs (с asyncio) импортируются
+# в обработчиках, которые ими пользуются, – запуск окна их не ждёт
+from wimcore.settings import daemon_requested, load_settings
 
 APP_TITLE = "WIM Manager v1.0 Cicada3301"
 HEADER_TEXT = "Cicada3301"
 DEFAULT_INDEX = "1"   # индекс по умолчанию
+INFO_TIMEOUT_SEC = 120  # таймаут для информационных команд (индексы, список монтирований)
+
+# --startup-timing (или WIMMANAGER_STARTUP_TIMING=1) печатает в stderr время этапов запуска,
+# --exit-after-startup закрывает окно, как только программа готова к работе (для бенчмарка)
+STARTUP_TIMING = "--startup-timing" in sys.argv or bool(os.environ.get("WIMMANAGER_STARTUP_TIMING"))
+EXIT_AFTER_STARTUP = "--exit-after-startup" in sys.argv
 
 
-def is_windows():
-    return os.name == "nt"
+def startup_mark(stage: str):
+    if STARTUP_TIMING:
+        print(f"[startup] {stage}: {(time.perf_counter() - _START) * 1000:.1f} ms",
+              file=sys.stderr, flush=True)
+
 
 def resource_path(relative_path: str) -> str:
     """
@@ -31,25 +56,13 @@ def resource_path(relative_path: str) -> str:
 
     return os.path.join(base_path, relative_path)
 
-def shutil_which(cmd):
-    try:
-        from shutil import which
-        return which(cmd)
-    except Exception:
-        paths = os.environ.get("PATH", "").split(os.pathsep)
-        for path in paths:
-            full = os.path.join(path, cmd)
-            if os.path.isfile(full):
-                return full
-        return None
-
 
 class WimManagerApp:
     def __init__(self, root: tk.Tk):
         self.root = root
         self.root.title(APP_TITLE)
-        self.root.geometry("900x520")
-        self.root.minsize(880, 520)
+        self.root.geometry("900x620")
+        self.root.minsize(880, 600)
         try:
             icon_file = resource_path("logo.ico")
             # Для дебага можно посмотреть путь:
@@ -65,6 +78,52 @@ class WimManagerApp:
         self.index_var = tk.StringVar(value=DEFAULT_INDEX)
         self.status_var = tk.StringVar(value="Готов к работе")
 
+        # --daemon (WIMMANAGER_DAEMON=1, "daemon": true в settings.json): очередь, инструменты
+        # и кэш – у общей фоновой службы, окно только ставит задания и показывает события
+        self.daemon = None
+        daemon_error = None
+        if daemon_requested(settings=load_settings()):
+            # модули службы импортируются только в этом режиме: обычный запуск их не грузит
+            from wimcore.client import DaemonClient
+            from wimcore.daemon import DaemonError
+            try:
+                self.daemon = DaemonClient.connect(name="gui")
+            except DaemonError as e:
+                daemon_error = e
+
+        if self.daemon:
+            from wimcore.client import RemoteMetadataCache
+            self.meta_cache = RemoteMetadataCache(self.daemon)
+        else:
+            self.meta_cache = MetadataCache()
+        # ранее установленный через программу wimlib сразу попадает в PATH
+        wimlib_dir = installer.installed_wimlib_dir()
+        if wimlib_dir:
+            installer.add_to_path(wimlib_dir)
+        self.install_cancel = None
+        self.verify_cancel = None
+        self.catalog = None      # открывается при первом обращении к окну каталога
+        self._mount_tracker = None   # монтирования, выполненные программой (см. mount_tracker)
+        self.mounts_window = None
+        # пути и версии DISM/wimlib ищутся один раз, а не на каждое нажатие
+        if self.daemon:
+            from wimcore.client import RemoteToolRegistry
+            self.tools = RemoteToolRegistry(self.daemon, on_probed=self.on_tools_probed)
+        else:
+            self.tools = ToolRegistry(on_probed=self.on_tools_probed)
+        # лог: рабочие потоки пишут в очередь, поток Tk выводит её пачками
+        self.log_sink = LogSink(RotatingLogFile(os.path.join(app_data_dir(), "wimmanager.log")))
+        self.line_hooks = []     # колбэки на строки вывода команд (см. add_line_hook)
+        # все обновления окна из рабочих потоков и движка идут пачками через мост
+        self.ui = UiBridge()
+        # телеметрия и локальный планировщик создаются при первом обращении (см. scheduler)
+        self._lazy_lock = threading.Lock()
+        self._telemetry = None
+        self._scheduler = None
+        if self.daemon:
+            from wimcore.client import RemoteScheduler
+            self._scheduler = RemoteScheduler(self.daemon, on_change=self.on_job_change)
+
         self.style = ttk.Style()
         try:
             self.style.theme_use("clam")
@@ -73,15 +132,61 @@ class WimManagerApp:
 
         self.apply_theme()       # настроим стили под тему
         self.build_ui()
-        self.center_window(900, 520)
+        self.center_window(900, 620)
+
+        self.log_view = TextLogView(self.log_text, self.log_sink)
+        self.ui.add_poller(self.log_view.drain)
+        self.ui.schedule(self.root)
 
         self.log("Приложение запущено.")
-        self.detect_tools()
+        if self.daemon:
+            self.log(f"Задания выполняет фоновая служба: {self.daemon.address}")
+        elif daemon_error is not None:
+            self.log(f"Служба заданий недоступна ({daemon_error}), задания выполняются в этом окне.")
+        startup_mark("window-created")
+        self.root.bind("<Map>", self.on_first_map, add="+")
+        self.detect_tools_async()
+
+    @property
+    def telemetry(self):
+        """Время, CPU и ввод-вывод каждой операции – в telemetry.jsonl."""
+        with self._lazy_lock:
+            if self._telemetry is None:
+                from wimcore.telemetry import Telemetry
+                self._telemetry = Telemetry(info_fn=self.meta_cache.get_info)
+            return self._telemetry
+
+    @property
+    def scheduler(self):
+        """Очередь заданий; движок asyncio запускается вместе с первым заданием."""
+        if self._scheduler is None:
+            telemetry = self.telemetry
+            with self._lazy_lock:
+                if self._scheduler is None:
+                    from wimcore.jobs import JobScheduler
+                    self._scheduler = JobScheduler(on_change=self.on_job_change, telemetry=telemetry)
+        return self._scheduler
+
+    @property
+    def mount_tracker(self):
+        with self._lazy_lock:
+            if self._mount_tracker is None:
+                from wimcore.mounts import MountTracker
+                self._mount_tracker = MountTracker()
+            return self._mount_tracker
+
+    def on_job_change(self, job):
+        self.ui.post_latest(("job", job.id), self.refresh_job_row, job)
 
     # -------------------------------------------------------- UI / ТЕМА
 
+    def on_first_map(self, event):
+        if event.widget is self.root:
+            self.root.unbind("<Map>")
+            startup_mark("first-frame")
+
     def center_window(self, width, height):
-        self.root.update_idletasks()
+        # размеры экрана известны и без update_idletasks
         sw = self.root.winfo_screenwidth()
         sh = self.root.winfo_screenheight()
         x = (sw - width) // 2
@@ -162,7 +267,7 @@ class WimManagerApp:
         backend_cb = ttk.Combobox(
             top_frame,
             width=12,
-            values=["dism", "wimlib"],
+            values=["auto", "dism", "wimlib"],
             textvariable=self.backend_var,
             state="readonly"
         )
@@ -195,8 +300,12 @@ class WimManagerApp:
         ttk.Label(main_frame, text="WIM-файл:").grid(row=0, column=0, sticky="w", pady=5, padx=(0, 8))
         wim_entry = ttk.Entry(main_frame, textvariable=self.wim_path_var, style="Path.TEntry")
         wim_entry.grid(row=0, column=1, sticky="ew", pady=5)
-        ttk.Button(main_frame, text="Выбрать", style="Secondary.TButton",
-                   command=self.choose_wim).grid(row=0, column=2, sticky="w", padx=(8, 0), pady=5)
+        wim_buttons = ttk.Frame(main_frame)
+        wim_buttons.grid(row=0, column=2, sticky="w", padx=(8, 0), pady=5)
+        ttk.Button(wim_buttons, text="Выбрать", style="Secondary.TButton",
+                   command=self.choose_wim).grid(row=0, column=0, sticky="w")
+        ttk.Button(wim_buttons, text="Каталог", style="Secondary.TButton",
+                   command=self.open_catalog).grid(row=0, column=1, sticky="w", padx=(6, 0))
 
         # Mount dir
         ttk.Label(main_frame, text="Папка монтирования:").grid(row=1, column=0, sticky="w", pady=5,
@@ -209,8 +318,12 @@ class WimManagerApp:
         # Index
         ttk.Label(main_frame, text="Индекс образа:").grid(row=2, column=0, sticky="w",
                                                           pady=5, padx=(0, 8))
-        idx_entry = ttk.Entry(main_frame, textvariable=self.index_var, width=6)
-        idx_entry.grid(row=2, column=1, sticky="w", pady=5)
+        idx_frame = ttk.Frame(main_frame)
+        idx_frame.grid(row=2, column=1, sticky="w", pady=5)
+        idx_entry = ttk.Entry(idx_frame, textvariable=self.index_var, width=6)
+        idx_entry.grid(row=0, column=0, sticky="w")
+        ttk.Button(idx_frame, text="Обзор образа", style="Secondary.TButton",
+                   command=self.browse_image).grid(row=0, column=1, sticky="w", padx=(8, 0))
 
         ttk.Button(main_frame, text="Показать индексы WIM",
                    style="Secondary.TButton",
@@ -233,6 +346,15 @@ class WimManagerApp:
         ttk.Button(btn_frame, text="Смонтированные WIM", style="Secondary.TButton",
                    command=self.show_mounted_wim).grid(row=0, column=3, padx=8)
 
+        ttk.Button(btn_frame, text="Без монтирования...", style="Secondary.TButton",
+                   command=self.open_service_dialog).grid(row=0, column=4, padx=8)
+
+        ttk.Button(btn_frame, text="Проверить", style="Secondary.TButton",
+                   command=self.verify_wim).grid(row=0, column=5, padx=8)
+
+        ttk.Button(btn_frame, text="Экспорт / захват / сжатие...", style="Secondary.TButton",
+                   command=self.open_imaging_dialog).grid(row=1, column=0, columnspan=6, pady=(8, 0))
+
         # Прогресс
         self.progress = ttk.Progressbar(main_frame, mode="indeterminate",
                                         style="Horizontal.TProgressbar")
@@ -242,10 +364,27 @@ class WimManagerApp:
         status_label = ttk.Label(main_frame, textvariable=self.status_var, anchor="w")
         status_label.grid(row=5, column=0, columnspan=3, sticky="w", pady=(0, 5))
 
+        # Очередь заданий
+        jobs_frame = ttk.Frame(main_frame)
+        jobs_frame.grid(row=6, column=0, columnspan=3, sticky="ew", pady=(5, 0))
+        jobs_frame.columnconfigure(0, weight=1)
+
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=("name", "state"), show="headings", height=3)
+        self.jobs_tree.heading("name", text="Задание")
+        self.jobs_tree.heading("state", text="Состояние")
+        self.jobs_tree.column("name", stretch=True)
+        self.jobs_tree.column("state", width=120, stretch=False)
+        self.jobs_tree.grid(row=0, column=0, sticky="ew")
+
+        ttk.Button(jobs_frame, text="Отменить", style="Secondary.TButton",
+                   command=self.cancel_selected_job).grid(row=0, column=1, sticky="n", padx=(8, 0))
+        ttk.Button(jobs_frame, text="Статистика", style="Secondary.TButton",
+                   command=lambda: StatsWindow(self)).grid(row=0, column=2, sticky="n", padx=(8, 0))
+
         # Лог
         log_frame = ttk.Frame(main_frame)
-        log_frame.grid(row=6, column=0, columnspan=3, sticky="nsew", pady=(5, 0))
-        main_frame.rowconfigure(6, weight=1)
+        log_frame.grid(row=7, column=0, columnspan=3, sticky="nsew", pady=(5, 0))
+        main_frame.rowconfigure(7, weight=1)
 
         self.log_text = scrolledtext.ScrolledText(log_frame, wrap="word", height=10)
         self.log_text.pack(fill="both", expand=True)
@@ -255,14 +394,28 @@ class WimManagerApp:
     # -------------------------------------------------------- ВСПОМОГАТЕЛЬНОЕ
 
     def log(self, text: str):
-        self.log_text.configure(state="normal")
-        self.log_text.insert("end", text + "\n")
-        self.log_text.see("end")
-        self.log_text.configure(state="disabled")
+        # можно вызывать из любого потока – виджет обновит TextLogView
+        self.log_sink.write(text)
+
+    def detect_tools_async(self):
+        """Поиск DISM/wimlib в фоне, чтобы окно появилось сразу."""
+        self.status_var.set("Поиск DISM и wimlib-imagex...")
+
+        def worker():
+            self.tools.tools()      # просмотр PATH
+            self.ui.post(self.on_tools_detected)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_tools_detected(self):
+        self.detect_tools()
+        startup_mark("interactive")
+        if EXIT_AFTER_STARTUP:
+            self.root.after_idle(self.root.destroy)
 
     def detect_tools(self):
-        dism = shutil_which("dism.exe") if is_windows() else None
-        wimlib = shutil_which("wimlib-imagex.exe") or shutil_which("wimlib-imagex")
+        dism = self.tools.path(DISM)
+        wimlib = self.tools.path(WIMLIB)
 
         msg_parts = []
         if dism:
@@ -276,28 +429,23 @@ class WimManagerApp:
             msg_parts.append("wimlib-imagex не найден")
 
         self.log(" / ".join(msg_parts))
-        self.log("Для обновления статуса можно перезапустить программу после установки.")
-
-    def get_backend(self):
-        mode = self.backend_var.get()
-        dism = shutil_which("dism.exe") if is_windows() else None
-        wimlib = shutil_which("wimlib-imagex.exe") or shutil_which("wimlib-imagex")
-
-        if mode == "dism":
-            if not dism:
-                raise RuntimeError("DISM не найден. Выберите другой бэкенд или добавьте DISM в PATH.")
-            return "dism"
-        if mode == "wimlib":
-            if not wimlib:
-                raise RuntimeError("wimlib-imagex не найден. Установите его или выберите другой бэкенд.")
-            return "wimlib"
-
-        # auto
-        if wimlib:
-            return "wimlib"
-        if dism:
-            return "dism"
-        raise RuntimeError("Не найден ни DISM, ни wimlib-imagex.")
+        self.status_var.set(" / ".join(msg_parts))
+        self.tools.start_probe()
+
+    def on_tools_probed(self, registry):
+        # вызывается из фонового потока
+        for name, row in registry.capability_matrix().items():
+            if not row["available"]:
+                continue
+            features = ", ".join(f for f, ok in row.items()
+                                 if f not in ("available", "version", "path", "probed") and ok)
+            self.log(f"{registry.get(name).describe()}" + (f" [{features}]" if features else ""))
+
+    def get_backend(self, operation=None, profile=None):
+        """Бэкенд и ToolInfo выбранного инструмента с учётом возможностей, нужных операции."""
+        needs = operation_features(operation, profile) if operation else None
+        backend = select_backend(self.backend_var.get(), registry=self.tools, needs=needs)
+        return backend, self.tools.get(backend)
 
     # -------------------------------------------------------- УСТАНОВКА
 
@@ -307,65 +455,78 @@ class WimManagerApp:
             "DISM",
             "DISM входит в состав Windows ADK.\nСейчас откроется страница загрузки ADK."
         )
+        import webbrowser
         webbrowser.open("https://learn.microsoft.com/en-us/windows-hardware/get-started/adk-install")
 
     def install_wimlib(self):
+        if self.install_cancel is not None:
+            messagebox.showinfo("wimlib-imagex", "Установка уже выполняется.")
+            return
         self.log("Попытка установить wimlib-imagex...")
+        self.start_progress("Установка wimlib-imagex...")
+        self.install_cancel = threading.Event()
 
-        try:
-            url = "https://wimlib.net/downloads/wimlib-1.14.4-windows-x86_64-bin.zip"
-            tmp_zip = os.path.join(tempfile.gettempdir(), "wimlib-imagex.zip")
-
-            self.log(f"Скачивание {url} -> {tmp_zip}")
-            urllib.request.urlretrieve(url, tmp_zip)
-
-            target_dir = os.path.join(os.getcwd(), "wimlib")
-            os.makedirs(target_dir, exist_ok=True)
+        def on_progress(progress):
+            self.ui.post_latest("progress", self.set_progress, "Скачивание wimlib", progress)
 
-            self.log(f"Распаковка в {target_dir}")
-            with zipfile.ZipFile(tmp_zip, "r") as z:
-                z.extractall(target_dir)
-
-            # ищем бинарник
-            bin_path = None
-            for root_dir, dirs, files in os.walk(target_dir):
-                if "wimlib-imagex.exe" in files:
-                    bin_path = root_dir
-                    break
+        def worker():
+            try:
+                bin_path = installer.install_wimlib(
+                    on_progress=on_progress,
+                    on_log=self.log,
+                    cancel_event=self.install_cancel,
+                )
+                error = None
+            except Exception as e:
+                bin_path, error = None, e
+            self.ui.post(self.on_wimlib_installed, bin_path, error)
 
-            if not bin_path:
-                messagebox.showerror("Ошибка", "Не удалось найти wimlib-imagex после распаковки.")
-                self.log("wimlib-imagex.exe не найден после распаковки.")
-                return
+        threading.Thread(target=worker, daemon=True).start()
 
-            # добавляем в PATH для текущего процесса
-            os.environ["PATH"] = bin_path + os.pathsep + os.environ.get("PATH", "")
-            self.log(f"wimlib-imagex найден в: {bin_path}")
-            self.log("Путь добавлен во временный PATH текущего процесса.")
+    def on_wimlib_installed(self, bin_path, error):
+        self.install_cancel = None
+        if error is not None:
+            self.stop_progress("Ошибка установки wimlib")
+            messagebox.showerror("Ошибка установки wimlib", str(error))
+            self.log(f"Ошибка при установке wimlib: {error}")
+            return
 
-            messagebox.showinfo(
-                "wimlib-imagex",
-                f"wimlib-imagex установлен в:\n{bin_path}\n\n"
-                f"В этом запуске программы уже можно выбрать бэкенд 'wimlib'."
-            )
+        self.stop_progress("wimlib-imagex установлен")
+        self.log(f"wimlib-imagex найден в: {bin_path}")
+        self.log("Путь добавлен в PATH и будет использоваться при следующих запусках.")
 
-            # обновим детект
-            self.detect_tools()
+        messagebox.showinfo(
+            "wimlib-imagex",
+            f"wimlib-imagex установлен в:\n{bin_path}\n\n"
+            f"В этом запуске программы уже можно выбрать бэкенд 'wimlib'."
+        )
 
-        except Exception as e:
-            messagebox.showerror("Ошибка установки wimlib", str(e))
-            self.log(f"Ошибка при установке wimlib: {e}")
+        # обновим детект
+        self.tools.invalidate()
+        self.detect_tools()
 
     # -------------------------------------------------------- ОБРАБОТЧИКИ
 
     def choose_wim(self):
         filename = filedialog.askopenfilename(
             title="Выбрать WIM-файл",
-            filetypes=[("WIM файлы", "*.wim"), ("Все файлы", "*.*")]
+            filetypes=[("WIM / ESD / SWM", "*.wim *.esd *.swm"), ("Разделённый WIM", "*.swm"),
+                       ("Все файлы", "*.*")]
         )
         if filename:
             self.wim_path_var.set(filename)
 
+    def open_catalog(self):
+        if self.catalog is None:
+            import sqlite3
+            from wimcore.catalog import Catalog
+            try:
+                self.catalog = Catalog()
+            except sqlite3.Error as e:
+                messagebox.showerror("Каталог", f"Не удалось открыть базу каталога:\n{e}")
+                return
+        CatalogWindow(self, self.catalog)
+
     def choose_mount_dir(self):
         dirname = filedialog.askdirectory(title="Выбрать папку для монтирования")
         if dirname:
@@ -383,26 +544,40 @@ class WimManagerApp:
             messagebox.showwarning("Внимание", "Выберите существующую папку монтирования.")
             return
 
+        # часть .swm: монтируем первую часть с остальными через --ref / /SWMFile, только чтение
         try:
-            backend = self.get_backend()
-        except RuntimeError as e:
+            wim, ref = split_source(wim)
+        except WimParseError as e:
+            messagebox.showerror("Разделённый WIM", str(e))
+            return
+        if ref:
+            self.log(f"Разделённый WIM: {wim} + {ref}, монтирование только для чтения.")
+
+        # Проверяем индекс по метаданным (кэш/встроенный парсер) до запуска бэкенда
+        info = self.get_wim_info(wim)
+        if info is not None and info.images and index.isdigit() \
+                and int(index) not in {img.index for img in info.images}:
+            messagebox.showwarning("Внимание", f"В WIM нет образа с индексом {index}.")
+            return
+
+        try:
+            backend, tool = self.get_backend("mount")
+            cmd = mount_cmd(backend, wim, index, mount_dir, ref=ref, tool=tool)
+        except BackendError as e:
             messagebox.showerror("Ошибка", str(e))
             return
 
-        if backend == "dism":
-            if not is_windows():
-                messagebox.showerror("Ошибка", "DISM поддерживается только в Windows.")
-                return
-            cmd = [
-                "dism", "/English", "/Mount-Wim",
-                f"/WimFile:{wim}",
-                f"/index:{index}",
-                f"/MountDir:{mount_dir}",
-            ]
-        else:  # wimlib
-            cmd = ["wimlib-imagex", "mount", wim, index, mount_dir]
+        from wimcore.jobs import mount_lock, wim_lock
+        from wimcore.mounts import MountRecord
+        record = MountRecord(os.path.abspath(mount_dir), os.path.abspath(wim),
+                             int(index) if index.isdigit() else 0, read_write=not ref, backend=backend)
+
+        def on_success(_output):
+            self.mount_tracker.add(record)
+            self.refresh_mounts()
 
-        self.run_command_async(cmd, f"Монтирование ({backend})")
+        self.run_command_async(cmd, f"Монтирование ({backend})", backend=backend,
+                               locks=(wim_lock(wim), mount_lock(mount_dir)), on_success=on_success)
 
     def unmount_wim(self, discard=False):
         mount_dir = self.mount_path_var.get().strip()
@@ -410,37 +585,63 @@ class WimManagerApp:
             messagebox.showwarning("Внимание", "Выберите корректную папку монтирования.")
             return
 
+        from wimcore.jobs import mount_lock
+        from wimcore.mounts import MountRecord
+        # монтирование только для чтения (в том числе .swm) DISM сохранить не даст
+        key = MountRecord(os.path.abspath(mount_dir)).key
+        if any(r.key == key and not r.read_write for r in self.mount_tracker.records()):
+            discard = True
+
         try:
-            backend = self.get_backend()
-        except RuntimeError as e:
+            backend, _tool = self.get_backend()
+            cmd = unmount_cmd(backend, mount_dir, discard=discard)
+        except BackendError as e:
             messagebox.showerror("Ошибка", str(e))
             return
 
-        if backend == "dism":
-            if not is_windows():
-                messagebox.showerror("Ошибка", "DISM поддерживается только в Windows.")
-                return
-            cmd = [
-                "dism", "/English", "/Unmount-Wim",
-                f"/MountDir:{mount_dir}",
-                "/Discard" if discard else "/Commit",
-            ]
-        else:
-            cmd = ["wimlib-imagex", "unmount", mount_dir]
-            if not discard:
-                cmd.append("--commit")
+        def on_success(_output):
+            self.mount_tracker.remove(os.path.abspath(mount_dir))
+            self.refresh_mounts()
 
         suffix = "Discard" if discard else "Commit"
-        self.run_command_async(cmd, f"Размонтирование ({backend}, {suffix})")
+        self.run_command_async(cmd, f"Размонтирование ({backend}, {suffix})", backend=backend,
+                               locks=(mount_lock(mount_dir),), on_success=on_success)
 
     def show_mounted_wim(self):
-        # Определяем через DISM – он есть почти в любой Windows
-        if not is_windows() or not shutil_which("dism.exe"):
-            messagebox.showerror("Ошибка", "DISM недоступен, невозможно прочитать список смонтированных WIM.")
+        # DISM (Windows) и FUSE-монтирования wimlib; окно само опрашивает список в фоне
+        if self.mounts_window is not None:
+            self.mounts_window.win.lift()
+            self.mounts_window.monitor.refresh()
             return
-
-        cmd = ["dism", "/English", "/Get-MountedWimInfo"]
-        self.run_command_async(cmd, "Список смонтированных WIM", show_message=False)
+        self.mounts_window = MountsWindow(self)
+
+    def refresh_mounts(self):
+        """Можно вызывать из любого потока: внеочередной опрос, если окно монтирований открыто."""
+        window = self.mounts_window
+        if window is not None:
+            window.monitor.refresh()
+
+    def repair_mounts(self, records):
+        """Пакет восстановления: команды DISM идут через очередь по одной, записи журнала удаляются сразу."""
+        from wimcore.jobs import mount_lock
+        from wimcore.mounts import plan_repairs
+        actions = plan_repairs(records)
+        if not actions:
+            messagebox.showinfo("Монтирования", "Проблемных монтирований нет.")
+            return
+        if not messagebox.askyesno("Монтирования", "Будут выполнены действия:\n\n" +
+                                   "\n".join(a.title for a in actions) + "\n\nПродолжить?"):
+            return
+        for action in actions:
+            if action.cmd is None:
+                self.mount_tracker.remove(action.mount_dir)
+                self.log(action.title)
+                continue
+            locks = (mount_lock(action.mount_dir),) if action.mount_dir else ()
+            self.run_command_async(action.cmd, action.title, show_message=False, backend=action.backend,
+                                   locks=locks, timeout=INFO_TIMEOUT_SEC,
+                                   on_finished=lambda job: self.refresh_mounts())
+        self.refresh_mounts()
 
     def show_wim_indexes(self):
         wim = self.wim_path_var.get().strip()
@@ -448,60 +649,380 @@ class WimManagerApp:
             messagebox.showwarning("Внимание", "Сначала выберите WIM-файл.")
             return
 
+        # у набора .swm образы описывает первая часть
+        try:
+            wim = split_source(wim)[0]
+        except WimParseError as e:
+            self.log(str(e))
+
+        info = self.get_wim_info(wim)
+        if info is not None:
+            self.log(f">>> Индексы WIM (встроенный парсер): {wim}")
+            self.log(format_wim_info(info))
+            self.status_var.set(f"Индексов в WIM: {len(info.images)}")
+            return
+
         # Для списка индексов пробуем выбранный бэкенд, а если не получится – DISM.
         try:
-            backend = self.get_backend()
-        except RuntimeError:
+            backend, _tool = self.get_backend()
+        except BackendError:
             backend = "dism"
 
-        if backend == "wimlib" and shutil_which("wimlib-imagex"):
-            cmd = ["wimlib-imagex", "info", wim]
+        if backend == "wimlib" and self.tools.path(WIMLIB):
+            backend = "wimlib"
             title = "Индексы WIM (wimlib)"
         else:
-            if not is_windows() or not shutil_which("dism.exe"):
+            if not self.tools.path(DISM):
                 messagebox.showerror("Ошибка", "Нет ни wimlib-imagex, ни DISM для показа индексов.")
                 return
-            cmd = ["dism", "/English", "/Get-WimInfo", f"/WimFile:{wim}"]
+            backend = "dism"
             title = "Индексы WIM (DISM)"
+        cmd = info_cmd(backend, wim)
+
+        cached = self.meta_cache.get_output(wim, backend)
+        self.log(self.meta_cache.stats_text())
+        if cached is not None:
+            self.log(f">>> {title} (из кэша): {wim}")
+            self.log(cached.strip() or "<пустой вывод>")
+            return
+
+        self.run_command_async(
+            cmd, title, show_message=False, backend=backend, timeout=INFO_TIMEOUT_SEC,
+            on_success=lambda output: self.meta_cache.put_output(wim, backend, output)
+        )
+
+    def get_wim_info(self, wim):
+        """
+        Метаданные WIM из кэша или встроенного парсера; None, если файл разобрать не удалось.
+        """
+        info = self.meta_cache.get_info(wim)
+        if info is not None:
+            self.log(self.meta_cache.stats_text())
+            return info
+
+        # Читаем заголовок и XML сами – это мгновенно и не требует DISM/wimlib
+        try:
+            info = read_wim_info(wim)
+        except WimParseError as e:
+            self.log(f"Встроенный парсер не смог прочитать WIM ({e}), используем внешний инструмент.")
+            return None
+
+        self.meta_cache.put_info(wim, info)
+        self.log(self.meta_cache.stats_text())
+        return info
+
+    def verify_wim(self):
+        """Проверка SHA-1 на всех ядрах; повторное нажатие прерывает её (с сохранением места)."""
+        if self.verify_cancel is not None:
+            if messagebox.askyesno("Проверка", "Прервать проверку? Её можно будет продолжить позже."):
+                self.verify_cancel.set()
+            return
+        wim = self.wim_path_var.get().strip()
+        if not wim or not os.path.isfile(wim):
+            messagebox.showerror("Ошибка", "Укажите существующий WIM-файл.")
+            return
+
+        self.log(f"Проверка целостности: {wim}")
+        self.start_progress("Проверка целостности...")
+        self.verify_cancel = threading.Event()
+        started = time.monotonic()
+
+        def on_progress(done, total):
+            elapsed = time.monotonic() - started
+            rate = done / elapsed if elapsed > 0 else 0.0
+            progress = Progress(percent=done * 100.0 / total if total else 100.0,
+                                done_bytes=done, total_bytes=total, rate=rate,
+                                eta=(total - done) / rate if rate else None)
+            self.ui.post_latest("progress", self.set_progress, "Проверка", progress)
+
+        def worker():
+            from wimcore import verify
+            try:
+                report, error = verify.verify_wim(wim, on_progress=on_progress,
+                                                  cancel_event=self.verify_cancel), None
+            except (OSError, ValueError, WimParseError) as e:
+                report, error = None, e
+            self.ui.post(self.on_wim_verified, wim, report, error)
+
+        threading.Thread(target=worker, daemon=True).start()
 
-        self.run_command_async(cmd, title, show_message=False)
+    def on_wim_verified(self, wim, report, error):
+        self.verify_cancel = None
+        if error is not None:
+            self.stop_progress("Ошибка проверки")
+            self.log(f"Ошибка проверки {wim}: {error}")
+            messagebox.showerror("Проверка", str(error))
+            return
+        text = report.describe()
+        self.log(text)
+        if report.cancelled:
+            self.stop_progress("Проверка прервана")
+            messagebox.showinfo("Проверка", text)
+        elif report.unverified and not report.corrupt:
+            self.stop_progress("Целостность не подтверждена")
+            messagebox.showwarning("Проверка", text)
+        elif not report.ok:
+            self.stop_progress("Найдены повреждения")
+            messagebox.showerror("Проверка", text)
+        else:
+            self.stop_progress(f"Проверка пройдена ({report.throughput:.0f} МБ/с)")
+            messagebox.showinfo("Проверка", text)
+
+    def open_imaging_dialog(self):
+        ImagingDialog(self)
+
+    def run_imaging(self, operation, source, index, dest, name, profile, check, part_mb=DEFAULT_SPLIT_MB):
+        """export / capture / apply / optimize / split / join через выбранный бэкенд."""
+        from wimcore.jobs import CANCELLED, path_lock, wim_lock
+        ref = None
+        if operation in ("export", "apply", "join"):
+            try:
+                source, ref = split_source(source)
+            except WimParseError as e:
+                messagebox.showerror("Разделённый WIM", str(e))
+                return False
+        cmds = None
+        append = operation == "capture" and os.path.isfile(dest)
+        if append:
+            profile = None
+        try:
+            backend, tool = self.get_backend(operation, profile)
+            if operation == "export":
+                cmd = export_cmd(backend, source, index, dest, profile=profile, name=name or None, check=check,
+                                 ref=ref, tool=tool)
+                locks = (wim_lock(dest),)
+            elif operation == "capture":
+                cmd = capture_cmd(backend, source, dest, name, profile=profile, append=append, check=check,
+                                  tool=tool)
+                locks = (wim_lock(dest),)
+            elif operation == "apply":
+                cmd = apply_cmd(backend, source, index, dest, check=check, ref=ref, tool=tool)
+                locks = (path_lock("dir", dest),)
+            elif operation == "split":
+                cmd = split_cmd(backend, source, dest, part_mb, check=check, tool=tool)
+                locks = (wim_lock(source), wim_lock(dest))
+            elif operation == "join":
+                if ref is None:
+                    raise BackendError(f"{source} – не часть разделённого WIM.")
+                info = self.get_wim_info(source)
+                indexes = [img.index for img in info.images] if info is not None else []
+                cmds = join_cmds(backend, read_split_set(source).paths(), dest, indexes=indexes, check=check,
+                                 tool=tool)
+                locks = (wim_lock(dest),)
+            else:
+                cmd = optimize_cmd(backend, source, profile=profile, check=check, tool=tool)
+                locks = (wim_lock(source),)
+        except BackendError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return False
+        titles = {"export": "Экспорт", "capture": "Захват", "apply": "Развёртывание", "optimize": "Оптимизация",
+                  "split": "Разбиение на .swm", "join": "Сборка .swm"}
+        # у DISM сборка – экспорт образов по одному: следующая команда ставится только после
+        # успеха предыдущей, после ошибки остальные не запускаются
+        cmds = cmds or [cmd]
+        title = f"{titles[operation]} ({backend})"
+
+        def submit(i):
+            last = i == len(cmds) - 1
+
+            def on_finished(job):
+                if job.success or last or job.state == CANCELLED:
+                    return
+                self.log(f"{title}: шаг {i + 1} из {len(cmds)} завершился с ошибкой, "
+                         f"остальные {len(cmds) - i - 1} не запускались.")
+                self.ui.post(messagebox.showerror, "Ошибка",
+                             f"{title}: шаг {i + 1} из {len(cmds)} завершился с ошибкой "
+                             f"(код {job.code}).\nОстальные шаги не выполнялись, подробности – в логе.")
+
+            self.run_command_async(cmds[i], title, backend=backend, locks=locks, show_message=last,
+                                   on_success=None if last else lambda _output: self.ui.post(submit, i + 1),
+                                   on_finished=on_finished)
+
+        submit(0)
+        return True
+
+    def benchmark_compression(self, wim, index, threads=None, chunk_size=None):
+        if not self.tools.path(WIMLIB):
+            messagebox.showerror("Ошибка", "Для сравнения профилей сжатия нужен wimlib-imagex.")
+            return
+        self.log(f">>> Сравнение профилей сжатия: {wim}, индекс {index}")
+        self.log(benchmark_header())
+        self.start_progress("Сравнение профилей сжатия...")
+
+        def worker():
+            try:
+                results = benchmark_profiles(wim, index, threads=threads, chunk_size=chunk_size,
+                                             on_result=lambda r: self.log(r.describe()))
+                best = min((r for r in results if r.ok), key=lambda r: r.wall * r.output_size, default=None)
+                if best is not None:
+                    self.log(f"Лучший баланс время × размер: {best.profile.describe()}")
+                status = "Сравнение профилей завершено"
+            except (OSError, CompressionError) as e:
+                self.log(f"Ошибка сравнения профилей: {e}")
+                status = "Ошибка сравнения профилей"
+            self.ui.post(self.stop_progress, status)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def open_service_dialog(self):
+        wim = self.wim_path_var.get().strip()
+        if not wim or not os.path.isfile(wim):
+            messagebox.showwarning("Внимание", "Сначала выберите WIM-файл.")
+            return
+        if not self.tools.path(WIMLIB):
+            messagebox.showerror("Ошибка", "Для обслуживания без монтирования нужен wimlib-imagex.")
+            return
+        ServiceDialog(self, wim)
+
+    def browse_image(self):
+        wim = self.wim_path_var.get().strip()
+        index = self.index_var.get().strip() or DEFAULT_INDEX
+        if not wim or not os.path.isfile(wim):
+            messagebox.showwarning("Внимание", "Сначала выберите WIM-файл.")
+            return
+        if not index.isdigit():
+            messagebox.showwarning("Внимание", "Индекс образа должен быть числом.")
+            return
+
+        from wimcore.browser import DirListingParser, dir_cmd, load_cached_index, store_cached_index
+        info = self.get_wim_info(wim)
+        guid = info.guid if info is not None else ""
+        cached = load_cached_index(wim, guid, index)
+        if cached is not None:
+            self.log(f"Дерево образа {os.path.basename(wim)}:{index} взято из кэша ({len(cached)} элементов).")
+            BrowserWindow(self, wim, index, cached)
+            return
+
+        if not self.tools.path(WIMLIB):
+            messagebox.showerror("Ошибка", "Для просмотра образа без монтирования нужен wimlib-imagex.")
+            return
+
+        parser = DirListingParser()
+
+        def on_success(_output):
+            started = time.perf_counter()
+            tree = parser.finish()
+            store_cached_index(wim, guid, index, tree)
+            self.log(f"Индекс дерева: {len(tree)} элементов, построен за {time.perf_counter() - started:.2f} с.")
+            self.ui.post(BrowserWindow, self, wim, index, tree)
+
+        # вывод dir --detailed огромный – в лог его не пишем, только в парсер
+        self.run_command_async(dir_cmd(wim, index), f"Чтение дерева образа (индекс {index})",
+                               show_message=False, backend="wimlib", log_output=False,
+                               on_line=parser.feed, on_success=on_success)
+
+    def apply_update_batch(self, wim, batch, indexes):
+        """Один вызов wimlib-imagex update на индекс; индексы одного WIM идут по очереди."""
+        from wimcore.jobs import wim_lock
+        from wimcore.update import update_cmd
+        cmd_file = batch.write_command_file()
+        self.log(f">>> Командный файл wimlib update ({cmd_file}):")
+        self.log(batch.render().rstrip())
+        remaining = [len(indexes)]
+
+        def on_finished(job):
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                try:
+                    os.remove(cmd_file)
+                except OSError:
+                    pass
+
+        for index in indexes:
+            self.run_command_async(
+                update_cmd(wim, index),
+                f"Обновление индекса {index} (wimlib)",
+                show_message=(index == indexes[-1]),
+                backend="wimlib",
+                locks=(wim_lock(wim),),
+                stdin_path=cmd_file,
+                on_finished=on_finished,
+            )
 
     # -------------------------------------------------------- ВЫПОЛНЕНИЕ КОМАНД
 
     def start_progress(self, text):
         self.status_var.set(text)
+        self.progress.configure(mode="indeterminate", value=0)
         self.progress.start(10)
 
     def stop_progress(self, text="Готово"):
-        self.progress.stop()
         self.status_var.set(text)
+        if self._scheduler is not None:
+            from wimcore.jobs import RUNNING
+            if any(job.state == RUNNING for job in self._scheduler.jobs()):
+                return
+        self.progress.stop()
+        self.progress.configure(mode="indeterminate", value=0)
+
+    def set_progress(self, action_name, progress):
+        # первая строка прогресса переключает полосу в определённый режим
+        if str(self.progress.cget("mode")) != "determinate":
+            self.progress.stop()
+            self.progress.configure(mode="determinate", maximum=100)
+        self.progress.configure(value=progress.percent)
+        self.status_var.set(f"{action_name}: {progress.describe()}")
+
+    def refresh_job_row(self, job):
+        from wimcore.jobs import STATE_TITLES
+        iid = str(job.id)
+        values = (job.name, STATE_TITLES.get(job.state, job.state))
+        if self.jobs_tree.exists(iid):
+            self.jobs_tree.item(iid, values=values)
+        else:
+            self.jobs_tree.insert("", "end", iid=iid, values=values)
+            self.jobs_tree.see(iid)
 
-    def run_command_async(self, cmd, action_name, show_message=True):
+    def cancel_selected_job(self):
+        selected = self.jobs_tree.selection()
+        if not selected:
+            messagebox.showinfo("Очередь", "Выберите задание для отмены.")
+            return
+        for iid in selected:
+            if self.scheduler.cancel(int(iid)):
+                self.log(f"Отмена задания #{iid}...")
+
+    def add_line_hook(self, callback):
+        """Колбэк, вызываемый (в рабочем потоке) для каждой строки вывода любой команды."""
+        self.line_hooks.append(callback)
+
+    def run_command_async(self, cmd, action_name, show_message=True, on_success=None, on_line=None,
+                          backend="", locks=(), timeout=None, stdin_path=None, on_finished=None,
+                          log_output=True):
+        """
+        Ставит команду в очередь планировщика. Команды с общими блокировками
+        (папка монтирования, WIM-файл) выполняются строго по очереди.
+        on_finished(job) вызывается в рабочем потоке после любого завершения.
+        """
+        from wimcore.jobs import CANCELLED, STATE_TITLES, TIMEOUT, Job
         self.start_progress(f"{action_name}...")
 
-        def worker():
-            try:
-                creationflags = 0
-                if is_windows():
-                    creationflags = subprocess.CREATE_NO_WINDOW  # type: ignore
-
-                self.log(f">>> {action_name}: {' '.join(cmd)}")
-                result = subprocess.run(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    creationflags=creationflags
-                )
-                code = result.returncode
-                output = result.stdout
-                self.log(output.strip() or "<пустой вывод>")
-                success = (code == 0)
-            except Exception as e:
-                code = None
-                output = str(e)
+        def on_progress(progress):
+            # мост схлопывает частые строки прогресса до одной за такт
+            self.ui.post_latest("progress", self.set_progress, action_name, progress)
+
+        callbacks = ([self.log] if log_output else []) + list(self.line_hooks)
+        if on_line is not None:
+            callbacks.append(on_line)
+
+        def on_done(job):
+            code = job.code
+            output = job.output
+            success = job.success
+            if job.error is not None:
                 self.log(f"Исключение: {output}")
-                success = False
+            elif job.state == CANCELLED:
+                self.log(f"{action_name}: отменено.")
+            elif job.state == TIMEOUT:
+                self.log(f"{action_name}: превышено время ожидания ({job.timeout} с).")
+            elif not output.strip() and log_output:
+                self.log("<пустой вывод>")
+            if job.started_at is not None:
+                self.log(f"{action_name}: {job.finished_at - job.started_at:.1f} с")
+            if success and on_success is not None:
+                on_success(output)
+            if on_finished is not None:
+                on_finished(job)
 
             def on_complete():
                 if code == 740:
@@ -517,25 +1038,768 @@ class WimManagerApp:
                     self.stop_progress(f"{action_name} завершено")
                     if show_message:
                         messagebox.showinfo("Готово", f"{action_name} успешно завершено.")
+                elif job.state in (CANCELLED, TIMEOUT):
+                    self.stop_progress(f"{action_name}: {STATE_TITLES[job.state]}")
                 else:
                     self.stop_progress(f"{action_name} завершилось с ошибкой")
                     if show_message:
+                        tail = "\n".join(output.splitlines()[-20:])
                         messagebox.showerror(
                             "Ошибка",
                             f"{action_name} завершилось с ошибкой.\n"
-                            f"Код: {code}\n\n{output}"
+                            f"Код: {code}\n\n{tail}"
                         )
 
-            self.root.after(0, on_complete)
+            self.ui.post(on_complete)
+
+        self.log(f">>> {action_name}: {' '.join(cmd)}")
+        return self.scheduler.submit(Job(
+            action_name, cmd,
+            backend=backend,
+            locks=locks,
+            timeout=timeout,
+            on_line=callbacks,
+            on_progress=on_progress,
+            on_done=on_done,
+            creationflags=creationflags(),
+            stdin_path=stdin_path,
+        ))
+
+
+class ImagingDialog:
+    """Экспорт, захват, развёртывание, оптимизация и разбиение/сборка .swm с настройками сжатия wimlib."""
+
+    OPERATIONS = (("export", "Экспорт образа"), ("capture", "Захват папки"),
+                  ("apply", "Развёртывание"), ("optimize", "Оптимизация WIM"),
+                  ("split", "Разбить на .swm"), ("join", "Собрать .swm"))
+    CHUNK_SIZES = ("", "4K", "16K", "32K", "64K", "128K", "256K", "1M", "2M", "64M")
+
+    def __init__(self, app: WimManagerApp):
+        self.app = app
+        self.win = tk.Toplevel(app.root)
+        self.win.title("Экспорт / захват / сжатие")
+        self.win.geometry("760x360")
+        self.win.transient(app.root)
+
+        frame = ttk.Frame(self.win)
+        frame.pack(fill="both", expand=True, padx=12, pady=12)
+        frame.columnconfigure(1, weight=1)
+
+        self.operation_var = tk.StringVar(value="export")
+        ops = ttk.Frame(frame)
+        ops.grid(row=0, column=0, columnspan=3, sticky="w", pady=(0, 8))
+        for op, title in self.OPERATIONS:
+            ttk.Radiobutton(ops, text=title, value=op, variable=self.operation_var,
+                            command=self.update_fields).pack(side="left", padx=(0, 10))
+
+        self.source_var = tk.StringVar(value=app.wim_path_var.get())
+        self.index_var = tk.StringVar(value=app.index_var.get() or DEFAULT_INDEX)
+        self.dest_var = tk.StringVar()
+        self.name_var = tk.StringVar()
+        self.source_label = ttk.Label(frame, text="Источник:")
+        self.source_label.grid(row=1, column=0, sticky="w", pady=3)
+        ttk.Entry(frame, textvariable=self.source_var).grid(row=1, column=1, sticky="ew", pady=3)
+        ttk.Button(frame, text="...", width=3, command=self.choose_source).grid(row=1, column=2, padx=(6, 0))
+        ttk.Label(frame, text="Индекс:").grid(row=2, column=0, sticky="w", pady=3)
+        self.index_entry = ttk.Entry(frame, textvariable=self.index_var, width=6)
+        self.index_entry.grid(row=2, column=1, sticky="w", pady=3)
+        self.dest_label = ttk.Label(frame, text="Результат:")
+        self.dest_label.grid(row=3, column=0, sticky="w", pady=3)
+        self.dest_entry = ttk.Entry(frame, textvariable=self.dest_var)
+        self.dest_entry.grid(row=3, column=1, sticky="ew", pady=3)
+        self.dest_button = ttk.Button(frame, text="...", width=3, command=self.choose_dest)
+        self.dest_button.grid(row=3, column=2, padx=(6, 0))
+        ttk.Label(frame, text="Имя образа:").grid(row=4, column=0, sticky="w", pady=3)
+        self.name_entry = ttk.Entry(frame, textvariable=self.name_var)
+        self.name_entry.grid(row=4, column=1, sticky="ew", pady=3)
+        self.part_var = tk.StringVar(value=str(DEFAULT_SPLIT_MB))
+        ttk.Label(frame, text="Размер части, МБ:").grid(row=5, column=0, sticky="w", pady=3)
+        self.part_entry = ttk.Spinbox(frame, textvariable=self.part_var, from_=100, to=1 << 20, increment=100,
+                                      width=8)
+        self.part_entry.grid(row=5, column=1, sticky="w", pady=3)
+
+        comp = ttk.LabelFrame(frame, text="Сжатие (wimlib; DISM – только тип)")
+        comp.grid(row=6, column=0, columnspan=3, sticky="ew", pady=(8, 0))
+        self.profile_var = tk.StringVar(value=DEFAULT_PROFILE)
+        self.threads_var = tk.StringVar(value="")
+        self.chunk_var = tk.StringVar(value="")
+        self.solid_var = tk.BooleanVar(value=False)
+        self.check_var = tk.BooleanVar(value=False)
+        ttk.Label(comp, text="Профиль:").pack(side="left", padx=(8, 4), pady=6)
+        ttk.Combobox(comp, textvariable=self.profile_var, values=list(PROFILES), width=11,
+                     state="readonly").pack(side="left")
+        ttk.Label(comp, text="Потоков:").pack(side="left", padx=(10, 4))
+        ttk.Spinbox(comp, textvariable=self.threads_var, from_=1, to=os.cpu_count() or 64,
+                    width=4).pack(side="left")
+        ttk.Label(comp, text="Блок:").pack(side="left", padx=(10, 4))
+        ttk.Combobox(comp, textvariable=self.chunk_var, values=self.CHUNK_SIZES, width=6).pack(side="left")
+        ttk.Checkbutton(comp, text="solid", variable=self.solid_var).pack(side="left", padx=(10, 0))
+        ttk.Checkbutton(comp, text="проверка целостности", variable=self.check_var).pack(side="left",
+                                                                                        padx=(10, 0))
+
+        bottom = ttk.Frame(frame)
+        bottom.grid(row=7, column=0, columnspan=3, sticky="ew", pady=(12, 0))
+        ttk.Button(bottom, text="Выполнить", style="Accent.TButton", command=self.run).pack(side="right")
+        ttk.Button(bottom, text="Сравнить профили", style="Secondary.TButton",
+                   command=self.benchmark).pack(side="right", padx=8)
+        self.update_fields()
+
+    def update_fields(self):
+        op = self.operation_var.get()
+        self.source_label.configure(text={"capture": "Папка:", "join": "Часть .swm:"}.get(op, "WIM-файл:"))
+        self.dest_label.configure(text={"export": "Новый WIM/ESD:", "capture": "WIM-файл:", "join": "Новый WIM:",
+                                        "apply": "Папка назначения:", "split": "Первая часть .swm:"
+                                        }.get(op, "Результат:"))
+        for widget, enabled in ((self.index_entry, op in ("export", "apply")),
+                                (self.dest_entry, op != "optimize"),
+                                (self.dest_button, op != "optimize"),
+                                (self.name_entry, op in ("export", "capture")),
+                                (self.part_entry, op == "split")):
+            widget.configure(state="normal" if enabled else "disabled")
+
+    def choose_source(self):
+        if self.operation_var.get() == "capture":
+            path = filedialog.askdirectory(title="Папка для захвата", parent=self.win)
+        else:
+            path = filedialog.askopenfilename(title="WIM-файл", parent=self.win,
+                                              filetypes=[("WIM/ESD/SWM", "*.wim *.esd *.swm"),
+                                                         ("Все файлы", "*.*")])
+        if path:
+            self.source_var.set(path)
+
+    def choose_dest(self):
+        if self.operation_var.get() == "apply":
+            path = filedialog.askdirectory(title="Папка назначения", parent=self.win)
+        elif self.operation_var.get() == "split":
+            path = filedialog.asksaveasfilename(title="Первая часть .swm", parent=self.win, defaultextension=".swm",
+                                                filetypes=[("Разделённый WIM", "*.swm")])
+        else:
+            path = filedialog.asksaveasfilename(title="WIM/ESD-файл", parent=self.win, defaultextension=".wim",
+                                                filetypes=[("WIM", "*.wim"), ("ESD", "*.esd")])
+        if path:
+            self.dest_var.set(path)
+
+    def profile(self):
+        threads = self.threads_var.get().strip()
+        return get_profile(self.profile_var.get(), threads=int(threads) if threads.isdigit() else None,
+                           chunk_size=self.chunk_var.get().strip() or None,
+                           solid=True if self.solid_var.get() else None)
+
+    def run(self):
+        op = self.operation_var.get()
+        source, dest = self.source_var.get().strip(), self.dest_var.get().strip()
+        index, name = self.index_var.get().strip() or DEFAULT_INDEX, self.name_var.get().strip()
+        try:
+            profile = self.profile() if op in ("export", "capture", "optimize") else None
+        except CompressionError as e:
+            messagebox.showerror("Сжатие", str(e), parent=self.win)
+            return
+        part_mb = self.part_var.get().strip()
+        if op == "split" and not (part_mb.isdigit() and int(part_mb) > 0):
+            messagebox.showwarning("Внимание", "Размер части – целое число МБ.", parent=self.win)
+            return
+        if not source or not os.path.exists(source):
+            messagebox.showwarning("Внимание", "Укажите существующий источник.", parent=self.win)
+            return
+        if op != "optimize" and not dest:
+            messagebox.showwarning("Внимание", "Укажите, куда сохранить результат.", parent=self.win)
+            return
+        if op == "capture" and not name:
+            messagebox.showwarning("Внимание", "Для захвата нужно имя образа.", parent=self.win)
+            return
+        if self.app.run_imaging(op, source, index, dest, name, profile, self.check_var.get(),
+                                part_mb=int(part_mb) if part_mb.isdigit() else DEFAULT_SPLIT_MB):
+            self.win.destroy()
+
+    def benchmark(self):
+        source = self.source_var.get().strip()
+        if not source or not os.path.isfile(source):
+            messagebox.showwarning("Внимание", "Укажите WIM-файл с образом для сравнения.", parent=self.win)
+            return
+        threads = self.threads_var.get().strip()
+        try:
+            chunk = self.chunk_var.get().strip() or None
+            get_profile(DEFAULT_PROFILE, chunk_size=chunk)
+        except CompressionError as e:
+            messagebox.showerror("Сжатие", str(e), parent=self.win)
+            return
+        self.app.benchmark_compression(source, self.index_var.get().strip() or DEFAULT_INDEX,
+                                       threads=int(threads) if threads.isdigit() else None, chunk_size=chunk)
+
+
+class ServiceDialog:
+    """Окно «Обслуживание без монтирования»: пакет add/delete/rename для wimlib-imagex update."""
+
+    def __init__(self, app: WimManagerApp, wim: str):
+        self.app = app
+        self.wim = wim
+        from wimcore.update import UpdateBatch
+        self.batch = UpdateBatch()
+
+        self.win = tk.Toplevel(app.root)
+        self.win.title(f"Без монтирования: {os.path.basename(wim)}")
+        self.win.geometry("720x380")
+        self.win.transient(app.root)
+
+        frame = ttk.Frame(self.win)
+        frame.pack(fill="both", expand=True, padx=12, pady=12)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(0, weight=1)
+
+        self.ops_list = tk.Listbox(frame, activestyle="none")
+        self.ops_list.grid(row=0, column=0, sticky="nsew")
+
+        side = ttk.Frame(frame)
+        side.grid(row=0, column=1, sticky="n", padx=(8, 0))
+        for row, (text, command) in enumerate((
+            ("Добавить файл", self.add_file),
+            ("Добавить папку", self.add_dir),
+            ("Удалить путь", self.delete_path),
+            ("Переименовать", self.rename_path),
+            ("Убрать из списка", self.remove_selected),
+        )):
+            ttk.Button(side, text=text, style="Secondary.TButton",
+                       command=command).grid(row=row, column=0, sticky="ew", pady=2)
+
+        bottom = ttk.Frame(frame)
+        bottom.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(10, 0))
+        ttk.Label(bottom, text="Индексы (1,3-5 или *):").pack(side="left")
+        self.indexes_var = tk.StringVar(value=app.index_var.get().strip() or DEFAULT_INDEX)
+        ttk.Entry(bottom, textvariable=self.indexes_var, width=12).pack(side="left", padx=(6, 12))
+        ttk.Button(bottom, text="Применить", style="Accent.TButton",
+                   command=self.apply).pack(side="right")
+        ttk.Button(bottom, text="Предпросмотр", style="Secondary.TButton",
+                   command=self.preview).pack(side="right", padx=8)
+
+    def refresh(self):
+        self.ops_list.delete(0, "end")
+        for op in self.batch.ops:
+            self.ops_list.insert("end", op.command())
+
+    def ask_target(self, default):
+        return simpledialog.askstring("Путь в образе", "Куда положить (путь внутри образа):",
+                                      initialvalue=default, parent=self.win)
+
+    def add_file(self):
+        for source in filedialog.askopenfilenames(title="Файлы для добавления", parent=self.win):
+            target = self.ask_target("/" + os.path.basename(source))
+            if target:
+                self.batch.add(source, target)
+        self.refresh()
+
+    def add_dir(self):
+        source = filedialog.askdirectory(title="Папка для добавления", parent=self.win)
+        if source:
+            target = self.ask_target("/" + os.path.basename(source.rstrip("/\\")))
+            if target:
+                self.batch.add(source, target)
+        self.refresh()
+
+    def delete_path(self):
+        path = simpledialog.askstring("Удалить", "Путь внутри образа:", parent=self.win)
+        if path:
+            self.batch.delete(path)
+        self.refresh()
+
+    def rename_path(self):
+        source = simpledialog.askstring("Переименовать", "Старый путь внутри образа:", parent=self.win)
+        if not source:
+            return
+        target = simpledialog.askstring("Переименовать", "Новый путь:", initialvalue=source, parent=self.win)
+        if target:
+            self.batch.rename(source, target)
+        self.refresh()
+
+    def remove_selected(self):
+        for position in reversed(self.ops_list.curselection()):
+            self.batch.remove(position)
+        self.refresh()
+
+    def indexes(self):
+        from wimcore.update import parse_indexes
+        info = self.app.get_wim_info(self.wim)
+        available = [img.index for img in info.images] if info is not None else []
+        return parse_indexes(self.indexes_var.get(), available)
+
+    def preview(self):
+        from wimcore.update import UpdateError
+        try:
+            indexes = self.indexes()
+        except UpdateError as e:
+            messagebox.showerror("Ошибка", str(e), parent=self.win)
+            return
+        self.app.log(f">>> Предпросмотр изменений {self.wim}:")
+        self.app.log(self.batch.preview(indexes))
+
+    def apply(self):
+        from wimcore.update import UpdateError
+        try:
+            indexes = self.indexes()
+            if not len(self.batch):
+                raise UpdateError("Список операций пуст.")
+        except UpdateError as e:
+            messagebox.showerror("Ошибка", str(e), parent=self.win)
+            return
+        self.app.apply_update_batch(self.wim, self.batch, indexes)
+        self.win.destroy()
+
+
+class BrowserWindow:
+    """Дерево файлов образа: уровни подгружаются при раскрытии, поиск по префиксу и маске."""
+
+    MAX_RESULTS = 500
+
+    def __init__(self, app: WimManagerApp, wim: str, index, tree):
+        self.app = app
+        self.tree_index = tree
+
+        self.win = tk.Toplevel(app.root)
+        self.win.title(f"{os.path.basename(wim)} – индекс {index} ({len(tree)} элементов)")
+        self.win.geometry("760x520")
+
+        top = ttk.Frame(self.win)
+        top.pack(fill="x", padx=10, pady=(10, 5))
+        ttk.Label(top, text="Поиск (/путь/префикс или маска *.sys):").pack(side="left")
+        self.search_var = tk.StringVar()
+        entry = ttk.Entry(top, textvariable=self.search_var)
+        entry.pack(side="left", fill="x", expand=True, padx=6)
+        entry.bind("<Return>", self.search)
+        ttk.Button(top, text="Найти", style="Secondary.TButton", command=self.search).pack(side="left")
+        ttk.Button(top, text="Сброс", style="Secondary.TButton",
+                   command=self.show_root).pack(side="left", padx=(6, 0))
+
+        body = ttk.Frame(self.win)
+        body.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.view = ttk.Treeview(body, columns=("size",), selectmode="browse")
+        self.view.heading("#0", text="Имя")
+        self.view.heading("size", text="Размер")
+        self.view.column("size", width=120, anchor="e", stretch=False)
+        scroll = ttk.Scrollbar(body, orient="vertical", command=self.view.yview)
+        self.view.configure(yscrollcommand=scroll.set)
+        self.view.pack(side="left", fill="both", expand=True)
+        scroll.pack(side="right", fill="y")
+        self.view.bind("<<TreeviewOpen>>", self.on_open)
+
+        self.show_root()
+
+    def insert_children(self, parent_iid, node_id):
+        for node in self.tree_index.children(node_id):
+            iid = str(node.id)
+            size = "" if node.is_dir else f"{node.size:,}"
+            self.view.insert(parent_iid, "end", iid=iid, text=node.name, values=(size,))
+            if node.is_dir and self.tree_index.has_children(node.id):
+                # заглушка, чтобы у каталога был треугольник раскрытия
+                self.view.insert(iid, "end", iid=f"stub-{iid}", text="...")
+
+    def show_root(self):
+        self.view.delete(*self.view.get_children(""))
+        self.insert_children("", 0)
+
+    def on_open(self, _event):
+        iid = self.view.focus()
+        stub = f"stub-{iid}"
+        if iid.isdigit() and self.view.exists(stub):
+            self.view.delete(stub)
+            self.insert_children(iid, int(iid))
+
+    def search(self, _event=None):
+        query = self.search_var.get().strip()
+        if not query:
+            self.show_root()
+            return
+        if any(c in query for c in "*?["):
+            paths = self.tree_index.glob(query, limit=self.MAX_RESULTS)
+        else:
+            paths = self.tree_index.prefix_search(query, limit=self.MAX_RESULTS)
+
+        self.view.delete(*self.view.get_children(""))
+        for path in paths:
+            node = self.tree_index.node(self.tree_index.lookup(path))
+            size = "" if node.is_dir else f"{node.size:,}"
+            self.view.insert("", "end", text=path, values=(size,))
+        self.app.status_var.set(f"Найдено: {len(paths)}" + (" (показаны первые)" if len(paths) >= self.MAX_RESULTS else ""))
+
+
+class MountsWindow:
+    """Смонтированные образы: фоновый опрос, обновление только изменившихся строк."""
+
+    COLUMNS = (("image", "WIM-файл", 260), ("index", "Индекс", 60), ("mode", "Режим", 60),
+               ("status", "Состояние", 120), ("backend", "Бэкенд", 70))
+
+    def __init__(self, app: WimManagerApp):
+        self.app = app
+        self.records = {}
+
+        self.win = tk.Toplevel(app.root)
+        self.win.title("Смонтированные образы")
+        self.win.geometry("860x320")
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        body = ttk.Frame(self.win)
+        body.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        self.view = ttk.Treeview(body, columns=[c for c, _, _ in self.COLUMNS], selectmode="extended")
+        self.view.heading("#0", text="Папка монтирования")
+        self.view.column("#0", width=240)
+        for column, title, width in self.COLUMNS:
+            self.view.heading(column, text=title)
+            self.view.column(column, width=width, stretch=(column == "image"))
+        self.view.pack(fill="both", expand=True)
+        self.view.bind("<Double-1>", self.choose)
+
+        bottom = ttk.Frame(self.win)
+        bottom.pack(fill="x", padx=10, pady=(0, 10))
+        self.state_var = tk.StringVar(value="Опрос...")
+        ttk.Label(bottom, textvariable=self.state_var).pack(side="left")
+        ttk.Button(bottom, text="Исправить проблемные", style="Accent.TButton",
+                   command=self.repair).pack(side="right")
+        ttk.Button(bottom, text="Обновить", style="Secondary.TButton",
+                   command=lambda: self.monitor.refresh()).pack(side="right", padx=8)
+
+        from wimcore.mounts import MountMonitor, list_mounts
+        use_dism = bool(app.tools.path(DISM)) and os.name == "nt"
+        self.monitor = MountMonitor(
+            lambda: list_mounts(app.mount_tracker, use_dism=use_dism),
+            on_change=lambda records, diff: app.ui.post(self.apply, records, diff),
+            on_error=lambda e: app.ui.post(self.state_var.set, f"Ошибка опроса: {e}"),
+        )
+        self.monitor.start()
+
+    def row_values(self, record):
+        return (record.image_file, record.index or "", "RW" if record.read_write else "RO",
+                record.status, record.backend)
+
+    def apply(self, records, diff):
+        from wimcore.mounts import STATUS_OK
+        if not self.win.winfo_exists():
+            return
+        for record in diff.removed:
+            if self.view.exists(record.key):
+                self.view.delete(record.key)
+            self.records.pop(record.key, None)
+        for record in diff.added + diff.changed:
+            self.records[record.key] = record
+            tags = () if record.status == STATUS_OK else ("problem",)
+            if self.view.exists(record.key):
+                self.view.item(record.key, values=self.row_values(record), tags=tags)
+            else:
+                self.view.insert("", "end", iid=record.key, text=record.mount_dir,
+                                 values=self.row_values(record), tags=tags)
+        self.view.tag_configure("problem", foreground="#d9534f")
+        problems = sum(1 for r in records if r.status != STATUS_OK)
+        self.state_var.set(f"Монтирований: {len(records)}, проблемных: {problems} "
+                           f"(опрос раз в {self.monitor.interval} с)")
+        for record in diff.added + diff.changed:
+            if record.status != STATUS_OK:
+                self.app.log(f"Монтирование требует внимания: {record.describe()}")
+
+    def repair(self):
+        selected = [self.records[iid] for iid in self.view.selection() if iid in self.records]
+        self.app.repair_mounts(selected or list(self.records.values()))
+
+    def choose(self, _event=None):
+        record = self.records.get(self.view.focus())
+        if record is None:
+            return
+        self.app.mount_path_var.set(record.mount_dir)
+        if record.image_file:
+            self.app.wim_path_var.set(record.image_file)
+        if record.index:
+            self.app.index_var.set(str(record.index))
+
+    def close(self):
+        self.monitor.stop()
+        self.app.mounts_window = None
+        self.win.destroy()
+
+
+class StatsWindow:
+    """Сводка телеметрии: p50/p95 времени операций по типам и выгрузка для панелей."""
+
+    COLUMNS = (("backend", "Бэкенд", 70), ("count", "Всего", 60), ("failed", "Неуспешно", 80),
+               ("p50", "p50, с", 70), ("p95", "p95, с", 70), ("queue", "Очередь p95, с", 100),
+               ("cpu", "CPU p50, с", 80), ("speed", "МБ/с p50", 80))
+    PERIODS = (("за всё время", None), ("за 30 дней", 30), ("за 7 дней", 7), ("за сутки", 1))
+
+    def __init__(self, app: WimManagerApp):
+        self.app = app
+        self.records = []
+
+        self.win = tk.Toplevel(app.root)
+        self.win.title("Статистика операций")
+        self.win.geometry("820x320")
+
+        body = ttk.Frame(self.win)
+        body.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        self.view = ttk.Treeview(body, columns=[c for c, _, _ in self.COLUMNS])
+        self.view.heading("#0", text="Операция")
+        self.view.column("#0", width=140)
+        for column, title, width in self.COLUMNS:
+            self.view.heading(column, text=title)
+            self.view.column(column, width=width, anchor="e" if column != "backend" else "w")
+        self.view.pack(fill="both", expand=True)
+
+        bottom = ttk.Frame(self.win)
+        bottom.pack(fill="x", padx=10, pady=(0, 10))
+        self.period_var = tk.StringVar(value=self.PERIODS[0][0])
+        period = ttk.Combobox(bottom, textvariable=self.period_var, values=[p for p, _ in self.PERIODS],
+                              width=14, state="readonly")
+        period.pack(side="left")
+        period.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+        self.state_var = tk.StringVar()
+        ttk.Label(bottom, textvariable=self.state_var).pack(side="left", padx=10)
+        ttk.Button(bottom, text="Prometheus...", style="Secondary.TButton",
+                   command=lambda: self.export("prom")).pack(side="right")
+        ttk.Button(bottom, text="CSV...", style="Secondary.TButton",
+                   command=lambda: self.export("csv")).pack(side="right", padx=8)
+        ttk.Button(bottom, text="Обновить", style="Secondary.TButton",
+                   command=self.refresh).pack(side="right")
+        self.refresh()
+
+    def refresh(self):
+        days = dict(self.PERIODS).get(self.period_var.get())
+        since = time.time() - days * 86400 if days else None
+        self.state_var.set("Чтение журнала...")
+
+        def worker():
+            from wimcore.telemetry import summarize
+            records = self.app.telemetry.load(since)
+            self.app.ui.post(self.show, records, summarize(records))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    @staticmethod
+    def _num(value, fmt="{:.1f}"):
+        return fmt.format(value) if value is not None else "–"
+
+    def show(self, records, stats):
+        if not self.win.winfo_exists():
+            return
+        self.records = records
+        self.view.delete(*self.view.get_children())
+        for s in stats:
+            self.view.insert("", "end", text=s.operation, values=(
+                s.backend, s.count, s.failed, self._num(s.wall_p50), self._num(s.wall_p95),
+                self._num(s.queue_p95), self._num(s.cpu_p50), self._num(s.mb_per_sec_p50)))
+        self.state_var.set(f"Операций: {len(records)}"
+                           + ("" if self.app.telemetry.enabled else " (запись отключена в настройках)"))
+
+    def export(self, kind):
+        if kind == "csv":
+            path = filedialog.asksaveasfilename(parent=self.win, title="Выгрузка в CSV", defaultextension=".csv",
+                                                filetypes=[("CSV", "*.csv")])
+        else:
+            path = filedialog.asksaveasfilename(parent=self.win, title="Выгрузка для Prometheus",
+                                                defaultextension=".prom",
+                                                filetypes=[("Prometheus textfile", "*.prom")])
+        if not path:
+            return
+        from wimcore.telemetry import to_csv, to_prometheus
+        try:
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                if kind == "csv":
+                    to_csv(self.records, f)
+                else:
+                    f.write(to_prometheus(self.records))
+        except OSError as e:
+            messagebox.showerror("Ошибка", str(e), parent=self.win)
+            return
+        self.app.log(f"Статистика выгружена: {path}")
+
+
+class CatalogWindow:
+    """Каталог библиотеки WIM: папки, фоновое сканирование, поиск и постраничная таблица образов."""
+
+    COLUMNS = (("index", "Индекс", 60), ("name", "Имя", 220), ("edition", "Редакция", 130),
+               ("build", "Сборка", 80), ("languages", "Языки", 90), ("arch", "Архитектура", 90),
+               ("path", "Файл", 260))
+    FILTERS = (("edition", "Редакция"), ("build", "Сборка"), ("languages", "Язык"), ("arch", "Архитектура"))
+
+    def __init__(self, app: WimManagerApp, catalog):
+        self.app = app
+        self.catalog = catalog
+        self.scan_cancel = None
+        self.loaded = 0
+        self.total = 0
+        self.rows = {}
+
+        self.win = tk.Toplevel(app.root)
+        self.win.title("Каталог WIM")
+        self.win.geometry("980x560")
+
+        dirs_frame = ttk.Frame(self.win)
+        dirs_frame.pack(fill="x", padx=10, pady=(10, 5))
+        ttk.Label(dirs_frame, text="Папки:").pack(side="left")
+        self.dirs_var = tk.StringVar()
+        ttk.Label(dirs_frame, textvariable=self.dirs_var).pack(side="left", fill="x", expand=True, padx=6)
+        ttk.Button(dirs_frame, text="Добавить папку", style="Secondary.TButton",
+                   command=self.add_dir).pack(side="left")
+        ttk.Button(dirs_frame, text="Очистить", style="Secondary.TButton",
+                   command=self.clear_dirs).pack(side="left", padx=6)
+        self.scan_button = ttk.Button(dirs_frame, text="Сканировать", style="Accent.TButton",
+                                      command=self.scan)
+        self.scan_button.pack(side="left")
+
+        filter_frame = ttk.Frame(self.win)
+        filter_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Label(filter_frame, text="Поиск:").pack(side="left")
+        self.search_var = tk.StringVar()
+        entry = ttk.Entry(filter_frame, textvariable=self.search_var, width=24)
+        entry.pack(side="left", padx=(4, 10))
+        entry.bind("<Return>", self.refresh)
+        self.filter_vars = {}
+        for column, title in self.FILTERS:
+            ttk.Label(filter_frame, text=f"{title}:").pack(side="left")
+            var = tk.StringVar()
+            cb = ttk.Combobox(filter_frame, textvariable=var, width=12)
+            cb.pack(side="left", padx=(4, 10))
+            cb.bind("<Return>", self.refresh)
+            cb.bind("<<ComboboxSelected>>", self.refresh)
+            self.filter_vars[column] = (var, cb)
+        ttk.Button(filter_frame, text="Найти", style="Secondary.TButton",
+                   command=self.refresh).pack(side="left")
+
+        body = ttk.Frame(self.win)
+        body.pack(fill="both", expand=True, padx=10)
+        self.view = ttk.Treeview(body, columns=[c for c, _, _ in self.COLUMNS], show="headings",
+                                 selectmode="browse")
+        for column, title, width in self.COLUMNS:
+            self.view.heading(column, text=title)
+            self.view.column(column, width=width, stretch=(column in ("name", "path")))
+        self.scroll = ttk.Scrollbar(body, orient="vertical", command=self.view.yview)
+        self.view.configure(yscrollcommand=self.on_scroll)
+        self.view.pack(side="left", fill="both", expand=True)
+        self.scroll.pack(side="right", fill="y")
+        self.view.bind("<Double-1>", self.choose)
+
+        self.count_var = tk.StringVar()
+        ttk.Label(self.win, textvariable=self.count_var).pack(fill="x", padx=10, pady=(5, 10))
+
+        self.show_dirs()
+        self.refresh()
+
+    # -------------------------------------------------------- ПАПКИ / СКАНИРОВАНИЕ
+
+    def show_dirs(self):
+        from wimcore.catalog import catalog_dirs
+        dirs = catalog_dirs()
+        self.dirs_var.set("; ".join(dirs) if dirs else "не заданы – добавьте папку с образами")
+
+    def add_dir(self):
+        directory = filedialog.askdirectory(title="Папка с WIM/ESD/SWM", parent=self.win)
+        if directory:
+            from wimcore.catalog import catalog_dirs, set_catalog_dirs
+            dirs = catalog_dirs()
+            if directory not in dirs:
+                set_catalog_dirs(dirs + [directory])
+            self.show_dirs()
+
+    def clear_dirs(self):
+        if messagebox.askyesno("Каталог", "Убрать все папки из каталога?", parent=self.win):
+            from wimcore.catalog import set_catalog_dirs
+            set_catalog_dirs([])
+            self.show_dirs()
+
+    def scan(self):
+        if self.scan_cancel is not None:
+            self.scan_cancel.set()
+            return
+        import sqlite3
+        from wimcore.catalog import catalog_dirs
+        if not catalog_dirs():
+            messagebox.showinfo("Каталог", "Сначала добавьте папку с образами.", parent=self.win)
+            return
+        self.scan_cancel = threading.Event()
+        self.scan_button.configure(text="Остановить")
+        self.app.start_progress("Сканирование каталога...")
+        started = time.monotonic()
+
+        def on_progress(done, total):
+            elapsed = time.monotonic() - started
+            rate = done / elapsed if elapsed > 0 else 0.0
+            progress = Progress(percent=done * 100.0 / total if total else 100.0,
+                                rate=rate, eta=(total - done) / rate if rate else None)
+            self.app.ui.post_latest("progress", self.app.set_progress, f"Сканирование {done}/{total}", progress)
+
+        def worker():
+            try:
+                result, error = self.catalog.scan(on_progress=on_progress,
+                                                  cancel_event=self.scan_cancel), None
+            except (OSError, sqlite3.Error) as e:
+                result, error = None, e
+            self.app.ui.post(self.on_scanned, result, error)
 
         threading.Thread(target=worker, daemon=True).start()
 
+    def on_scanned(self, result, error):
+        self.scan_cancel = None
+        if error is not None:
+            self.app.stop_progress("Ошибка сканирования")
+            self.app.log(f"Ошибка сканирования каталога: {error}")
+        else:
+            self.app.stop_progress("Каталог обновлён")
+            self.app.log(f"Каталог: {result.describe()}")
+            for path, text in result.errors[:20]:
+                self.app.log(f"  {path}: {text}")
+        if self.win.winfo_exists():
+            self.scan_button.configure(text="Сканировать")
+            self.refresh()
+
+    # -------------------------------------------------------- ТАБЛИЦА
+
+    def filters(self):
+        return {column: var.get() for column, (var, _) in self.filter_vars.items()}
+
+    def refresh(self, _event=None):
+        for column, (_, cb) in self.filter_vars.items():
+            cb.configure(values=[""] + self.catalog.distinct(column))
+        self.view.delete(*self.view.get_children(""))
+        self.rows = {}
+        self.loaded = 0
+        self.total = self.catalog.count(self.search_var.get(), **self.filters())
+        self.load_page()
+
+    def load_page(self):
+        from wimcore.catalog import PAGE_SIZE
+        page = self.catalog.query(self.search_var.get(), offset=self.loaded, limit=PAGE_SIZE,
+                                  **self.filters())
+        for image in page:
+            iid = self.view.insert("", "end", values=(
+                image.index, image.name, image.edition, image.build, image.languages, image.arch, image.path,
+            ))
+            self.rows[iid] = image
+        self.loaded += len(page)
+        self.count_var.set(f"Образов: {self.total} (загружено {self.loaded}); "
+                           f"двойной щелчок – выбрать образ")
+
+    def on_scroll(self, first, last):
+        self.scroll.set(first, last)
+        # следующая страница подгружается, когда видна нижняя часть таблицы
+        if float(last) > 0.9 and self.loaded < self.total:
+            self.win.after_idle(self.load_page_if_needed)
+
+    def load_page_if_needed(self):
+        if self.loaded < self.total and float(self.view.yview()[1]) > 0.9:
+            self.load_page()
+
+    def choose(self, _event=None):
+        image = self.rows.get(self.view.focus())
+        if image is None:
+            return
+        self.app.wim_path_var.set(image.path)
+        self.app.index_var.set(str(image.index))
+        self.app.status_var.set(f"Выбран {os.path.basename(image.path)}, индекс {image.index}")
+
 
 def main():
+    startup_mark("imports")
     root = tk.Tk()
-    app = WimManagerApp(root)
+    WimManagerApp(root)
     root.mainloop()
 
 
 if __name__ == "__main__":
+    # проверка целостности использует пул процессов: в собранном PyInstaller .exe
+    # дочерний процесс пула должен уйти в multiprocessing до любой работы GUI
+    from multiprocessing import freeze_support
+    freeze_support()
     main()
@@ -0,0 +1,126 @@
+"""
+Бенчмарк просмотра образа без монтирования (wimcore.browser) на
+синтетическом выводе `wimlib-imagex dir --detailed`.
+
+    python benchmarks/bench_browser.py [--files 200000] [--budget-ms 500]
+
+Замеряет построение индекса из строк, сохранение в кэш, повторное открытие
+из дискового кэша (новый процесс – память пуста) и из памяти, а также
+поиск. Проверяет, что после изменения WIM (размер/mtime) кэш не отдаёт
+старое дерево. Код возврата 1, если повторное открытие с диска дольше
+--budget-ms или проверка кэша не прошла.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# кэш индексов – во временном каталоге, до импорта wimcore
+_DATA = tempfile.TemporaryDirectory()
+os.environ["XDG_CACHE_HOME"] = _DATA.name
+os.environ["LOCALAPPDATA"] = _DATA.name
+
+from wimcore import browser  # noqa: E402
+from wimcore.browser import DirListingParser, load_cached_index, store_cached_index  # noqa: E402
+
+GUID = "0123456789abcdef0123456789abcdef"
+
+
+def detailed_lines(files, per_dir=50):
+    """Строки в формате dir --detailed: каталоги по per_dir файлов, два уровня."""
+    dirs = max(1, files // per_dir)
+    for d in range(dirs):
+        top = f"/Windows/Dir{d // 100:03d}"
+        path = f"{top}/Sub{d:05d}"
+        for name in (top, path) if d % 100 == 0 else (path,):
+            yield f'Full Path: "{name}"'
+            yield "Attributes:         0x00000010"
+            yield ""
+        for f in range(per_dir):
+            yield f'Full Path: "{path}/file{f:04d}.dll"'
+            yield "Attributes:         0x00000020"
+            yield f"Uncompressed size = {1000 + f} bytes"
+            yield ""
+
+
+def timed(fn, repeat=1):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    return result, statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=200_000)
+    parser.add_argument("--budget-ms", type=float, default=500.0,
+                        help="допустимое время повторного открытия из дискового кэша")
+    args = parser.parse_args()
+
+    wim = os.path.join(_DATA.name, "install.wim")
+    with open(wim, "wb") as f:
+        f.write(b"MSWIM\0\0\0")
+
+    lines = list(detailed_lines(args.files))
+
+    def build():
+        p = DirListingParser()
+        for line in lines:
+            p.feed(line)
+        return p.finish()
+
+    tree, build_ms = timed(build)
+    _, store_ms = timed(lambda: store_cached_index(wim, GUID, 1, tree))
+    cache_file = browser._cache_file(browser._cache_key(wim, GUID, 1))
+
+    def cold():
+        browser._memory_cache.clear()
+        return load_cached_index(wim, GUID, 1)
+
+    loaded, cold_ms = timed(cold, repeat=5)
+    _, warm_ms = timed(lambda: load_cached_index(wim, GUID, 1), repeat=5)
+    probe = "/Windows/Dir001/Sub00150/file0042.dll"
+    _, lookup_ms = timed(lambda: loaded.exists(probe), repeat=100)
+    _, prefix_ms = timed(lambda: loaded.prefix_search("/Windows/Dir001/Sub0015"), repeat=20)
+    _, glob_ms = timed(lambda: loaded.glob("file0042.*"), repeat=3)
+
+    print(f"Элементов в индексе: {len(tree):,}; строк вывода: {len(lines):,}; "
+          f"файл кэша {os.path.getsize(cache_file) / 1e6:.1f} МБ")
+    for name, ms in (("построение из вывода dir", build_ms), ("запись в кэш", store_ms),
+                     ("открытие из дискового кэша", cold_ms), ("открытие из памяти", warm_ms),
+                     ("exists()", lookup_ms), ("prefix_search()", prefix_ms), ("glob() по имени", glob_ms)):
+        print(f"{name:<28} {ms:10.3f} мс")
+
+    ok = True
+    if cold_ms > args.budget_ms:
+        print(f"Открытие из кэша дольше {args.budget_ms:.0f} мс.")
+        ok = False
+    if loaded is None or len(loaded) != len(tree) or not loaded.exists(probe):
+        print("Индекс из кэша не совпадает с построенным.")
+        ok = False
+
+    # WIM изменён (update/commit): GUID тот же, но кэш не должен отдать старое дерево
+    with open(wim, "ab") as f:
+        f.write(b"\0" * 16)
+    browser._memory_cache.clear()
+    if load_cached_index(wim, GUID, 1) is not None:
+        print("После изменения WIM кэш вернул старое дерево.")
+        ok = False
+    store_cached_index(wim, GUID, 1, tree)
+    if os.path.exists(cache_file):
+        print("Индекс старой версии WIM не удалён из кэша.")
+        ok = False
+
+    _DATA.cleanup()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
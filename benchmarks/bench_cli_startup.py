@@ -0,0 +1,65 @@
+"""
+Холодный старт консольного режима: `python -m wimcore info <wim>`.
+
+    python benchmarks/bench_cli_startup.py [-n 20] [--budget-ms 250]
+
+Проверяет, что медианное время запуска укладывается в бюджет и что
+tkinter при этом не импортируется. Код возврата 1 при нарушении.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthwim import write_wim  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--repeat", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=250.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wim = os.path.join(tmp, "startup.wim")
+        write_wim(wim, image_count=4)
+        cmd = [sys.executable, "-m", "wimcore", "info", wim]
+
+        samples = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+            samples.append((time.perf_counter() - t0) * 1000)
+
+        imports = subprocess.run([sys.executable, "-X", "importtime"] + cmd[1:], cwd=ROOT,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+
+    baseline = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        baseline.append((time.perf_counter() - t0) * 1000)
+
+    median = statistics.median(samples)
+    print(f"python -c pass        медиана {statistics.median(baseline):8.1f} мс")
+    print(f"python -m wimcore info медиана {median:8.1f} мс, мин {min(samples):.1f}, "
+          f"макс {max(samples):.1f} (бюджет {args.budget_ms:.0f} мс)")
+
+    failed = False
+    if "tkinter" in imports:
+        print("ОШИБКА: консольный режим импортирует tkinter.")
+        failed = True
+    if median > args.budget_ms:
+        print("ОШИБКА: бюджет холодного старта превышен.")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Бенчмарк фоновой службы заданий (wimcore.daemon) со многими клиентами на localhost.
+
+    python benchmarks/bench_daemon.py [--clients 1,4,16,64] [--jobs-per-client 8]
+                                      [--seconds 0.2] [--daemon-jobs 8] [--tcp] [--json]
+
+Служба запускается отдельным процессом (python -m wimcore daemon) с
+заглушками на PATH и временным каталогом данных. Каждый клиент – своё
+соединение (DaemonClient + RemoteScheduler) в своём потоке, все ставят
+задания одновременно.
+
+- throughput: задания/с, доля от того же числа заданий в локальном
+  JobScheduler (без службы) и задержка вызова submit (p50/p95);
+- fairness: индекс Джейна по пропускной способности клиентов (1.0 – поровну);
+- greedy: один клиент ставит очередь в несколько раз больше лимита, затем
+  несколько клиентов ставят по одному заданию – печатается их ожидание в
+  очереди и сколько они ждали бы при FIFO.
+
+Только POSIX (как и заглушки). Код возврата 1, если задание завершилось
+с ошибкой.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.check_engine import STUBS, stub  # noqa: E402
+from wimcore.client import DaemonClient, RemoteScheduler  # noqa: E402
+from wimcore.jobs import Job, JobScheduler  # noqa: E402
+from wimcore.settings import APP_DIR_NAME  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def spawn_daemon(data_dir, jobs, tcp=False):
+    """Запускает службу; возвращает (процесс, путь к daemon.json)."""
+    env = dict(os.environ, XDG_CACHE_HOME=data_dir,
+               PATH=STUBS + os.pathsep + os.environ.get("PATH", ""))
+    cmd = [sys.executable, "-m", "wimcore", "daemon", "-j", str(jobs), "--dism-jobs", str(jobs)]
+    if tcp:
+        cmd.append("--tcp")
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+    ready = json.loads(proc.stdout.readline() or "{}")
+    if not ready.get("ok"):
+        proc.kill()
+        raise RuntimeError(f"служба не запустилась: {ready}")
+    return proc, os.path.join(data_dir, APP_DIR_NAME, "daemon.json")
+
+
+def stop_daemon(proc, state_file):
+    try:
+        client = DaemonClient.connect("bench", state_file=state_file)
+        client.call("shutdown")
+        client.close()
+    except Exception:
+        proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def jain(values):
+    """Индекс справедливости Джейна: (Σx)² / (n·Σx²)."""
+    square = sum(v * v for v in values)
+    return sum(values) ** 2 / (len(values) * square) if square else 1.0
+
+
+def job_cmd(seconds):
+    return stub("wimlib-imagex", "verify", "bench.wim", seconds=seconds, steps=4)
+
+
+def run_local(jobs, limit, seconds):
+    """Те же задания в планировщике этого процесса: задания/с без службы."""
+    scheduler = JobScheduler(limits={"wimlib": limit})
+    t0 = time.perf_counter()
+    submitted = [scheduler.submit(Job("info", job_cmd(seconds), backend="wimlib")) for _ in range(jobs)]
+    for job in submitted:
+        job.wait(300)
+    return jobs / (time.perf_counter() - t0)
+
+
+def run_clients(state_file, clients, per_client, seconds):
+    barrier = threading.Barrier(clients)
+    results = [None] * clients
+
+    def worker(i):
+        client = DaemonClient.connect(f"bench-{i}", state_file=state_file)
+        scheduler = RemoteScheduler(client)
+        barrier.wait()
+        t0 = time.perf_counter()
+        latencies, jobs = [], []
+        for _ in range(per_client):
+            s = time.perf_counter()
+            jobs.append(scheduler.submit(Job("info", job_cmd(seconds), backend="wimlib")))
+            latencies.append(time.perf_counter() - s)
+        for job in jobs:
+            job.wait(300)
+        results[i] = {"elapsed": time.perf_counter() - t0, "latencies": latencies,
+                      "ok": all(job.success for job in jobs)}
+        client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    latencies = [x for r in results for x in r["latencies"]]
+    return {
+        "clients": clients,
+        "jobs": clients * per_client,
+        "wall": wall,
+        "jobs_per_sec": clients * per_client / wall,
+        "submit_p50_ms": percentile(latencies, 50) * 1000,
+        "submit_p95_ms": percentile(latencies, 95) * 1000,
+        "fairness": jain([per_client / r["elapsed"] for r in results]),
+        "ok": all(r["ok"] for r in results),
+    }
+
+
+def run_greedy(state_file, limit, seconds, small_clients):
+    """Один жадный клиент (4 × лимит заданий) и несколько клиентов с одним заданием."""
+    greedy_client = DaemonClient.connect("greedy", state_file=state_file)
+    greedy = RemoteScheduler(greedy_client)
+    big = [greedy.submit(Job("info", job_cmd(seconds), backend="wimlib")) for _ in range(4 * limit)]
+    time.sleep(seconds / 4)     # жадная очередь уже стоит
+
+    small = []
+    clients = []
+    for i in range(small_clients):
+        client = DaemonClient.connect(f"small-{i}", state_file=state_file)
+        clients.append(client)
+        small.append(RemoteScheduler(client).submit(Job("info", job_cmd(seconds), backend="wimlib")))
+    for job in big + small:
+        job.wait(300)
+    for client in clients + [greedy_client]:
+        client.close()
+
+    waits = [job.queue_time for job in small if job.queue_time is not None]
+    # при FIFO маленькие задания ждали бы, пока не запустится вся жадная очередь
+    fifo = max(job.started_at for job in big) - min(job.submitted_at for job in small)
+    return {
+        "greedy_jobs": len(big),
+        "small_clients": small_clients,
+        "small_wait_max_ms": max(waits) * 1000 if waits else None,
+        "small_wait_p50_ms": statistics.median(waits) * 1000 if waits else None,
+        "fifo_wait_ms": fifo * 1000,
+        "ok": all(job.success for job in big + small),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", default="1,4,16,64", help="числа клиентов через запятую")
+    parser.add_argument("--jobs-per-client", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=0.2, help="длительность задания-заглушки")
+    parser.add_argument("--daemon-jobs", type=int, default=8, help="лимит параллельных заданий службы")
+    parser.add_argument("--tcp", action="store_true", help="TCP на 127.0.0.1 вместо Unix-сокета")
+    parser.add_argument("--json", action="store_true", help="результат в JSON")
+    args = parser.parse_args()
+    if os.name == "nt":
+        print("Заглушки работают только в POSIX – пропуск.")
+        return 0
+
+    limit = max(1, args.daemon_jobs)
+    results = {"transport": "tcp" if args.tcp else "unix", "limit": limit, "runs": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["XDG_CACHE_HOME"] = tmp
+        os.environ["PATH"] = STUBS + os.pathsep + os.environ.get("PATH", "")
+        local = results["local_jobs_per_sec"] = run_local(8 * limit, limit, args.seconds)
+        proc, state_file = spawn_daemon(tmp, limit, tcp=args.tcp)
+        try:
+            if not args.json:
+                print(f"Служба: лимит {limit}, задание {args.seconds * 1000:.0f} мс, {results['transport']}; "
+                      f"без службы {local:.1f} заданий/с")
+                print(f"{'клиентов':>9} {'заданий':>8} {'зад/с':>8} {'от локал.':>10} "
+                      f"{'submit p50':>11} {'p95':>8} {'Джейн':>6}")
+            for clients in [int(c) for c in args.clients.split(",") if c.strip()]:
+                run = run_clients(state_file, clients, args.jobs_per_client, args.seconds)
+                run["efficiency"] = run["jobs_per_sec"] / local
+                results["runs"].append(run)
+                if not args.json:
+                    print(f"{run['clients']:>9} {run['jobs']:>8} {run['jobs_per_sec']:>8.1f} "
+                          f"{run['efficiency']:>9.0%} {run['submit_p50_ms']:>9.2f}мс "
+                          f"{run['submit_p95_ms']:>6.2f}мс {run['fairness']:>6.3f}")
+            greedy = run_greedy(state_file, limit, args.seconds, small_clients=limit)
+            results["greedy"] = greedy
+            if not args.json:
+                print(f"Жадный клиент: {greedy['greedy_jobs']} заданий; {greedy['small_clients']} клиентов "
+                      f"по одному заданию ждали до {greedy['small_wait_max_ms']:.0f} мс "
+                      f"(медиана {greedy['small_wait_p50_ms']:.0f} мс, при FIFO ≈ {greedy['fifo_wait_ms']:.0f} мс)")
+        finally:
+            stop_daemon(proc, state_file)
+
+    ok = all(run["ok"] for run in results["runs"]) and results["greedy"]["ok"]
+    if args.json:
+        print(json.dumps(dict(results, ok=ok), ensure_ascii=False, indent=2))
+    elif not ok:
+        print("Часть заданий завершилась с ошибкой.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Бенчмарк лога: построчная вставка в ScrolledText из рабочего потока
+(как было раньше) против очереди LogSink + пакетного TextLogView.
+
+    python benchmarks/bench_logsink.py [-n 20000]
+
+Измеряется скорость (строк/с) и задержка цикла событий Tk: таймер
+каждые 10 мс записывает, насколько позже он сработал. Нужен дисплей.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tkinter as tk  # noqa: E402
+from tkinter import scrolledtext  # noqa: E402
+
+from wimcore.logsink import LogSink, TextLogView  # noqa: E402
+
+TICK_MS = 10
+
+
+def run(mode, lines):
+    root = tk.Tk()
+    text = scrolledtext.ScrolledText(root, height=10)
+    text.pack()
+    text.configure(state="disabled")
+
+    lags = []
+    done = threading.Event()
+    result = {}
+
+    def heartbeat(expected):
+        now = time.perf_counter()
+        lags.append(max(0.0, now - expected))
+        if done.is_set():
+            if mode == "batched" and sink.pending():
+                root.after(TICK_MS, heartbeat, time.perf_counter() + TICK_MS / 1000)
+                return
+            result["elapsed"] = now - result["start"]
+            root.quit()
+            return
+        root.after(TICK_MS, heartbeat, time.perf_counter() + TICK_MS / 1000)
+
+    if mode == "per-line":
+        def log(line):
+            text.configure(state="normal")
+            text.insert("end", line + "\n")
+            text.see("end")
+            text.configure(state="disabled")
+    else:
+        sink = LogSink()
+        view = TextLogView(text, sink)
+        view.schedule(root)
+        log = sink.write
+
+    def producer():
+        for i in range(lines):
+            log(f"[{i:06d}] Writing resources: {i} MiB of {lines} MiB")
+        done.set()
+
+    def start():
+        result["start"] = time.perf_counter()
+        threading.Thread(target=producer, daemon=True).start()
+        root.after(TICK_MS, heartbeat, time.perf_counter() + TICK_MS / 1000)
+
+    root.after(100, start)
+    root.mainloop()
+    root.destroy()
+
+    lag_ms = sorted(x * 1000 for x in lags) or [0.0]
+    p95 = lag_ms[int(len(lag_ms) * 0.95) - 1] if len(lag_ms) > 1 else lag_ms[0]
+    print(f"{mode:<10} {lines / result['elapsed']:12,.0f} строк/с   "
+          f"задержка цикла: медиана {statistics.median(lag_ms):7.2f} мс, "
+          f"p95 {p95:7.2f} мс, макс {lag_ms[-1]:7.2f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--lines", type=int, default=20000)
+    args = parser.parse_args()
+    try:
+        tk.Tk().destroy()
+    except tk.TclError as e:
+        print(f"Tk недоступен ({e}) – бенчмарк пропущен.")
+        return
+    run("per-line", args.lines)
+    run("batched", args.lines)
+
+
+if __name__ == "__main__":
+    main()
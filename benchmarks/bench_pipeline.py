@@ -0,0 +1,229 @@
+"""
+Бенчмарк и регрессионная проверка конвейера команд на заглушках DISM/wimlib.
+
+    python benchmarks/bench_pipeline.py [--quick] [--update-baseline] [--baseline FILE]
+
+Без дисплея и без настоящих инструментов: методы mount_wim, unmount_wim,
+show_wim_indexes и run_command_async вызываются у WimManagerApp, собранного
+без окна (benchmarks/headless.py), а команды выполняют заглушки из
+benchmarks/stubs. Измеряются:
+
+- задержка постановки: от run_command_async до запуска процесса и до
+  обработки завершения «в потоке Tk»;
+- пропускная способность вывода (строк/с через лог и мост UiBridge) и
+  пиковая память Python на этом прогоне;
+- масштабирование: N одновременных заданий заданной длительности;
+- полные действия GUI: монтирование, размонтирование, список индексов.
+
+Результат сравнивается с benchmarks/baselines/pipeline.json: для каждой
+метрики задано направление и допуск. При выходе за допуск код возврата 1.
+--update-baseline записывает текущие значения как новый эталон.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.headless import STUBS, HeadlessApp, tk_available  # noqa: E402
+from benchmarks.synthwim import write_wim  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "pipeline.json")
+
+# метрика -> (направление, допуск): "lower" – меньше лучше, "higher" – больше лучше.
+# Допуски широкие: эталон снимается на другой машине, ловим заметные регрессии.
+METRICS = {
+    "dispatch_p50_ms": ("lower", 1.0),
+    "dispatch_p95_ms": ("lower", 1.5),
+    "roundtrip_p50_ms": ("lower", 1.0),
+    "output_lines_per_sec": ("higher", 0.5),
+    "output_peak_mb": ("lower", 0.5),
+    "scaling_efficiency": ("higher", 0.3),
+    "mount_ms": ("lower", 1.0),
+    "unmount_ms": ("lower", 1.0),
+    "indexes_native_ms": ("lower", 2.0),
+    "indexes_backend_ms": ("lower", 1.0),
+}
+# запас в миллисекундах для маленьких значений (дрожание планировщика ОС)
+ABSOLUTE_SLACK_MS = 20.0
+
+
+def stub_cmd(tool, *args, **options):
+    return [os.path.join(STUBS, tool)] + list(args) + [f"--stub-{k.replace('_', '-')}={v}"
+                                                       for k, v in options.items()]
+
+
+def run_job(h, cmd, **kwargs):
+    jobs = h.run(lambda: h.app.run_command_async(cmd, "bench", show_message=False, **kwargs))
+    return jobs[0]
+
+
+def bench_dispatch(h, count):
+    dispatch, roundtrip = [], []
+    for _ in range(count):
+        t0 = time.time()
+        p0 = time.perf_counter()
+        job = run_job(h, stub_cmd("wimlib-imagex", "info", "x.wim", seconds=0))
+        roundtrip.append((time.perf_counter() - p0) * 1000)
+        dispatch.append((job.started_at - t0) * 1000)
+    return {
+        "dispatch_p50_ms": statistics.median(dispatch),
+        "dispatch_p95_ms": sorted(dispatch)[int(len(dispatch) * 0.95) - 1],
+        "roundtrip_p50_ms": statistics.median(roundtrip),
+    }
+
+
+def bench_output(h, lines):
+    steps = 100
+    cmd = stub_cmd("wimlib-imagex", "apply", "x.wim", "1", "/tmp", seconds=0, steps=steps,
+                   lines=max(1, lines // steps))
+    before = h.log_lines
+    t0 = time.perf_counter()
+    job = run_job(h, cmd)
+    elapsed = time.perf_counter() - t0
+    received = h.log_lines - before
+
+    tracemalloc.start()
+    run_job(h, cmd)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "output_lines_per_sec": received / elapsed if job.success else 0.0,
+        "output_peak_mb": peak / (1 << 20),
+    }
+
+
+def bench_scaling(h, counts, seconds):
+    """Эффективность = идеальное время / фактическое при лимите wimlib из планировщика."""
+    limit = h.app.scheduler.limits.get("wimlib", 1)
+    results = {}
+    for count in counts:
+        cmd = stub_cmd("wimlib-imagex", "apply", "x.wim", "1", "/tmp", seconds=seconds)
+        t0 = time.perf_counter()
+        jobs = h.run(lambda: [h.app.run_command_async(cmd, "bench", show_message=False, backend="wimlib")
+                              for _ in range(count)])
+        elapsed = time.perf_counter() - t0
+        waves = -(-count // limit)
+        results[count] = (waves * seconds / elapsed) if all(j.success for j in jobs) else 0.0
+    return results
+
+
+def bench_gui_actions(h, tmp, repeat):
+    app = h.app
+    wim = os.path.join(tmp, "bench.wim")
+    write_wim(wim, image_count=3)
+    broken = os.path.join(tmp, "external.wim")
+    with open(broken, "wb") as f:
+        f.write(b"not a wim" * 100)     # встроенный парсер не разберёт – пойдёт wimlib info
+    mount_dir = os.path.join(tmp, "mnt")
+    os.makedirs(mount_dir, exist_ok=True)
+
+    os.environ["STUB_SECONDS"] = "0"
+    samples = {"mount_ms": [], "unmount_ms": [], "indexes_native_ms": [], "indexes_backend_ms": []}
+    try:
+        for _ in range(repeat):
+            app.wim_path_var.set(wim)
+            app.mount_path_var.set(mount_dir)
+            for key, action in (("mount_ms", app.mount_wim), ("unmount_ms", app.unmount_wim),
+                                ("indexes_native_ms", app.show_wim_indexes)):
+                t0 = time.perf_counter()
+                h.run(action)
+                samples[key].append((time.perf_counter() - t0) * 1000)
+            app.wim_path_var.set(broken)
+            app.meta_cache.clear()
+            t0 = time.perf_counter()
+            h.run(app.show_wim_indexes)
+            samples["indexes_backend_ms"].append((time.perf_counter() - t0) * 1000)
+    finally:
+        os.environ.pop("STUB_SECONDS", None)
+    errors = [c for c in h.messages.calls if c[0] in ("showerror", "showwarning")]
+    if errors:
+        raise RuntimeError(f"действия GUI завершились ошибкой: {errors[:3]}")
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+
+def compare(results, baseline):
+    failures = []
+    for name, value in results.items():
+        if name not in METRICS or name not in baseline:
+            continue
+        direction, tolerance = METRICS[name]
+        base = baseline[name]
+        slack = ABSOLUTE_SLACK_MS if name.endswith("_ms") else 0.0
+        if direction == "lower":
+            limit = base * (1 + tolerance) + slack
+            bad = value > limit
+        else:
+            limit = base * (1 - tolerance)
+            bad = value < limit
+        mark = "FAIL" if bad else "ok  "
+        print(f"{mark}  {name:<22} {value:12.2f}   эталон {base:10.2f}   граница {limit:10.2f}")
+        if bad:
+            failures.append(name)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quick", action="store_true", help="меньше повторов (для CI)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="напечатать результаты в JSON")
+    args = parser.parse_args()
+
+    if os.name == "nt":
+        print("Заглушки рассчитаны на POSIX – бенчмарк пропущен.")
+        return 0
+    if not tk_available():
+        print("tkinter недоступен – бенчмарк пропущен.")
+        return 0
+
+    repeat = 10 if args.quick else 30
+    h = HeadlessApp(backend="wimlib")
+    tmp = os.environ["XDG_CACHE_HOME"]
+    try:
+        results = {}
+        results.update(bench_dispatch(h, repeat))
+        results.update(bench_output(h, 20_000 if args.quick else 100_000))
+        scaling = bench_scaling(h, (1, 4, 16), seconds=0.3 if args.quick else 0.5)
+        results["scaling_efficiency"] = scaling[16]
+        results.update(bench_gui_actions(h, tmp, 3 if args.quick else 10))
+    finally:
+        h.close()
+
+    for count, efficiency in scaling.items():
+        print(f"      масштабирование: {count:>2} заданий – эффективность {efficiency:.2f}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": f"{platform.system()} {platform.machine()}, "
+                                  f"Python {platform.python_version()}, {os.cpu_count()} CPU",
+                       "metrics": {k: round(v, 3) for k, v in results.items()}}, f, indent=2)
+            f.write("\n")
+        print(f"Эталон записан: {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        print(f"Нет эталона {args.baseline} – запустите с --update-baseline.")
+        for name, value in results.items():
+            print(f"      {name:<22} {value:12.2f}")
+        return 0
+    print(f"Эталон: {baseline.get('machine', '?')}")
+    failures = compare(results, baseline.get("metrics", {}))
+    print("Регрессий нет." if not failures else f"Регрессии: {', '.join(failures)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
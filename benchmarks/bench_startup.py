@@ -0,0 +1,55 @@
+"""
+Время запуска GUI: до первого кадра (first-frame) и до готовности к работе
+(interactive – инструменты найдены, статус обновлён).
+
+    python benchmarks/bench_startup.py [-n 10]
+
+Запускает WIMManager-Cicada3301.py с --startup-timing --exit-after-startup
+и собирает отметки, которые программа печатает в stderr. Нужен дисплей.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "WIMManager-Cicada3301.py")
+MARK_RE = re.compile(r"\[startup\] ([\w-]+): ([\d.]+) ms")
+STAGES = ("imports", "window-created", "first-frame", "interactive")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        import tkinter
+        tkinter.Tk().destroy()
+    except Exception as e:
+        print(f"Tk недоступен ({e}) – бенчмарк пропущен.")
+        return 0
+
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(args.repeat):
+        result = subprocess.run([sys.executable, APP, "--startup-timing", "--exit-after-startup"],
+                                cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, timeout=60)
+        for stage, ms in MARK_RE.findall(result.stderr):
+            if stage in samples:
+                samples[stage].append(float(ms))
+
+    for stage in STAGES:
+        values = samples[stage]
+        if values:
+            print(f"{stage:<15} медиана {statistics.median(values):8.1f} мс   "
+                  f"мин {min(values):8.1f}   макс {max(values):8.1f}   (n={len(values)})")
+        else:
+            print(f"{stage:<15} нет данных")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Сравнение обслуживания без монтирования (`wimlib-imagex update` с пакетом
+команд) и цикла mountrw -> копирование -> unmount --commit.
+
+    python benchmarks/bench_update.py образ.wim [--index 1] [--files 50] [--size-kb 64]
+
+Работает на копии образа. Нужен wimlib-imagex; путь через монтирование
+замеряется только там, где wimlib умеет монтировать (Linux с FUSE).
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wimcore.backend import find_wimlib  # noqa: E402
+from wimcore.installer import add_to_path, installed_wimlib_dir  # noqa: E402
+from wimcore.update import UpdateBatch, update_cmd  # noqa: E402
+
+
+def make_payload(root, files, size):
+    os.makedirs(root, exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(root, f"file{i:04d}.bin"), "wb") as f:
+            f.write(os.urandom(size))
+    return root
+
+
+def timed(cmd, **kwargs):
+    t0 = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT, **kwargs)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("wim")
+    parser.add_argument("--index", type=int, default=1)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    # wimlib, установленный через программу, – как в GUI и службе
+    if installed_wimlib_dir():
+        add_to_path(installed_wimlib_dir())
+    wimlib = find_wimlib()
+    if not wimlib:
+        print("wimlib-imagex не найден – бенчмарк пропущен.")
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        payload = make_payload(os.path.join(tmp, "payload"), args.files, args.size_kb * 1024)
+
+        # 1. update одним пакетом
+        wim_a = os.path.join(tmp, "a.wim")
+        shutil.copyfile(args.wim, wim_a)
+        batch = UpdateBatch()
+        batch.add(payload, "/bench-payload")
+        batch.delete("/bench-payload/file0000.bin")
+        cmd_file = batch.write_command_file(os.path.join(tmp, "cmds.txt"))
+        with open(cmd_file, "rb") as stdin:
+            t_update = timed([wimlib] + update_cmd(wim_a, args.index)[1:], stdin=stdin)
+        print(f"update (без монтирования): {t_update:8.2f} с")
+
+        # 2. mountrw -> копирование -> unmount --commit
+        if os.name == "nt":
+            print("mount/commit через wimlib в Windows не поддерживается – сравните с DISM вручную.")
+            return 0
+        wim_b = os.path.join(tmp, "b.wim")
+        shutil.copyfile(args.wim, wim_b)
+        mnt = os.path.join(tmp, "mnt")
+        os.makedirs(mnt)
+        t0 = time.perf_counter()
+        try:
+            subprocess.run([wimlib, "mountrw", wim_b, str(args.index), mnt], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        except subprocess.CalledProcessError:
+            print("mountrw недоступен (нет FUSE?) – сравнение пропущено.")
+            return 0
+        shutil.copytree(payload, os.path.join(mnt, "bench-payload"))
+        os.remove(os.path.join(mnt, "bench-payload", "file0000.bin"))
+        subprocess.run([wimlib, "unmount", mnt, "--commit"], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        t_mount = time.perf_counter() - t0
+        print(f"mountrw + commit:          {t_mount:8.2f} с")
+        print(f"ускорение:                 {t_mount / t_update:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Масштабирование проверки целостности (wimcore.verify) по числу процессов.
+
+    python benchmarks/bench_verify.py [путь.wim] [--size-mb 1024] [--workers 1,2,4,8]
+
+Без пути генерируется синтетический несжатый WIM с таблицей целостности.
+Повторные прогоны читают файл из кэша ОС, поэтому замер показывает
+скорость хеширования, а не диска; для «холодного» чтения сбросьте кэш.
+Для сравнения печатается `wimlib-imagex verify`, если он найден.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthwim import write_wim, random_blobs  # noqa: E402
+from wimcore.verify import verify_wim  # noqa: E402
+from shutil import which  # noqa: E402
+
+
+def default_workers():
+    counts, n = [], 1
+    cpus = os.cpu_count() or 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    counts.append(cpus)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("wim", nargs="?")
+    parser.add_argument("--size-mb", type=int, default=1024, help="размер синтетического WIM")
+    parser.add_argument("--workers", default=None, help="список, например 1,2,4,8")
+    args = parser.parse_args()
+
+    workers = [int(w) for w in args.workers.split(",")] if args.workers else default_workers()
+
+    tmp = None
+    wim = args.wim
+    if not wim:
+        tmp = tempfile.TemporaryDirectory()
+        wim = os.path.join(tmp.name, "synthetic.wim")
+        write_wim(wim, blobs=random_blobs(args.size_mb, 1024 * 1024))
+        print(f"Синтетический WIM: {wim} ({os.path.getsize(wim):,} байт)")
+
+    verify_wim(wim, workers=1, resume=False)   # прогрев кэша ОС
+    base = None
+    for count in workers:
+        report = verify_wim(wim, workers=count, resume=False)
+        base = base or report.elapsed
+        print(f"процессов {count:>3}: {report.elapsed:8.2f} с  {report.throughput:9.1f} МБ/с  "
+              f"ускорение {base / report.elapsed:5.2f}x" + ("" if report.ok else "  ПОВРЕЖДЕНИЯ"))
+
+    if which("wimlib-imagex"):
+        t0 = time.perf_counter()
+        subprocess.run(["wimlib-imagex", "verify", wim], stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        print(f"wimlib-imagex verify: {time.perf_counter() - t0:8.2f} с")
+    else:
+        print("wimlib-imagex не найден — сравнение пропущено.")
+
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Микробенчмарк: встроенный парсер wimcore.wiminfo против запуска
+`wimlib-imagex info` / `dism /Get-WimInfo`.
+
+    python benchmarks/bench_wiminfo.py [путь.wim] [-n 50]
+
+Без пути генерируется синтетический WIM. Если ни wimlib, ни DISM не
+найдены, замеряется только встроенный парсер.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthwim import write_wim, random_blobs  # noqa: E402
+from wimcore.wiminfo import read_wim_info  # noqa: E402
+from shutil import which  # noqa: E402
+
+
+def timeit(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def report(name, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{name:<28} median {statistics.median(ms):9.3f} ms   "
+          f"min {min(ms):9.3f} ms   max {max(ms):9.3f} ms   (n={len(ms)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("wim", nargs="?")
+    parser.add_argument("-n", "--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    tmp = None
+    wim = args.wim
+    if not wim:
+        tmp = tempfile.TemporaryDirectory()
+        wim = os.path.join(tmp.name, "synthetic.wim")
+        write_wim(wim, image_count=11, blobs=random_blobs(64, 256 * 1024))
+        print(f"Синтетический WIM: {wim} ({os.path.getsize(wim):,} байт)")
+
+    report("native (wimcore.wiminfo)", timeit(lambda: read_wim_info(wim), args.repeat))
+
+    if which("wimlib-imagex"):
+        cmd = ["wimlib-imagex", "info", wim]
+    elif os.name == "nt" and which("dism.exe"):
+        cmd = ["dism", "/English", "/Get-WimInfo", f"/WimFile:{wim}"]
+    else:
+        cmd = None
+
+    if cmd:
+        repeat = max(1, min(args.repeat, 10))
+        report(f"subprocess ({cmd[0]})",
+               timeit(lambda: subprocess.run(cmd, stdout=subprocess.DEVNULL,
+                                             stderr=subprocess.DEVNULL), repeat))
+    else:
+        print("wimlib-imagex / DISM не найдены — subprocess-путь пропущен.")
+
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
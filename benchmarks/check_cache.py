@@ -0,0 +1,87 @@
+"""
+Проверка кэша метаданных (wimcore.cache): параллельные записи из многих
+потоков не портят файл, сохранения откладываются и объединяются, счётчик
+размера совпадает с пересчётом, а вытеснение держит лимит байт.
+
+    python benchmarks/check_cache.py
+
+Печатает результаты проверок и завершается с кодом 1 при расхождениях.
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.check_engine import Checks  # noqa: E402
+from wimcore.cache import MetadataCache  # noqa: E402
+
+
+def main():
+    c = Checks()
+    with tempfile.TemporaryDirectory() as tmp:
+        wims = []
+        for i in range(40):
+            path = os.path.join(tmp, f"{i}.wim")
+            with open(path, "wb") as f:
+                f.write(b"x" * i)
+            wims.append(path)
+
+        cache_file = os.path.join(tmp, "cache.json")
+        cache = MetadataCache(cache_file, max_entries=1000, max_bytes=0, save_delay=0.2)
+        errors = []
+
+        def writer(n):
+            try:
+                for i, wim in enumerate(wims):
+                    cache.put_output(wim, f"b{n}", f"вывод {n}/{i}")
+            except Exception as e:      # noqa: BLE001 – любое исключение потока – провал
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        c.check("параллельные записи без исключений", not errors, repr(errors[:1]))
+        c.check("сохранения отложены", cache.saves <= 1, f"сохранений {cache.saves} на {8 * len(wims)} записей")
+        time.sleep(0.5)
+        c.check("отложенное сохранение выполнено", cache.saves >= 1 and not cache._dirty)
+        with open(cache_file, encoding="utf-8") as f:
+            data = json.load(f)
+        c.check("файл цел и полон", len(data["entries"]) == len(wims)
+                and all(len(e["outputs"]) == 8 for e in data["entries"]))
+        leftovers = [n for n in os.listdir(tmp) if n.endswith(".tmp")]
+        c.check("временных файлов не осталось", not leftovers, str(leftovers))
+
+        recount = sum(len(json.dumps(e, ensure_ascii=False)) for e in cache._entries.values())
+        c.check("счётчик размера", cache._total_bytes == recount, f"{cache._total_bytes} != {recount}")
+
+        reloaded = MetadataCache(cache_file)
+        c.check("перечитывание", reloaded.get_output(wims[5], "b3") == "вывод 3/5")
+
+        # лимит по размеру: вытесняются старые записи, счётчик не расходится
+        small = MetadataCache(os.path.join(tmp, "small.json"), max_entries=1000, max_bytes=2000)
+        for wim in wims:
+            small.put_output(wim, "wimlib", "z" * 200)
+        recount = sum(len(json.dumps(e, ensure_ascii=False)) for e in small._entries.values())
+        c.check("лимит байт", 0 < recount <= 2000 and small._total_bytes == recount,
+                f"{len(small._entries)} записей, {recount} байт")
+        c.check("вытеснены старые", small.get_output(wims[0], "wimlib") is None
+                and small.get_output(wims[-1], "wimlib") is not None)
+
+        # flush при выходе: изменение без ожидания таймера
+        lazy = MetadataCache(os.path.join(tmp, "lazy.json"), save_delay=60)
+        lazy.put_output(wims[1], "dism", "x")
+        lazy.flush()
+        c.check("flush", MetadataCache(lazy.cache_file).get_output(wims[1], "dism") == "x")
+
+    print("Все проверки пройдены." if not c.failures else f"Расхождений: {len(c.failures)}")
+    return 1 if c.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
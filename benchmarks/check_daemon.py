@@ -0,0 +1,175 @@
+"""
+Проверка фоновой службы заданий (wimcore.daemon) и тонких клиентов
+(wimcore.client) на заглушках из benchmarks/stubs.
+
+    python benchmarks/check_daemon.py
+
+Служба запускается отдельным процессом с лимитом 1 задание, чтобы порядок
+запуска был предсказуем. Только POSIX. Печатает результаты проверок и
+завершается с кодом 1 при расхождениях.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_daemon import ROOT, spawn_daemon, stop_daemon  # noqa: E402
+from benchmarks.check_engine import STUBS, Checks, stub, wait_for  # noqa: E402
+from benchmarks.synthwim import write_wim  # noqa: E402
+from wimcore import daemon as dm  # noqa: E402
+from wimcore.client import DaemonClient, RemoteMetadataCache, RemoteScheduler, RemoteToolRegistry  # noqa: E402
+from wimcore.jobs import CANCELLED, DONE, FAILED, Job  # noqa: E402
+
+
+def raw_call(address, message):
+    """Запрос без hello – напрямую в сокет."""
+    kind, target = dm.parse_address(address)
+    sock = socket.socket(socket.AF_UNIX) if kind == "unix" else socket.create_connection(target)
+    if kind == "unix":
+        sock.connect(target)
+    with sock:
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        return json.loads(sock.makefile("rb").readline())
+
+
+def main():
+    if os.name == "nt":
+        print("Заглушки работают только в POSIX – пропуск.")
+        return 0
+    c = Checks()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, state_file = spawn_daemon(tmp, 1)
+        try:
+            state = dm.read_daemon_file(state_file)
+            c.check("daemon.json только для владельца", os.stat(state_file).st_mode & 0o077 == 0,
+                    oct(os.stat(state_file).st_mode))
+
+            reply = raw_call(state["address"], {"jsonrpc": "2.0", "id": 1, "method": "ping"})
+            c.check("без hello – отказ", reply.get("error", {}).get("code") == dm.UNAUTHORIZED, str(reply))
+            try:
+                DaemonClient(state["address"], "не тот токен")
+                c.check("неверный токен", False)
+            except dm.DaemonError as e:
+                c.check("неверный токен", e.code == dm.UNAUTHORIZED, str(e))
+
+            client = DaemonClient.connect("check", state_file=state_file)
+            try:
+                client.call("submit", cmd=["sh", "-c", "true"])
+                c.check("посторонняя команда", False)
+            except dm.DaemonError as e:
+                c.check("посторонняя команда", e.code == dm.NOT_ALLOWED, str(e))
+            # то же имя файла, но не тот путь, что в реестре службы
+            fake = os.path.join(tmp, "x", "wimlib-imagex")
+            os.makedirs(os.path.dirname(fake))
+            with open(fake, "w") as f:
+                f.write("#!/bin/sh\nexit 0\n")
+            os.chmod(fake, 0o755)
+            try:
+                client.call("submit", cmd=[fake, "--version"])
+                c.check("чужой путь с разрешённым именем", False)
+            except dm.DaemonError as e:
+                c.check("чужой путь с разрешённым именем", e.code == dm.NOT_ALLOWED, str(e))
+            try:
+                client.call("submit", cmd=stub("wimlib-imagex", "verify", "a.wim"), locks="wim:a")
+                c.check("locks строкой", False)
+            except dm.DaemonError as e:
+                c.check("locks строкой", e.code == dm.INVALID_PARAMS, str(e))
+            try:
+                client.call("submit", command=["dism"])
+                c.check("неверные параметры", False)
+            except dm.DaemonError as e:
+                c.check("неверные параметры", e.code == dm.INVALID_PARAMS, str(e))
+
+            registry = RemoteToolRegistry(client)
+            c.check("инструменты службы", registry.path("wimlib") is not None, registry.describe())
+            c.check("бэкенд", client.call("backend", mode="wimlib") == "wimlib")
+
+            # прогресс, строки и финальное состояние
+            scheduler = RemoteScheduler(client)
+            events, lines, progress = [], [], []
+            scheduler.on_change = lambda job: events.append(job.state)
+            job = scheduler.submit(Job("verify", stub("wimlib-imagex", "verify", "a.wim", seconds=0.5, steps=10,
+                                                      lines=1),
+                                       backend="wimlib", on_line=lines.append,
+                                       on_progress=lambda p: progress.append((p.percent, job.state))))
+            c.check("задание выполнено", job.wait(20) and job.state == DONE and "step 10" in job.output,
+                    f"{job.state} {job.output[-200:]!r}")
+            c.check("прогресс пришёл и прорежен", 0 < len(progress) < 10, str(progress))
+            c.check("прогресс раньше завершения", all(state != DONE for _, state in progress))
+            c.check("строки вывода", len(lines) >= 10, str(len(lines)))
+            c.check("состояния", events[0] == "queued" and events[-1] == DONE, str(events))
+
+            # отмена
+            job = scheduler.submit(Job("long", stub("wimlib-imagex", "verify", "b.wim", seconds=30),
+                                       backend="wimlib"))
+            wait_for(lambda: job.state == "running")
+            c.check("отмена", scheduler.cancel(job) and job.wait(10) and job.state == CANCELLED, job.state)
+
+            # честная очередь: при лимите 1 одно задание второго клиента не ждёт всю очередь первого
+            other = RemoteScheduler(DaemonClient.connect("other", state_file=state_file))
+            greedy = [scheduler.submit(Job(f"a{i}", stub("wimlib-imagex", "verify", "c.wim", seconds=0.3),
+                                           backend="wimlib")) for i in range(4)]
+            small = other.submit(Job("b", stub("wimlib-imagex", "verify", "d.wim", seconds=0.3),
+                                     backend="wimlib"))
+            for j in greedy + [small]:
+                j.wait(30)
+            order = [j.name for j in sorted(greedy + [small], key=lambda j: j.started_at)]
+            c.check("чередование клиентов", order.index("b") <= 1, str(order))
+
+            # задания отключившегося клиента доделываются
+            gone = DaemonClient.connect("gone", state_file=state_file)
+            job_id = gone.call("submit", cmd=stub("wimlib-imagex", "verify", "e.wim", seconds=0.5),
+                               backend="wimlib")["job"]
+            gone.close()
+            finished = wait_for(lambda: any(j["job"] == job_id and j["state"] == DONE
+                                            for j in client.call("jobs")), timeout=10)
+            c.check("после отключения клиента", finished)
+
+            # общий кэш метаданных
+            wim = os.path.join(tmp, "install.wim")
+            write_wim(wim, image_count=3)
+            cache = RemoteMetadataCache(client)
+            info = cache.get_info(wim)
+            c.check("разбор WIM службой", info is not None and len(info.images) == 3)
+            cache.put_output(wim, "wimlib", "вывод")
+            c.check("вывод в кэше службы", RemoteMetadataCache(other.client).get_output(wim, "wimlib") == "вывод")
+            c.check("попадание в кэш", "попаданий 1" in cache.stats_text() or
+                    "попаданий 2" in cache.stats_text(), cache.stats_text())
+
+            # CLI через службу
+            env = dict(os.environ, XDG_CACHE_HOME=tmp, PATH=STUBS + os.pathsep + os.environ.get("PATH", ""))
+            out = subprocess.run([sys.executable, "-m", "wimcore", "--daemon", "--backend", "wimlib", "info",
+                                  "--no-native", wim], cwd=ROOT, env=env, capture_output=True, text=True)
+            try:
+                result = json.loads(out.stdout)["results"][0]
+            except (ValueError, LookupError):
+                result = {"ok": False, "output": out.stdout + out.stderr}
+            c.check("CLI --daemon", result["ok"] and "Image Count" in result.get("output", ""),
+                    str(result)[:300])
+
+            # потеря службы: незавершённые задания клиента завершаются ошибкой
+            job = scheduler.submit(Job("orphan", stub("wimlib-imagex", "verify", "f.wim", seconds=30),
+                                       backend="wimlib"))
+            wait_for(lambda: job.state == "running")
+        finally:
+            stop_daemon(proc, state_file)
+        c.check("служба остановлена – ошибка у клиента",
+                job.wait(10) and job.state in (FAILED, CANCELLED), job.state)
+        c.check("daemon.json удалён", not os.path.exists(state_file))
+
+        env = dict(os.environ, XDG_CACHE_HOME=tmp)
+        out = subprocess.run([sys.executable, "-m", "wimcore", "--daemon", "info", "x.wim"],
+                             cwd=ROOT, env=env, capture_output=True, text=True)
+        c.check("CLI без службы – код 2", out.returncode == 2 and "не запущена" in out.stdout, out.stdout)
+
+    print("Все проверки пройдены." if not c.failures else f"Расхождений: {len(c.failures)}")
+    return 1 if c.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Проверка оценок wimcore.dedup на синтетических WIM: обычные блобы и
+solid-ресурс (как в ESD), где сжатый размер блобов берётся долей ресурса.
+
+    python benchmarks/check_dedup.py
+
+Печатает результаты проверок и завершается с кодом 1 при расхождениях.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.check_engine import Checks  # noqa: E402
+from benchmarks.synthwim import write_wim  # noqa: E402
+from wimcore.dedup import DedupAnalyzer, analyze_wims  # noqa: E402
+
+BLOB_SIZE = 64 * 1024
+
+
+def main():
+    c = Checks()
+    blobs = [os.urandom(BLOB_SIZE) for _ in range(12)]
+    data = len(blobs) * BLOB_SIZE
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "plain.wim")
+        write_wim(plain, image_count=1, blobs=blobs, integrity=False)
+        esd = os.path.join(tmp, "solid.esd")
+        write_wim(esd, image_count=1, blobs=blobs[:8], integrity=False, solid=True)
+        esd2 = os.path.join(tmp, "solid2.esd")
+        write_wim(esd2, image_count=1, blobs=blobs[4:], integrity=False, solid=True)
+
+        report = analyze_wims([esd])
+        stats = report.sources[0]
+        c.check("запись solid-ресурса – не блоб", report.distinct_blobs == 8 + 1 and stats.solid_blobs == 8,
+                f"блобов {report.distinct_blobs}, solid {stats.solid_blobs}")
+        # исходный размер вдвое больше данных: доля ресурса – сами данные
+        solid_stored = report.distinct_stored - stats.metadata_bytes
+        c.check("сжатый размер solid-блобов – доля ресурса", abs(solid_stored - 8 * BLOB_SIZE) <= 8,
+                f"{solid_stored} != {8 * BLOB_SIZE}")
+        c.check("оценка не больше файла", report.merged_size <= report.total_files * 1.05,
+                f"{report.merged_size} > {report.total_files}")
+        c.check("пометка в отчёте", "solid" in report.describe(), report.describe())
+
+        report = analyze_wims([esd, esd2])
+        c.check("пересечение двух ESD", report.distinct_blobs == 12 + 2 and report.savings > 0,
+                f"блобов {report.distinct_blobs}, экономия {report.savings}")
+        c.check("объединённый ESD ~ данные", abs(report.merged_size - data) < data * 0.05,
+                f"{report.merged_size} против {data}")
+
+        analyzer = DedupAnalyzer()
+        analyzer.add_wim(plain)
+        report = analyzer.report()
+        c.check("обычный WIM без пометки", report.sources[0].solid_blobs == 0 and "solid" not in report.describe())
+
+    print("Все проверки пройдены." if not c.failures else f"Расхождений: {len(c.failures)}")
+    return 1 if c.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
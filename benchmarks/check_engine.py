@@ -0,0 +1,206 @@
+"""
+Проверка движка заданий (wimcore.engine + JobScheduler) на заглушках
+dism / wimlib-imagex из benchmarks/stubs.
+
+    python benchmarks/check_engine.py
+
+Только POSIX. Печатает результаты проверок и завершается с кодом 1 при
+расхождениях.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wimcore.jobs import (CANCELLED, DONE, FAILED, TIMEOUT, Job, JobScheduler,  # noqa: E402
+                          wim_lock)
+from wimcore.uibridge import UiBridge  # noqa: E402
+
+STUBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+
+
+def stub(tool, *args, **options):
+    """Команда запуска заглушки; параметры STUB_* – аргументами --stub-...=."""
+    settings = [f"--stub-{k.replace('_', '-')}={v}" for k, v in options.items()]
+    return [os.path.join(STUBS, tool)] + list(args) + settings
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # зомби считается завершённым
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+class Checks:
+    def __init__(self):
+        self.failures = []
+
+    def check(self, name, ok, detail=""):
+        if ok:
+            print(f"ok    {name}")
+        else:
+            self.failures.append(name)
+            print(f"FAIL  {name} {detail}")
+
+
+def check_basic(c, scheduler):
+    progress, lines = [], []
+    job = scheduler.submit(Job("mountrw", stub("wimlib-imagex", "mountrw", "a.wim", "1", "/mnt/x",
+                                               seconds=0.1, steps=10, lines=1),
+                               backend="wimlib", on_progress=progress.append, on_line=lines.append))
+    c.check("успешное задание", job.wait(10) and job.state == DONE and job.code == 0,
+            f"{job.state} {job.code} {job.output[-200:]}")
+    c.check("прогресс wimlib", progress and progress[-1].percent == 100.0 and progress[-1].total_bytes,
+            str(progress[-1:]))
+    c.check("строки вывода", len(lines) == 10, str(len(lines)))
+
+    progress = []
+    job = scheduler.submit(Job("dism", stub("dism", "/Mount-Wim", seconds=0.05, steps=5),
+                               backend="dism", on_progress=progress.append))
+    c.check("прогресс DISM", job.wait(10) and job.success and progress and progress[-1].percent == 100.0,
+            job.output[-200:])
+
+    job = scheduler.submit(Job("fail", stub("wimlib-imagex", "apply", exit=5, seconds=0)))
+    c.check("код возврата", job.wait(10) and job.state == FAILED and job.code == 5, f"{job.state} {job.code}")
+
+    job = scheduler.submit(Job("missing", ["/nonexistent/wimlib-imagex"]))
+    c.check("ошибка запуска", job.wait(10) and job.state == FAILED and job.error is not None, job.state)
+
+
+def check_cancel(c, scheduler, tmp):
+    pidfile = os.path.join(tmp, "pids")
+    job = scheduler.submit(Job("long", stub("wimlib-imagex", "capture", "/src", os.path.join(tmp, "o.wim"), "x",
+                                            seconds=60, child=1, pidfile=pidfile)))
+    wait_for(lambda: os.path.exists(pidfile) and os.path.getsize(pidfile))
+    with open(pidfile) as f:
+        pids = [int(p) for p in f.read().split()]
+    t0 = time.monotonic()
+    scheduler.cancel(job)
+    c.check("отмена", job.wait(10) and job.state == CANCELLED, job.state)
+    c.check("отмена быстрая", time.monotonic() - t0 < 3, f"{time.monotonic() - t0:.2f} с")
+    c.check("дерево процессов снято", wait_for(lambda: not any(alive(p) for p in pids)),
+            str([p for p in pids if alive(p)]))
+
+
+def check_deadlines(c, scheduler):
+    t0 = time.monotonic()
+    job = scheduler.submit(Job("timeout", stub("dism", "/Unmount-Wim", seconds=60), timeout=0.3))
+    c.check("таймаут", job.wait(10) and job.state == TIMEOUT, job.state)
+    c.check("таймаут вовремя", time.monotonic() - t0 < 3, f"{time.monotonic() - t0:.2f} с")
+
+    lock = wim_lock("/images/deadline.wim")
+    first = scheduler.submit(Job("first", stub("wimlib-imagex", "optimize", seconds=1), locks=[lock]))
+    second = scheduler.submit(Job("second", stub("wimlib-imagex", "optimize", seconds=0), locks=[lock],
+                                  deadline=time.monotonic() + 0.3))
+    c.check("дедлайн в очереди", second.wait(10) and second.state == TIMEOUT and second.started_at is None,
+            f"{second.state} {second.started_at}")
+    c.check("первое задание не задето", first.wait(10) and first.state == DONE, first.state)
+
+
+def check_locks(c, scheduler):
+    lock = wim_lock("/images/serial.wim")
+    jobs = [scheduler.submit(Job(f"serial{i}", stub("wimlib-imagex", "export", seconds=0.2), locks=[lock]))
+            for i in range(3)]
+    for job in jobs:
+        job.wait(10)
+    spans = sorted((j.started_at, j.finished_at) for j in jobs)
+    overlap = any(b[0] < a[1] - 0.001 for a, b in zip(spans, spans[1:]))
+    c.check("блокировка: строго по очереди", all(j.success for j in jobs) and not overlap, str(spans))
+
+
+def check_await(c, scheduler, count=40):
+    async def main():
+        jobs = [scheduler.submit(Job(f"a{i}", stub("wimlib-imagex", "info", "x.wim", seconds=0)))
+                for i in range(count)]
+        return await asyncio.gather(*jobs)
+
+    t0 = time.perf_counter()
+    done = asyncio.run(main())
+    elapsed = time.perf_counter() - t0
+    c.check(f"await {count} заданий", len(done) == count and all(j.success for j in done))
+    print(f"      {count} заданий за {elapsed:.2f} с ({count / elapsed:.0f} заданий/с)")
+
+
+def check_concurrency(c, scheduler, count=20):
+    before = threading.active_count()
+    peak = [before]
+    jobs = [scheduler.submit(Job(f"c{i}", stub("wimlib-imagex", "apply", seconds=0.5)))
+            for i in range(count)]
+    t0 = time.monotonic()
+    while not all(j.finished for j in jobs):
+        peak[0] = max(peak[0], threading.active_count())
+        time.sleep(0.02)
+    elapsed = time.monotonic() - t0
+    c.check(f"{count} параллельных заданий", all(j.success for j in jobs) and elapsed < 0.5 * count / 2,
+            f"{elapsed:.2f} с")
+    # до Python 3.12 asyncio ждёт каждый подпроцесс своим потоком (ThreadedChildWatcher)
+    if sys.version_info >= (3, 12):
+        c.check("число потоков не растёт с числом заданий", peak[0] - before < count,
+                f"{before} -> {peak[0]}")
+    else:
+        print(f"      потоков: {before} -> {peak[0]} (waitpid-потоки asyncio до Python 3.12)")
+
+
+def check_bridge(c):
+    class FakeRoot:
+        def __init__(self):
+            self.timers = []
+
+        def after(self, ms, fn):
+            self.timers.append(fn)
+
+    bridge, calls = UiBridge(), []
+    for i in range(1000):
+        bridge.post_latest("progress", calls.append, ("p", i))
+    bridge.post(calls.append, ("done",))
+    polled = []
+    bridge.add_poller(lambda: polled.append(1))
+    root = FakeRoot()
+    bridge.schedule(root)
+    root.timers.pop()()
+    c.check("мост: прогресс схлопнут, событие после него", calls == [("p", 999), ("done",)], str(calls))
+    c.check("мост: опрос и перепланирование", polled == [1] and len(root.timers) == 1)
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[1]).parse_args()
+    if os.name == "nt":
+        print("Проверка работает только на POSIX.")
+        return 0
+    c = Checks()
+    scheduler = JobScheduler(limits={"dism": 1, "wimlib": 4}, default_limit=32)
+    with tempfile.TemporaryDirectory() as tmp:
+        check_basic(c, scheduler)
+        check_cancel(c, scheduler, tmp)
+        check_deadlines(c, scheduler)
+        check_locks(c, scheduler)
+        check_await(c, scheduler)
+        check_concurrency(c, scheduler)
+    check_bridge(c)
+    print("Все проверки пройдены." if not c.failures else f"Расхождений: {len(c.failures)}")
+    return 1 if c.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
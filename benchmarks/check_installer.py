@@ -0,0 +1,190 @@
+"""
+Проверка установщика wimlib (wimcore.installer) на локальных подменах
+сервера загрузки: HTTP на localhost с докачкой через Range, сервер без
+поддержки Range и file://.
+
+    python benchmarks/check_installer.py
+
+Архив – настоящий zip с файлом wimlib-imagex. Печатает результаты проверок
+и завершается с кодом 1 при расхождениях.
+"""
+import hashlib
+import http.server
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# данные установщика – во временном каталоге, до импорта wimcore
+_DATA = tempfile.TemporaryDirectory()
+os.environ["XDG_CACHE_HOME"] = _DATA.name
+os.environ["APPDATA"] = _DATA.name
+
+from benchmarks.check_engine import Checks  # noqa: E402
+from wimcore import installer  # noqa: E402
+from wimcore.settings import load_settings, update_settings  # noqa: E402
+
+
+def make_archive():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("wimlib-1.14.4/wimlib-imagex", "#!/bin/sh\necho wimlib-imagex\n")
+        z.writestr("wimlib-1.14.4/libwim-15.dll", os.urandom(600 * 1024))
+        z.writestr("wimlib-1.14.4/README.txt", "не распаковывается")
+    return buf.getvalue()
+
+
+ARCHIVE = make_archive()
+DIGEST = hashlib.sha256(ARCHIVE).hexdigest()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Отдаёт ARCHIVE. server.range – понимать Range; server.cut – оборвать первый ответ."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("Range"))
+        start = 0
+        header = self.headers.get("Range")
+        if header and self.server.range:
+            start = int(header.split("=")[1].rstrip("-"))
+            if start >= len(ARCHIVE):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(ARCHIVE) - 1}/{len(ARCHIVE)}")
+        else:
+            self.send_response(200)
+        body = ARCHIVE[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.server.cut:
+            self.server.cut = False
+            self.wfile.write(body[:len(body) // 3])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+def serve(range_ok, cut):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.range, server.cut, server.requests = range_ok, cut, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/wimlib-1.14.4-windows-x86_64-bin.zip"
+
+
+def clean_downloads():
+    downloads = os.path.join(installer.app_data_dir(), "downloads")
+    for name in os.listdir(downloads) if os.path.isdir(downloads) else ():
+        os.remove(os.path.join(downloads, name))
+
+
+def fails(fn, *args, **kwargs):
+    try:
+        fn(*args, **kwargs)
+    except installer.InstallError as e:
+        return str(e)
+    return None
+
+
+def main():
+    c = Checks()
+    tmp = _DATA.name
+
+    # докачка: первый ответ обрывается, второй запрос – с Range и кодом 206
+    server, url = serve(range_ok=True, cut=True)
+    dest = os.path.join(tmp, "range.zip")
+    error = fails(installer.download, url, dest)
+    c.check("обрыв – InstallError, .part сохранён", error is not None and os.path.exists(dest + ".part"), error)
+    installer.download(url, dest)
+    with open(dest, "rb") as f:
+        c.check("докачка через Range", f.read() == ARCHIVE and server.requests[-1] is not None
+                and server.requests[-1] != "bytes=0-", str(server.requests))
+    server.shutdown()
+
+    # сервер без Range: докачка начинается заново и файл не склеивается
+    server, url = serve(range_ok=False, cut=True)
+    dest = os.path.join(tmp, "norange.zip")
+    fails(installer.download, url, dest)
+    installer.download(url, dest)
+    with open(dest, "rb") as f:
+        c.check("без Range – загрузка заново", f.read() == ARCHIVE, str(server.requests))
+    server.shutdown()
+
+    # file://
+    source = os.path.join(tmp, "source", "wimlib-1.14.4-windows-x86_64-bin.zip")
+    os.makedirs(os.path.dirname(source))
+    with open(source, "wb") as f:
+        f.write(ARCHIVE)
+    file_url = pathlib.Path(source).as_uri()
+    dest = os.path.join(tmp, "file.zip")
+    installer.download(file_url, dest)
+    with open(dest, "rb") as f:
+        c.check("file://", f.read() == ARCHIVE)
+
+    # без эталона установка не начинается и ничего не скачивается
+    server, url = serve(range_ok=True, cut=False)
+    error = fails(installer.install_wimlib, url=url, target_dir=os.path.join(tmp, "none"))
+    c.check("нет SHA-256 – отказ", error is not None and "не задана" in error and not server.requests, error)
+
+    # эталон не совпадает – архив удаляется, ничего не распаковано
+    error = fails(installer.install_wimlib, url=url, sha256="0" * 64, target_dir=os.path.join(tmp, "bad"))
+    downloads = os.path.join(installer.app_data_dir(), "downloads")
+    c.check("SHA-256 не совпал – отказ", error is not None and "не совпадает" in error
+            and not os.listdir(downloads) and not os.path.exists(os.path.join(tmp, "bad")), error)
+
+    # эталон из settings.json для другого URL не подходит
+    update_settings(**{installer.SETTINGS_SHA_KEY: {file_url: DIGEST}})
+    error = fails(installer.install_wimlib, url=url, target_dir=os.path.join(tmp, "other"))
+    c.check("эталон привязан к URL", error is not None and "не задана" in error, error)
+
+    # старое значение-строка не используется как эталон
+    update_settings(**{installer.SETTINGS_SHA_KEY: DIGEST})
+    error = fails(installer.install_wimlib, url=url, target_dir=os.path.join(tmp, "legacy"))
+    c.check("строка без URL не эталон", error is not None and "не задана" in error, error)
+
+    # верный эталон – установка и запоминание по URL
+    clean_downloads()
+    target = os.path.join(tmp, "ok")
+    logs = []
+    try:
+        result = installer.install_wimlib(url=url, sha256=DIGEST, target_dir=target, on_log=logs.append)
+    except installer.InstallError as e:
+        result = None
+        logs.append(str(e))
+    c.check("установка", result == target and sorted(os.listdir(target)) == ["libwim-15.dll", "wimlib-imagex"],
+            "\n".join(logs))
+    saved = load_settings().get(installer.SETTINGS_SHA_KEY)
+    c.check("SHA-256 запомнен по URL", saved == {url: DIGEST}, str(saved))
+    c.check("эталон из settings.json", installer.expected_sha256(url) == DIGEST)
+
+    # официальный URL без закреплённого эталона: установка и запоминание суммы
+    clean_downloads()
+    default_url, installer.WIMLIB_URL = installer.WIMLIB_URL, file_url
+    error = fails(installer.install_wimlib, url=file_url, target_dir=os.path.join(tmp, "default"))
+    c.check("официальный URL без эталона – установка", error is None, error)
+    c.check("SHA-256 официального архива запомнен", installer.expected_sha256(file_url) == DIGEST)
+    installer.WIMLIB_URL = default_url
+
+    # закреплённый эталон для file:// через PINNED_SHA256
+    clean_downloads()
+    installer.PINNED_SHA256[file_url] = DIGEST
+    c.check("закреплённый SHA-256", fails(installer.install_wimlib, url=file_url,
+                                         target_dir=os.path.join(tmp, "pinned")) is None)
+    server.shutdown()
+
+    print("Все проверки пройдены." if not c.failures else f"Расхождений: {len(c.failures)}")
+    return 1 if c.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Проверка разбора списков монтирований на записанном выводе DISM и /proc/mounts
+и реакции на код возврата DISM (заглушка из benchmarks/stubs).
+
+    python benchmarks/check_mounts.py
+
+Образцы лежат в benchmarks/fixtures. Печатает расхождения и завершается
+с кодом 1, если они есть.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wimcore import mounts  # noqa: E402
+from wimcore.backend import is_windows  # noqa: E402
+from wimcore.mounts import MountRecord  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DISM_STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs", "dism")
+
+EXPECTED_DISM = [
+    MountRecord("C:\\mount\\install", "D:\\images\\install.wim", 6, True, "Ok", "dism"),
+    MountRecord("C:\\mount\\winre", "D:\\images\\winre.wim", 1, False, "Needs Remount", "dism"),
+    MountRecord("C:\\Users\\build\\AppData\\Local\\Temp\\mnt 3", "E:\\old\\boot.wim", 2, True,
+                "Invalid", "dism"),
+]
+
+EXPECTED_PROC = [
+    MountRecord("/mnt/wim1", "/srv/images/install.wim", 0, True, "Ok", "wimlib"),
+    MountRecord("/mnt/boot ro", "/srv/images/boot disk.wim", 0, False, "Ok", "wimlib"),
+]
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def check(name, actual, expected, failures):
+    if actual == expected:
+        print(f"ok    {name}")
+        return
+    failures.append(name)
+    print(f"FAIL  {name}")
+    print(f"      ожидалось: {expected}")
+    print(f"      получено:  {actual}")
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[1]).parse_args()
+    failures = []
+
+    check("dism: нет монтирований", mounts.parse_dism_mounted(fixture("dism_mounted_none.txt")), [], failures)
+    dism = mounts.parse_dism_mounted(fixture("dism_mounted_mixed.txt"))
+    check("dism: три монтирования", dism, EXPECTED_DISM, failures)
+    proc = mounts.parse_proc_mounts(fixture("proc_mounts.txt"))
+    check("/proc/mounts: только wimlib", proc, EXPECTED_PROC, failures)
+
+    # журнал дополняет индекс; /mnt/wim1 «завис», /mnt/old есть только в журнале
+    tracked = [
+        MountRecord("/mnt/wim1", "/srv/images/install.wim", 3, True, "Ok", "wimlib"),
+        MountRecord("/mnt/old", "/srv/images/old.wim", 1, False, "Ok", "wimlib"),
+    ]
+    states = {"/mnt/wim1": "stale", "/mnt/boot ro": "ok"}
+    annotated = mounts.annotate(proc, tracked, dir_state=lambda p: states.get(p, "missing"),
+                                file_exists=lambda p: True)
+    check("annotate: статусы", [(r.mount_dir, r.index, r.status) for r in annotated], [
+        ("/mnt/wim1", 3, mounts.STATUS_STALE),
+        ("/mnt/boot ro", 0, mounts.STATUS_OK),
+        ("/mnt/old", 1, mounts.STATUS_ORPHANED),
+    ], failures)
+
+    diff = mounts.diff_records(proc, annotated)
+    check("diff: добавлено/изменено/удалено",
+          ([r.mount_dir for r in diff.added], [r.mount_dir for r in diff.changed],
+           [r.mount_dir for r in diff.removed]),
+          (["/mnt/old"], ["/mnt/wim1"], []), failures)
+    check("diff: без изменений", bool(mounts.diff_records(annotated, list(annotated))), False, failures)
+
+    repairs = mounts.plan_repairs(annotated)
+    check("repairs: wimlib", [(a.cmd, a.mount_dir) for a in repairs], [
+        (["fusermount", "-u", "-z", "/mnt/wim1"], "/mnt/wim1"),
+        (None, "/mnt/old"),
+    ], failures)
+    if is_windows():
+        repairs = mounts.plan_repairs(dism)
+        check("repairs: dism", [a.cmd[2] for a in repairs], ["/Cleanup-Wim", "/Remount-Wim"], failures)
+    else:
+        print("skip  repairs: dism (только Windows)")
+
+    # код возврата DISM: ошибка (740 – нет прав) не выдаётся за «нет монтирований»
+    mounted_cmd = mounts.be.mounted_cmd
+    try:
+        mounts.be.mounted_cmd = lambda: [sys.executable, DISM_STUB, "/English", "/Get-MountedWimInfo"]
+        check("dism: код 0 – пустой список", mounts.list_mounts(use_dism=True, proc_mounts=os.devnull), [],
+              failures)
+        mounts.be.mounted_cmd = lambda: [sys.executable, DISM_STUB, "/English", "/Get-MountedWimInfo",
+                                         "--stub-exit=740"]
+        try:
+            error = mounts.list_mounts(use_dism=True, proc_mounts=os.devnull)
+        except mounts.MountListError as e:
+            error = str(e)
+        check("dism: код 740 – ошибка", "740" in str(error), True, failures)
+        errors = []
+        monitor = mounts.MountMonitor(lambda: mounts.list_mounts(use_dism=True, proc_mounts=os.devnull),
+                                      on_change=lambda *_: None, on_error=errors.append, interval=60)
+        monitor.start()
+        deadline = time.monotonic() + 10
+        while not errors and time.monotonic() < deadline:
+            time.sleep(0.05)
+        monitor.stop()
+        check("монитор: on_error при сбое DISM", [type(e).__name__ for e in errors], ["MountListError"], failures)
+    finally:
+        mounts.be.mounted_cmd = mounted_cmd
+
+    print("Все проверки пройдены." if not failures else f"Расхождений: {len(failures)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
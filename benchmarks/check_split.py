@@ -0,0 +1,119 @@
+"""
+Проверка поддержки разделённых WIM (.swm): группировка частей по GUID,
+команды split / join / mount с --ref и параллельная проверка всех частей.
+
+    python benchmarks/check_split.py [--parts 6] [--part-mb 64]
+
+Части генерируются synthwim (одинаковый GUID, номера 1..N). Печатает
+расхождения и завершается с кодом 1, если они есть.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.check_engine import STUBS, Checks  # noqa: E402
+from benchmarks.synthwim import random_blobs, write_wim  # noqa: E402
+from wimcore import backend as be  # noqa: E402
+from wimcore.verify import verify_wim  # noqa: E402
+from wimcore.wiminfo import (WimParseError, group_split_parts, read_split_set, split_part_path,  # noqa: E402
+                             split_source)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_set(first, parts, part_mb, guid=None):
+    for n in range(1, parts + 1):
+        guid = write_wim(split_part_path(first, n), image_count=2 if n == 1 else 0, guid=guid,
+                         part_number=n, total_parts=parts, blobs=random_blobs(part_mb, 1 << 20))
+    return guid
+
+
+def corrupt(path, offset):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--parts", type=int, default=6)
+    parser.add_argument("--part-mb", type=int, default=64)
+    args = parser.parse_args()
+    c = Checks()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first = os.path.join(tmp, "install.swm")
+        guid = write_set(first, args.parts, args.part_mb)
+        # чужой набор с похожим именем и обычный WIM рядом
+        write_wim(os.path.join(tmp, "install7.swm"), image_count=0, part_number=2, total_parts=2)
+        write_wim(os.path.join(tmp, "install.wim"))
+
+        middle = split_part_path(first, 3)
+        split = read_split_set(middle)
+        c.check("набор по любой части", split is not None and split.guid == guid and split.complete
+                and split.paths() == [split_part_path(first, n) for n in range(1, args.parts + 1)],
+                str(split))
+        groups = group_split_parts(os.path.join(tmp, n) for n in sorted(os.listdir(tmp)))
+        c.check("группировка по GUID", sorted(len(s.parts) for s in groups.values()) == [1, args.parts],
+                str({g: sorted(s.parts) for g, s in groups.items()}))
+        c.check("обычный WIM – не набор", read_split_set(os.path.join(tmp, "install.wim")) is None)
+        c.check("источник для --ref", split_source(middle) == (first, os.path.join(tmp, "install*.swm")),
+                str(split_source(middle)))
+
+        cmd = be.mount_cmd("wimlib", first, 1, "/mnt/x", ref=os.path.join(tmp, "install*.swm"))
+        c.check("mount с --ref только для чтения", cmd[1] == "mount" and cmd[-1].startswith("--ref="), str(cmd))
+        c.check("split", be.split_cmd("wimlib", "a.wim", "a.swm", 4000) ==
+                ["wimlib-imagex", "split", "a.wim", "a.swm", "4000"])
+        c.check("join", be.join_cmds("wimlib", ["a.swm", "a2.swm"], "a.wim", check=True) ==
+                [["wimlib-imagex", "join", "--check", "a.wim", "a.swm", "a2.swm"]])
+
+        t0 = time.perf_counter()
+        report = verify_wim(middle, resume=False)
+        elapsed = time.perf_counter() - t0
+        c.check("проверка всех частей", report.ok and len(report.parts) == args.parts
+                and report.bytes_verified == report.bytes_total > 0, report.describe())
+        print(f"      {args.parts} частей, {report.bytes_total / (1 << 20):.0f} МБ за {elapsed:.2f} с "
+              f"({report.throughput:.0f} МБ/с, ядер {os.cpu_count()})")
+
+        corrupt(split_part_path(first, 4), 4096)
+        report = verify_wim(first, resume=False)
+        bad = [p.part_number for p in report.parts if not p.ok]
+        c.check("повреждение найдено в своей части", not report.ok and bad == [4], str(bad))
+
+        os.remove(split_part_path(first, 5))
+        split = read_split_set(first)
+        c.check("нет части", split is not None and split.missing == [5] and not split.complete, str(split))
+        try:
+            split_source(first)
+            c.check("неполный набор не монтируется", False)
+        except WimParseError:
+            c.check("неполный набор не монтируется", True)
+
+        if os.name != "nt":
+            write_set(os.path.join(tmp, "full.swm"), 2, 1)
+            env = dict(os.environ, PATH=STUBS + os.pathsep + os.environ.get("PATH", ""),
+                       STUB_SECONDS="0", XDG_CACHE_HOME=tmp)
+            proc = subprocess.run([sys.executable, "-m", "wimcore", "--backend", "wimlib", "join",
+                                   os.path.join(tmp, "full2.swm"), os.path.join(tmp, "joined.wim")],
+                                  cwd=ROOT, env=env, capture_output=True, text=True)
+            try:
+                result = json.loads(proc.stdout)["results"][0]
+            except (ValueError, LookupError):
+                result = {"ok": False, "cmd": proc.stdout + proc.stderr}
+            c.check("CLI join на заглушке", result["ok"] and result["cmd"][-2:] ==
+                    [os.path.join(tmp, "full.swm"), os.path.join(tmp, "full2.swm")], str(result.get("cmd")))
+
+    print("Все проверки пройдены." if not c.failures else f"Расхождений: {len(c.failures)}")
+    return 1 if c.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Проверка телеметрии (wimcore.telemetry) на заглушках из benchmarks/stubs.
+
+    python benchmarks/check_telemetry.py
+
+Печатает расхождения и завершается с кодом 1, если они есть.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.check_engine import Checks, stub  # noqa: E402
+from wimcore import telemetry  # noqa: E402
+from wimcore.jobs import Job, JobScheduler  # noqa: E402
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[1]).parse_args()
+    c = Checks()
+
+    c.check("dism: операция, WIM, индекс", telemetry.describe_command(
+        ["C:\\Windows\\System32\\dism.exe", "/English", "/Mount-Wim", "/WimFile:D:\\i.wim", "/Index:6",
+         "/MountDir:C:\\m"]) == ("mount-wim", "D:\\i.wim", 6))
+    c.check("wimlib: операция, WIM, индекс",
+            telemetry.describe_command(["wimlib-imagex", "export", "a.wim", "3", "b.wim"]) == ("export", "a.wim", 3))
+    c.check("wimlib: capture", telemetry.describe_command(["wimlib-imagex", "capture", "/src", "n.wim", "X"])
+            == ("capture", "n.wim", None))
+    c.check("перцентили", (telemetry.percentile([1, 2, 3, 4], 50), telemetry.percentile([10] * 3 + [None], 95),
+                           telemetry.percentile([], 50)) == (2.5, 10, None))
+
+    if os.name == "nt":
+        print("skip  задания на заглушках (только POSIX)")
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            tel = telemetry.Telemetry(path=os.path.join(tmp, "t.jsonl"), enabled=True)
+            scheduler = JobScheduler(telemetry=tel, default_limit=4)
+            jobs = [scheduler.submit(Job("apply", stub("wimlib-imagex", "apply", seconds=0.6, size_mb=512),
+                                         backend="wimlib")) for _ in range(3)]
+            jobs.append(scheduler.submit(Job("fail", stub("dism", "/Unmount-Wim", exit=5, seconds=0),
+                                             backend="dism")))
+            for job in jobs:
+                job.wait(10)
+            records = tel.load()
+            c.check("записано по заданию", len(records) == 4, str(len(records)))
+            ok = [r for r in records if r.state == "done"]
+            c.check("время и прогресс", all(r.wall > 0.5 and r.progress_bytes == 512 << 20 for r in ok),
+                    str([(r.wall, r.progress_bytes) for r in ok]))
+            if tel.sampler is not None:
+                c.check("процессорное время и память", all(r.cpu is not None and r.peak_rss for r in ok),
+                        str([(r.cpu, r.peak_rss) for r in ok]))
+            stats = telemetry.summarize(records)
+            c.check("сводка по операциям", [(s.operation, s.count, s.failed) for s in stats] ==
+                    [("apply", 3, 0), ("unmount-wim", 1, 1)], str(stats))
+            buf = io.StringIO()
+            telemetry.to_csv(records, buf)
+            c.check("CSV", len(buf.getvalue().splitlines()) == 5)
+            prom = telemetry.to_prometheus(records)
+            c.check("Prometheus", 'wimmanager_jobs_total{operation="apply",backend="wimlib"} 3' in prom, prom)
+
+    print("Все проверки пройдены." if not c.failures else f"Расхождений: {len(c.failures)}")
+    return 1 if c.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Проверка wimcore.verify на синтетических WIM: повреждение находится в
+несжатых блобах и через таблицу целостности, а WIM со сжатыми блобами без
+таблицы целостности не считается целым.
+
+    python benchmarks/check_verify.py
+
+Печатает расхождения и завершается с кодом 1, если они есть.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.check_engine import Checks  # noqa: E402
+from benchmarks.check_split import corrupt  # noqa: E402
+from benchmarks.synthwim import random_blobs, write_wim  # noqa: E402
+from wimcore.verify import verify_wim  # noqa: E402
+from wimcore.wiminfo import WIM_HEADER_SIZE  # noqa: E402
+
+BLOB_SIZE = 256 * 1024
+
+
+def make(tmp, name, **options):
+    path = os.path.join(tmp, name)
+    write_wim(path, image_count=1, blobs=random_blobs(8, BLOB_SIZE), **options)
+    return path
+
+
+def main():
+    c = Checks()
+    with tempfile.TemporaryDirectory() as tmp:
+        # смещение внутри данных второго блоба
+        inside_blob = WIM_HEADER_SIZE + BLOB_SIZE + 100
+
+        path = make(tmp, "plain.wim", integrity=False)
+        report = verify_wim(path, resume=False)
+        c.check("несжатый WIM без таблицы – цел", report.ok and not report.unverified, report.describe())
+        corrupt(path, inside_blob)
+        report = verify_wim(path, resume=False)
+        c.check("несжатый WIM – повреждение найдено", not report.ok and report.corrupt, report.describe())
+
+        path = make(tmp, "packed.wim", integrity=False, compressed=True)
+        report = verify_wim(path, resume=False)
+        c.check("сжатый WIM без таблицы – не подтверждён", not report.ok and report.unverified
+                and "Повреждений не найдено" not in report.describe(), report.describe())
+        corrupt(path, inside_blob)
+        report = verify_wim(path, resume=False)
+        c.check("сжатый WIM без таблицы, повреждён – не ok", not report.ok, report.describe())
+
+        path = make(tmp, "packed-check.wim", integrity=True, compressed=True)
+        report = verify_wim(path, resume=False)
+        c.check("сжатый WIM с таблицей – цел", report.ok, report.describe())
+        corrupt(path, inside_blob)
+        report = verify_wim(path, resume=False)
+        c.check("сжатый WIM с таблицей – повреждение найдено",
+                not report.ok and any(kind == "integrity" for kind, _, _ in report.corrupt), report.describe())
+
+    print("Все проверки пройдены." if not c.failures else f"Расхождений: {len(c.failures)}")
+    return 1 if c.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Запуск методов WimManagerApp без дисплея – для бенчмарков на Linux CI.
+
+Загружает WIMManager-Cicada3301.py как модуль и собирает объект
+приложения без build_ui(): переменные Tk заменены простыми контейнерами,
+виджеты – заглушками, messagebox только запоминает вызовы. Планировщик,
+мост UiBridge, лог, кэш метаданных и телеметрия – настоящие. Вместо
+главного цикла Tk вызывающий код периодически вызывает pump().
+
+Каталог данных приложения переносится во временную папку (XDG_CACHE_HOME),
+а в начало PATH ставятся заглушки dism / wimlib-imagex из benchmarks/stubs.
+"""
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(ROOT, "WIMManager-Cicada3301.py")
+STUBS = os.path.join(ROOT, "benchmarks", "stubs")
+
+
+class Var:
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class Widget:
+    """Принимает любые вызовы виджета Tk и ничего не делает."""
+
+    def __init__(self):
+        self.options = {}
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    def cget(self, name):
+        return self.options.get(name, "")
+
+    def exists(self, *_):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class Root(Widget):
+    def after(self, ms, fn, *args):
+        return None
+
+
+class MessageBoxes:
+    def __init__(self):
+        self.calls = []
+
+    def _record(self, kind):
+        def show(title, message="", **kwargs):
+            self.calls.append((kind, title, message))
+            return True if kind.startswith("ask") else None
+        return show
+
+    def __getattr__(self, name):
+        return self._record(name)
+
+
+def load_app_module():
+    spec = importlib.util.spec_from_file_location("wimmanager_app", APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class HeadlessApp:
+    def __init__(self, backend="wimlib", data_dir=None):
+        self._tmp = None
+        if data_dir is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="wimbench-")
+            data_dir = self._tmp.name
+        os.environ["XDG_CACHE_HOME"] = data_dir
+        if STUBS not in os.environ.get("PATH", "").split(os.pathsep):
+            os.environ["PATH"] = STUBS + os.pathsep + os.environ.get("PATH", "")
+
+        module = self.module = load_app_module()
+        self.messages = module.messagebox = MessageBoxes()
+        app = self.app = object.__new__(module.WimManagerApp)
+
+        app.root = Root()
+        app.backend_var = Var(backend)
+        app.theme_var = Var("dark")
+        app.wim_path_var = Var()
+        app.mount_path_var = Var()
+        app.index_var = Var(module.DEFAULT_INDEX)
+        app.status_var = Var()
+        app.progress = Widget()
+        app.jobs_tree = Widget()
+        app.install_cancel = app.verify_cancel = app.catalog = app.mounts_window = None
+        app.meta_cache = module.MetadataCache()
+        app.tools = module.ToolRegistry()
+        app.log_sink = module.LogSink()
+        app.line_hooks = []
+        app.ui = module.UiBridge()
+        # трекер монтирований, телеметрия и планировщик создаются свойствами при первом обращении
+        app._lazy_lock = threading.Lock()
+        app._mount_tracker = app._telemetry = app._scheduler = None
+        self.log_lines = 0
+        app.ui.add_poller(self._drain_log)
+
+    def _drain_log(self):
+        self.log_lines += len(self.app.log_sink.drain())
+
+    def pump(self):
+        """Один такт «главного цикла»: то, что в GUI делает UiBridge.schedule."""
+        return self.app.ui.drain()
+
+    def run(self, action, timeout=60, interval=0.005):
+        """
+        Вызывает action() (например, app.mount_wim), дожидается всех
+        поставленных им заданий и их обновлений окна. Возвращает задания.
+        """
+        before = {job.id for job in self.app.scheduler.jobs()}
+        result = action()
+        jobs = [job for job in self.app.scheduler.jobs() if job.id not in before]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.pump()
+            if all(job.wait(0) for job in jobs) and not self.app.ui.pending():
+                break
+            time.sleep(interval)
+        self.pump()
+        return jobs if jobs else result
+
+    def close(self):
+        self.app.scheduler.cancel_all()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+
+def tk_available():
+    # без _tkinter пакет tkinter есть, но не импортируется
+    return all(importlib.util.find_spec(name) is not None for name in ("tkinter", "_tkinter"))
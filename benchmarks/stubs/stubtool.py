@@ -0,0 +1,164 @@
+"""
+Заглушки dism и wimlib-imagex для проверок и бенчмарков без настоящих
+инструментов (Linux CI).
+
+Печатают правдоподобный вывод и прогресс в формате соответствующего
+инструмента. Поведение задаётся переменными окружения:
+
+    STUB_SECONDS   длительность операции (по умолчанию 0.2)
+    STUB_STEPS     число строк прогресса (по умолчанию 20)
+    STUB_SIZE_MB   объём данных для прогресса wimlib (по умолчанию 1024)
+    STUB_RATE_MB   скорость, МиБ/с: если задана, длительность = объём / скорость
+    STUB_LINES     дополнительные строки лога на шаг (по умолчанию 0)
+    STUB_EXIT      код возврата (по умолчанию 0)
+    STUB_CHILD     1 – запустить дочерний процесс-«долгожитель»
+                   (проверка завершения всего дерева процессов)
+    STUB_PIDFILE   куда записать PID свой и дочернего процесса
+
+Те же параметры можно передать последними аргументами командной строки:
+--stub-seconds=5 --stub-exit=2 (удобно, когда окружение процесса не задать).
+"""
+import os
+import subprocess
+import sys
+import time
+
+
+def env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def write(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def spawn_child():
+    if os.environ.get("STUB_CHILD") != "1":
+        return None
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(600)"])
+    pidfile = os.environ.get("STUB_PIDFILE")
+    if pidfile:
+        with open(pidfile, "w") as f:
+            f.write(f"{os.getpid()} {child.pid}\n")
+    return child
+
+
+def progress_loop(render):
+    rate = env_float("STUB_RATE_MB", 0)
+    seconds = env_float("STUB_SIZE_MB", 1024) / rate if rate > 0 else env_float("STUB_SECONDS", 0.2)
+    steps = max(1, int(env_float("STUB_STEPS", 20)))
+    extra = int(env_float("STUB_LINES", 0))
+    for step in range(1, steps + 1):
+        for i in range(extra):
+            # "\n" в начале завершает предыдущую строку прогресса (она начинается с "\r")
+            write(f"\n[stub] step {step} line {i}: processing file \\Windows\\System32\\file{i:05d}.dll")
+        write(render(step * 100.0 / steps))
+        if seconds:
+            time.sleep(seconds / steps)
+
+
+# -------------------------------------------------------- DISM
+
+DISM_BANNER = ("\nDeployment Image Servicing and Management tool\n"
+               "Version: 10.0.22621.1\n\n")
+
+
+def dism_bar(percent):
+    filled = int(percent / 100 * 58)
+    text = f"{percent:.1f}%"
+    bar = ("=" * filled).ljust(58)
+    mid = (58 - len(text)) // 2
+    return "\r[" + bar[:mid] + text + bar[mid + len(text):] + "]"
+
+
+def dism(args):
+    write(DISM_BANNER)
+    opts = {a.split(":", 1)[0].lower(): a.split(":", 1)[1] if ":" in a else "" for a in args}
+    if "/get-wiminfo" in opts:
+        write(f"Details for image : {opts.get('/wimfile', '')}\n\n")
+        for i, edition in enumerate(("Home", "Pro", "Enterprise"), 1):
+            write(f"Index : {i}\nName : Windows 11 {edition}\nDescription : Windows 11 {edition}\n"
+                  f"Size : {15_000_000_000 + i:,} bytes\n\n")
+    elif "/?" in opts:
+        write("  /Export-Image /Capture-Image /Append-Image /Apply-Image /Split-Image /Mount-Image\n"
+              "  /Commit-Image /Unmount-Image /Remount-Image /Cleanup-Wim /Get-WimInfo\n")
+    elif "/get-mountedwiminfo" in opts:
+        write("Mounted images:\n\nNo mounted images found.\n")
+    else:
+        for key in ("/mount-wim", "/unmount-wim", "/export-image", "/capture-image", "/apply-image",
+                    "/cleanup-wim", "/remount-wim"):
+            if key in opts:
+                write(f"{key[1:].replace('-', ' ').title()}\n")
+                break
+        progress_loop(dism_bar)
+        write("\n")
+    code = int(env_float("STUB_EXIT", 0))
+    write("The operation completed successfully.\n" if code == 0 else f"\nError: {code}\n")
+    return code
+
+
+# -------------------------------------------------------- WIMLIB
+
+def wimlib(args):
+    command = args[0] if args else ""
+    size_mb = env_float("STUB_SIZE_MB", 1024)
+    if command == "info":
+        write(f'WIM Information:\n----------------\nPath:           {args[1] if len(args) > 1 else ""}\n'
+              "GUID:           0x0123456789abcdef0123456789abcdef\nVersion:        68864\n"
+              "Image Count:    3\nCompression:    LZX\nChunk Size:     32768 bytes\n"
+              "Part Number:    1/1\nBoot Index:     0\nSize:           4567890123 bytes\n\n")
+        for i, edition in enumerate(("Home", "Pro", "Enterprise"), 1):
+            write(f"Index:                  {i}\nName:                   Windows 11 {edition}\n"
+                  f"Total Bytes:            {15_000_000_000 + i}\n\n")
+    elif command == "help":
+        # справка по команде: возможности, которые ищет wimcore.tools.probe_wimlib
+        write(f"wimlib-imagex {args[1] if len(args) > 1 else ''} [OPTION...]\n"
+              "    [--compress=TYPE] [--chunk-size=SIZE] [--solid] [--solid-compress=TYPE]\n"
+              "    [--solid-chunk-size=SIZE] [--threads=NUM_THREADS] [--pipable] [--unsafe-compact]\n")
+    elif command in ("dir", "--version", "-v"):
+        write("wimlib-imagex 1.14.4 (stub)\n" if command != "dir" else "/\n/Windows\n/Windows/System32\n")
+    else:
+        phase = {"mount": "Mounting", "mountrw": "Mounting", "unmount": "Committing",
+                 "apply": "Extracting file data", "export": "Writing resources",
+                 "capture": "Archiving file data", "append": "Archiving file data",
+                 "optimize": "Writing resources", "verify": "Verifying integrity",
+                 "split": "Writing resources", "join": "Writing resources"}.get(command, "Processing")
+        # export SRC INDEX DEST, capture SRC DEST NAME: создаём пустой результат
+        dest = {"export": 3, "capture": 2, "append": 2}.get(command)
+        if dest is not None and len(args) > dest and not os.path.exists(args[dest]):
+            try:
+                open(args[dest], "wb").close()
+            except OSError:
+                pass
+
+        def render(percent):
+            done = size_mb * percent / 100
+            return f"\r{phase}: {done:.0f} MiB of {size_mb:.0f} MiB ({percent:.0f}%) done"
+
+        progress_loop(render)
+        write("\n")
+    code = int(env_float("STUB_EXIT", 0))
+    if code:
+        write(f"ERROR: Exiting with error code {code}: stub failure.\n")
+    return code
+
+
+def main(tool):
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--stub-") and "=" in arg:
+            name, value = arg[len("--stub-"):].split("=", 1)
+            os.environ["STUB_" + name.upper().replace("-", "_")] = value
+        else:
+            args.append(arg)
+    sys.argv[1:] = args
+    child = spawn_child()
+    try:
+        return (dism if tool == "dism" else wimlib)(sys.argv[1:])
+    finally:
+        if child is not None:
+            child.wait()
@@ -0,0 +1,139 @@
+"""
+Генератор синтетических (несжатых) WIM-файлов для бенчмарков.
+
+Структура: заголовок | блобы | метаданные образов | таблица блобов | XML |
+таблица целостности. Этого достаточно для встроенного парсера wimcore.
+"""
+import hashlib
+import os
+import struct
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wimcore.wiminfo import (  # noqa: E402
+    WIM_MAGIC, WIM_HEADER_SIZE, RES_FLAG_COMPRESSED, RES_FLAG_METADATA, RES_FLAG_SOLID,
+)
+
+BLOB_ENTRY = struct.Struct("<QQQHI20s")
+INTEGRITY_CHUNK = 10 * 1024 * 1024
+SOLID_RESOURCE_MAGIC = 0x100000000
+
+
+def _reshdr(size, flags, offset, original_size):
+    return struct.pack("<QQQ", size | (flags << 56), offset, original_size)
+
+
+def make_xml(image_count, prefix="Windows 10", build="19041", total_bytes=0):
+    parts = [f"<WIM><TOTALBYTES>{total_bytes}</TOTALBYTES>"]
+    for i in range(1, image_count + 1):
+        parts.append(
+            f'<IMAGE INDEX="{i}"><DIRCOUNT>{1000 * i}</DIRCOUNT>'
+            f"<FILECOUNT>{5000 * i}</FILECOUNT><TOTALBYTES>{1 << 30}</TOTALBYTES>"
+            f"<WINDOWS><ARCH>9</ARCH><PRODUCTNAME>Microsoft Windows</PRODUCTNAME>"
+            f"<EDITIONID>Edition{i}</EDITIONID><INSTALLATIONTYPE>Client</INSTALLATIONTYPE>"
+            f"<LANGUAGES><LANGUAGE>en-US</LANGUAGE><DEFAULT>en-US</DEFAULT></LANGUAGES>"
+            f"<VERSION><MAJOR>10</MAJOR><MINOR>0</MINOR><BUILD>{build}</BUILD>"
+            f"<SPBUILD>1</SPBUILD></VERSION></WINDOWS>"
+            f"<NAME>{prefix} Edition{i}</NAME><DESCRIPTION>{prefix} Edition{i}</DESCRIPTION>"
+            f"</IMAGE>"
+        )
+    parts.append("</WIM>")
+    return b"\xff\xfe" + "".join(parts).encode("utf-16-le")
+
+
+def write_wim(path, image_count=3, blobs=(), guid=None, part_number=1, total_parts=1,
+              integrity=True, xml_prefix="Windows 10", compressed=False, solid=False):
+    """
+    Пишет синтетический WIM. blobs — итерируемое из bytes (несжатые ресурсы).
+    compressed=True помечает блобы сжатыми (данные не сжимаются, исходный
+    размер вдвое больше) – для проверок, которые такие блобы не разбирают.
+    solid=True кладёт все блобы в один solid-ресурс (как ESD): запись
+    ресурса, затем записи блобов с исходным размером вдвое больше данных.
+    Возвращает GUID (строкой).
+    """
+    guid = guid or str(uuid.uuid4())
+    entries = []
+
+    with open(path, "wb") as f:
+        f.write(b"\x00" * WIM_HEADER_SIZE)
+
+        if solid:
+            blobs = list(blobs)
+            offset = f.tell()
+            for data in blobs:
+                f.write(data)
+            entries.append(BLOB_ENTRY.pack((f.tell() - offset) | ((RES_FLAG_SOLID | RES_FLAG_COMPRESSED) << 56),
+                                           offset, SOLID_RESOURCE_MAGIC, part_number, 1, bytes(20)))
+            inner = 0
+            for data in blobs:
+                entries.append(BLOB_ENTRY.pack(2 * len(data) | (RES_FLAG_SOLID << 56), inner, 2 * len(data),
+                                               part_number, 1, hashlib.sha1(data).digest()))
+                inner += 2 * len(data)
+            blobs = ()
+
+        for data in blobs:
+            offset = f.tell()
+            f.write(data)
+            if compressed:
+                size, original = len(data) | (RES_FLAG_COMPRESSED << 56), 2 * len(data)
+            else:
+                size, original = len(data), len(data)
+            entries.append(BLOB_ENTRY.pack(size, offset, original, part_number, 1,
+                                           hashlib.sha1(data).digest()))
+
+        for i in range(image_count):
+            meta = os.urandom(64) + struct.pack("<I", i)
+            offset = f.tell()
+            f.write(meta)
+            entries.append(BLOB_ENTRY.pack(len(meta) | (RES_FLAG_METADATA << 56), offset,
+                                           len(meta), part_number, 1, hashlib.sha1(meta).digest()))
+
+        table_offset = f.tell()
+        table = b"".join(entries)
+        f.write(table)
+        table_end = f.tell()
+
+        xml = make_xml(image_count, prefix=xml_prefix)
+        xml_offset = f.tell()
+        f.write(xml)
+
+        integrity_hdr = b"\x00" * 24
+        if integrity:
+            f.flush()
+            hashes = []
+            with open(path, "rb") as r:
+                r.seek(WIM_HEADER_SIZE)
+                remaining = table_end - WIM_HEADER_SIZE
+                while remaining > 0:
+                    chunk = r.read(min(INTEGRITY_CHUNK, remaining))
+                    hashes.append(hashlib.sha1(chunk).digest())
+                    remaining -= len(chunk)
+            body = b"".join(hashes)
+            integ = struct.pack("<III", 12 + len(body), len(hashes), INTEGRITY_CHUNK) + body
+            integ_offset = f.tell()
+            f.write(integ)
+            integrity_hdr = _reshdr(len(integ), 0, integ_offset, len(integ))
+
+        header = (
+            WIM_MAGIC
+            + struct.pack("<IIII", WIM_HEADER_SIZE, 0x10D00, 0, 0)
+            + uuid.UUID(guid).bytes_le
+            + struct.pack("<HHI", part_number, total_parts, image_count)
+            + _reshdr(len(table), 0, table_offset, len(table))
+            + _reshdr(len(xml), 0, xml_offset, len(xml))
+            + b"\x00" * 24
+            + struct.pack("<I", 0)
+            + integrity_hdr
+        )
+        header += b"\x00" * (WIM_HEADER_SIZE - len(header))
+        f.seek(0)
+        f.write(header)
+
+    return guid
+
+
+def random_blobs(count, size):
+    for _ in range(count):
+        yield os.urandom(size)
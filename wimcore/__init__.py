@@ -0,0 +1,4 @@
+"""
+Ядро WIM Manager без GUI: чтение метаданных WIM и прочая логика,
+которую можно использовать без tkinter.
+"""
@@ -0,0 +1,344 @@
+"""
+Выбор бэкенда (DISM / wimlib-imagex) и построение командных строк.
+
+Используется и GUI, и консольным режимом (python -m wimcore).
+"""
+import os
+
+BACKENDS = ("auto", "dism", "wimlib")
+# размер части .swm по умолчанию: влезает в предел файла FAT32 (4 ГиБ - 1 байт)
+DEFAULT_SPLIT_MB = 4000
+
+
+class BackendError(RuntimeError):
+    """Нужный инструмент недоступен или операция им не поддерживается."""
+
+
+def is_windows():
+    return os.name == "nt"
+
+
+def shutil_which(cmd):
+    try:
+        from shutil import which
+        return which(cmd)
+    except Exception:
+        paths = os.environ.get("PATH", "").split(os.pathsep)
+        for path in paths:
+            full = os.path.join(path, cmd)
+            if os.path.isfile(full):
+                return full
+        return None
+
+
+def find_dism():
+    return shutil_which("dism.exe") if is_windows() else None
+
+
+def find_wimlib():
+    return shutil_which("wimlib-imagex.exe") or shutil_which("wimlib-imagex")
+
+
+# операция -> ключ справки DISM (wimcore.tools.DISM_FEATURES), без которого она недоступна
+_DISM_FEATURES = {"export": "/Export-Image", "join": "/Export-Image", "capture": "/Capture-Image",
+                  "apply": "/Apply-Image", "split": "/Split-Image", "commit": "/Commit-Image",
+                  "remount": "/Remount-Image", "cleanup": "/Cleanup-Wim"}
+
+
+def operation_features(operation, profile=None) -> dict:
+    """
+    Возможности инструментов (ключи ToolInfo.features), нужные операции:
+    {"wimlib": (...), "dism": (...)}. У wimlib это ключи профиля сжатия и
+    FUSE для монтирования, у DISM – сама команда.
+    """
+    wimlib = []
+    if operation == "mount":
+        wimlib.append("fuse")
+    if profile is not None and operation in ("export", "capture", "optimize"):
+        wimlib += [arg.split("=", 1)[0] for arg in profile.wimlib_args()]
+    dism = _DISM_FEATURES.get(operation)
+    return {"wimlib": tuple(wimlib), "dism": (dism,) if dism else ()}
+
+
+def missing_features(tool, features) -> list:
+    """Возможности из features, которых нет у tool (ToolInfo). Пока версии не проверены – []."""
+    if tool is None or not tool.probed:
+        return []
+    return [f for f in features if not tool.supports(f)]
+
+
+def require_features(tool, features):
+    missing = missing_features(tool, features)
+    if missing:
+        raise BackendError(f"{tool.describe()} не поддерживает: {', '.join(missing)}. "
+                           f"Обновите инструмент или выберите другой бэкенд.")
+
+
+def select_backend(mode: str, registry=None, needs=None) -> str:
+    """
+    Возвращает "dism" или "wimlib" для режима auto/dism/wimlib.
+    С реестром инструментов (wimcore.tools.ToolRegistry) PATH заново не просматривается,
+    а needs (см. operation_features) сверяется с матрицей возможностей: auto выбирает
+    инструмент, который умеет всё нужное, явно заданный без нужной возможности –
+    BackendError.
+    """
+    needs = needs or {}
+    if registry is not None:
+        found = {name: registry.path(name) for name in ("dism", "wimlib")}
+        tools = {name: registry.get(name) for name in found}
+    else:
+        found = {"dism": find_dism(), "wimlib": find_wimlib()}
+        tools = {}
+
+    if mode == "dism":
+        if not found["dism"]:
+            raise BackendError("DISM не найден. Выберите другой бэкенд или добавьте DISM в PATH.")
+        require_features(tools.get("dism"), needs.get("dism", ()))
+        return "dism"
+    if mode == "wimlib":
+        if not found["wimlib"]:
+            raise BackendError("wimlib-imagex не найден. Установите его или выберите другой бэкенд.")
+        require_features(tools.get("wimlib"), needs.get("wimlib", ()))
+        return "wimlib"
+
+    # auto
+    candidates = [name for name in ("wimlib", "dism") if found[name]]
+    if not candidates:
+        raise BackendError("Не найден ни DISM, ни wimlib-imagex.")
+    for name in candidates:
+        if not missing_features(tools.get(name), needs.get(name, ())):
+            return name
+    require_features(tools.get(candidates[0]), needs.get(candidates[0], ()))
+
+
+def _require_dism_platform():
+    if not is_windows():
+        raise BackendError("DISM поддерживается только в Windows.")
+
+
+def mount_cmd(backend, wim, index, mount_dir, read_only=False, ref=None, tool=None):
+    """
+    ref – шаблон частей разделённого WIM (install*.swm); такой WIM
+    монтируется только для чтения – этого требуют и DISM, и wimlib.
+    tool – ToolInfo выбранного инструмента: без нужной возможности BackendError.
+    """
+    require_features(tool, operation_features("mount")[backend])
+    index = str(index)
+    read_only = read_only or bool(ref)
+    if backend == "dism":
+        _require_dism_platform()
+        cmd = [
+            "dism", "/English", "/Mount-Wim",
+            f"/WimFile:{wim}",
+            f"/index:{index}",
+            f"/MountDir:{mount_dir}",
+        ]
+        if ref:
+            cmd.append(f"/SWMFile:{ref}")
+        if read_only:
+            cmd.append("/ReadOnly")
+        return cmd
+    cmd = ["wimlib-imagex", "mount" if read_only else "mountrw", wim, index, mount_dir]
+    if ref:
+        cmd.append(f"--ref={ref}")
+    return cmd
+
+
+def unmount_cmd(backend, mount_dir, discard=False):
+    if backend == "dism":
+        _require_dism_platform()
+        return [
+            "dism", "/English", "/Unmount-Wim",
+            f"/MountDir:{mount_dir}",
+            "/Discard" if discard else "/Commit",
+        ]
+    cmd = ["wimlib-imagex", "unmount", mount_dir]
+    if not discard:
+        cmd.append("--commit")
+    return cmd
+
+
+def commit_cmd(backend, mount_dir, tool=None):
+    """Сохранение изменений без размонтирования (только DISM)."""
+    if backend != "dism":
+        raise BackendError("wimlib-imagex не умеет сохранять без размонтирования: "
+                           "используйте unmount с --commit.")
+    _require_dism_platform()
+    require_features(tool, operation_features("commit")["dism"])
+    return ["dism", "/English", "/Commit-Image", f"/MountDir:{mount_dir}"]
+
+
+def _dism_compress(profile, operation):
+    from .compression import CompressionError
+    try:
+        return profile.dism_compress(operation)
+    except CompressionError as e:
+        raise BackendError(str(e))
+
+
+def export_cmd(backend, src, index, dest, profile=None, name=None, check=False, ref=None, tool=None):
+    """Экспорт образа src:index в dest (новый или существующий WIM/ESD); ref – части .swm."""
+    require_features(tool, operation_features("export", profile)[backend])
+    if backend == "dism":
+        _require_dism_platform()
+        cmd = ["dism", "/English", "/Export-Image", f"/SourceImageFile:{src}", f"/SourceIndex:{index}",
+               f"/DestinationImageFile:{dest}"]
+        if ref:
+            cmd.append(f"/SWMFile:{ref}")
+        if name:
+            cmd.append(f"/DestinationName:{name}")
+        if profile is not None:
+            cmd.append(f"/Compress:{_dism_compress(profile, 'export')}")
+        if check:
+            cmd.append("/CheckIntegrity")
+        return cmd
+    cmd = ["wimlib-imagex", "export", src, str(index), dest]
+    if name:
+        cmd.append(name)
+    if ref:
+        cmd.append(f"--ref={ref}")
+    if profile is not None:
+        cmd += profile.wimlib_args()
+    if check:
+        cmd.append("--check")
+    return cmd
+
+
+def capture_cmd(backend, source_dir, dest, name, profile=None, description=None, append=False,
+                check=False, tool=None):
+    """Захват папки в новый WIM (или добавление образа в существующий при append=True)."""
+    require_features(tool, operation_features("capture", profile)[backend])
+    if backend == "dism":
+        _require_dism_platform()
+        cmd = ["dism", "/English", "/Append-Image" if append else "/Capture-Image",
+               f"/ImageFile:{dest}", f"/CaptureDir:{source_dir}", f"/Name:{name}"]
+        if description:
+            cmd.append(f"/Description:{description}")
+        if profile is not None and not append:
+            cmd.append(f"/Compress:{_dism_compress(profile, 'capture')}")
+        if check:
+            cmd.append("/CheckIntegrity")
+        return cmd
+    cmd = ["wimlib-imagex", "append" if append else "capture", source_dir, dest, name]
+    if description:
+        cmd.append(description)
+    if profile is not None:
+        cmd += profile.wimlib_args()
+    if check:
+        cmd.append("--check")
+    return cmd
+
+
+def apply_cmd(backend, wim, index, target_dir, check=False, ref=None, tool=None):
+    """Развёртывание образа wim:index в папку (или том); ref – части .swm."""
+    require_features(tool, operation_features("apply")[backend])
+    if backend == "dism":
+        _require_dism_platform()
+        cmd = ["dism", "/English", "/Apply-Image", f"/ImageFile:{wim}", f"/Index:{index}",
+               f"/ApplyDir:{target_dir}"]
+        if ref:
+            cmd.append(f"/SWMFile:{ref}")
+        if check:
+            cmd.append("/CheckIntegrity")
+        return cmd
+    cmd = ["wimlib-imagex", "apply", wim, str(index), target_dir]
+    if ref:
+        cmd.append(f"--ref={ref}")
+    if check:
+        cmd.append("--check")
+    return cmd
+
+
+def split_cmd(backend, wim, first_part, part_mb=DEFAULT_SPLIT_MB, check=False, tool=None):
+    """
+    Разбиение WIM на части .swm не больше part_mb МиБ: first_part – имя
+    первой части (install.swm), остальные получают номера (install2.swm, ...).
+    """
+    part_mb = int(part_mb)
+    if part_mb <= 0:
+        raise BackendError("Размер части должен быть положительным числом МБ.")
+    require_features(tool, operation_features("split")[backend])
+    if backend == "dism":
+        _require_dism_platform()
+        cmd = ["dism", "/English", "/Split-Image", f"/ImageFile:{wim}", f"/SWMFile:{first_part}",
+               f"/FileSize:{part_mb}"]
+        if check:
+            cmd.append("/CheckIntegrity")
+        return cmd
+    cmd = ["wimlib-imagex", "split", wim, first_part, str(part_mb)]
+    if check:
+        cmd.append("--check")
+    return cmd
+
+
+def join_cmds(backend, parts, dest, indexes=(), check=False, tool=None):
+    """
+    Сборка частей .swm в один WIM. Возвращает список команд: у wimlib это
+    одна команда join, у DISM отдельного объединения нет – каждый образ
+    (indexes) экспортируется из первой части с /SWMFile в dest по очереди.
+    """
+    parts = list(parts)
+    if not parts:
+        raise BackendError("Не заданы части разделённого WIM.")
+    if backend == "dism":
+        _require_dism_platform()
+        if not indexes:
+            raise BackendError("Для сборки через DISM нужен список индексов образов.")
+        from .wiminfo import split_ref_pattern
+        return [export_cmd("dism", parts[0], index, dest, check=check, ref=split_ref_pattern(parts[0]), tool=tool)
+                for index in indexes]
+    cmd = ["wimlib-imagex", "join"]
+    if check:
+        cmd.append("--check")
+    return [cmd + [dest] + parts]
+
+
+def optimize_cmd(backend, wim, profile=None, check=False, tool=None):
+    """Пересборка WIM без «дыр»; с профилем – с пересжатием (только wimlib)."""
+    if backend == "dism":
+        raise BackendError("В DISM нет аналога optimize: экспортируйте образы в новый файл "
+                           "или выберите wimlib.")
+    require_features(tool, operation_features("optimize", profile)["wimlib"])
+    cmd = ["wimlib-imagex", "optimize", wim]
+    if profile is not None:
+        cmd += ["--recompress"] + profile.wimlib_args()
+    if check:
+        cmd.append("--check")
+    return cmd
+
+
+def info_cmd(backend, wim):
+    if backend == "dism":
+        _require_dism_platform()
+        return ["dism", "/English", "/Get-WimInfo", f"/WimFile:{wim}"]
+    return ["wimlib-imagex", "info", wim]
+
+
+def mounted_cmd():
+    _require_dism_platform()
+    return ["dism", "/English", "/Get-MountedWimInfo"]
+
+
+def cleanup_cmd():
+    """Удаление ресурсов повреждённых/брошенных монтирований DISM."""
+    _require_dism_platform()
+    return ["dism", "/English", "/Cleanup-Wim"]
+
+
+def remount_cmd(mount_dir):
+    """Восстановление монтирования DISM со статусом «Needs Remount»."""
+    _require_dism_platform()
+    return ["dism", "/English", "/Remount-Wim", f"/MountDir:{mount_dir}"]
+
+
+def fuse_unmount_cmd(mount_dir):
+    """Снятие «зависшего» FUSE-монтирования wimlib (процесс wimlib уже завершился)."""
+    return ["fusermount", "-u", "-z", mount_dir]
+
+
+def creationflags():
+    """Флаги запуска дочерних процессов (без консольного окна в Windows)."""
+    if is_windows():
+        import subprocess
+        return subprocess.CREATE_NO_WINDOW  # type: ignore
+    return 0
@@ -0,0 +1,335 @@
+"""
+Индекс дерева файлов образа для просмотра без монтирования.
+
+Дерево строится потоково из вывода `wimlib-imagex dir WIM INDEX --detailed`
+и хранится в параллельных массивах (имя, родитель, атрибуты, размер), а
+дети каждого каталога – в CSR-виде (смещение + плоский список), отсортированные
+по имени. Объекты Node с __slots__ создаются только для того, что реально
+показывается. Готовые индексы кэшируются на диске по (GUID WIM, индекс,
+размер и mtime файла).
+"""
+import fnmatch
+import os
+import pickle
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from .settings import app_data_dir
+
+ATTR_DIRECTORY = 0x10
+ROOT_ID = 0
+INDEX_CACHE_DIR = "dirindex"
+INDEX_FORMAT = 1
+MEMORY_CACHE_SIZE = 4
+
+_FULL_PATH_RE = re.compile(r'^Full Path:\s*"?(.*?)"?\s*$')
+_ATTR_RE = re.compile(r"^Attributes:\s*(0x[0-9A-Fa-f]+)")
+_SIZE_RE = re.compile(r"Uncompressed size\s*=\s*(\d+)")
+
+
+def dir_cmd(wim, index):
+    return ["wimlib-imagex", "dir", wim, str(index), "--detailed"]
+
+
+class Node:
+    __slots__ = ("id", "name", "is_dir", "size")
+
+    def __init__(self, node_id, name, is_dir, size):
+        self.id = node_id
+        self.name = name
+        self.is_dir = is_dir
+        self.size = size
+
+    def __repr__(self):
+        return f"Node({self.id}, {self.name!r}, dir={self.is_dir}, size={self.size})"
+
+
+class PathIndex:
+    def __init__(self):
+        self.names = [""]               # id -> имя
+        self.parents = array("l", [-1])
+        self.dirs = array("b", [1])
+        self.sizes = array("Q", [0])
+        self.child_start = array("l")   # CSR: дети id – child_ids[child_start[id]:child_start[id + 1]]
+        self.child_ids = array("l")
+        self._child_keys = {}           # id каталога -> список имён детей (для bisect), лениво
+
+    def __len__(self):
+        return len(self.names)
+
+    # -------------------------------------------------------- ПОСТРОЕНИЕ
+
+    def finalize(self):
+        """Строит CSR-таблицу детей, отсортированных по имени (без учёта регистра)."""
+        n = len(self.names)
+        counts = [0] * (n + 1)
+        for parent in self.parents[1:]:
+            counts[parent + 1] += 1
+        start = array("l", [0]) * (n + 1)
+        total = 0
+        for i in range(n):
+            total += counts[i + 1]
+            start[i + 1] = total
+
+        order = sorted(range(1, n), key=lambda i: (self.parents[i], self.names[i].lower()))
+        self.child_ids = array("l", order)
+        self.child_start = start
+        self._child_keys = {}
+        return self
+
+    # -------------------------------------------------------- ДОСТУП
+
+    def node(self, node_id) -> Node:
+        return Node(node_id, self.names[node_id], bool(self.dirs[node_id]), self.sizes[node_id])
+
+    def child_range(self, node_id):
+        return self.child_start[node_id], self.child_start[node_id + 1]
+
+    def children(self, node_id):
+        lo, hi = self.child_range(node_id)
+        return [self.node(i) for i in self.child_ids[lo:hi]]
+
+    def has_children(self, node_id) -> bool:
+        lo, hi = self.child_range(node_id)
+        return hi > lo
+
+    def full_path(self, node_id) -> str:
+        parts = []
+        while node_id > ROOT_ID:
+            parts.append(self.names[node_id])
+            node_id = self.parents[node_id]
+        return "/" + "/".join(reversed(parts))
+
+    def _keys(self, node_id):
+        keys = self._child_keys.get(node_id)
+        if keys is None:
+            lo, hi = self.child_range(node_id)
+            keys = [self.names[i].lower() for i in self.child_ids[lo:hi]]
+            self._child_keys[node_id] = keys
+        return keys
+
+    def lookup(self, path: str):
+        """id узла по полному пути (без учёта регистра) или None."""
+        node_id = ROOT_ID
+        for part in path.replace("\\", "/").strip("/").split("/"):
+            if not part:
+                continue
+            keys = self._keys(node_id)
+            key = part.lower()
+            pos = bisect_left(keys, key)
+            if pos == len(keys) or keys[pos] != key:
+                return None
+            node_id = self.child_ids[self.child_start[node_id] + pos]
+        return node_id
+
+    def exists(self, path: str) -> bool:
+        return self.lookup(path) is not None
+
+    def prefix_search(self, prefix: str, limit=1000):
+        """
+        Пути, начинающиеся с prefix: "/Windows/Sys" -> все элементы /Windows,
+        имя которых начинается с "Sys" (бинарный поиск по отсортированным детям).
+        """
+        prefix = prefix.replace("\\", "/")
+        head, _, tail = prefix.rpartition("/")
+        parent = self.lookup(head) if head else ROOT_ID
+        if parent is None:
+            return []
+        keys = self._keys(parent)
+        key = tail.lower()
+        pos = bisect_left(keys, key)
+        lo = self.child_start[parent]
+        result = []
+        while pos < len(keys) and keys[pos].startswith(key) and len(result) < limit:
+            result.append(self.full_path(self.child_ids[lo + pos]))
+            pos += 1
+        return result
+
+    def glob(self, pattern: str, limit=1000):
+        """
+        Поиск по маске. Маска без "/" сравнивается с именем ("*.sys"),
+        с "/" – с полным путём ("/Windows/*/drivers/*.sys").
+        """
+        pattern = pattern.replace("\\", "/")
+        by_path = "/" in pattern
+        regex = re.compile(fnmatch.translate(pattern.lower()))
+        match = regex.match
+        result = []
+        for node_id in range(1, len(self.names)):
+            if by_path:
+                if not match(self.full_path(node_id).lower()):
+                    continue
+            elif not match(self.names[node_id].lower()):
+                continue
+            result.append(self.full_path(node_id))
+            if len(result) >= limit:
+                break
+        return result
+
+    # -------------------------------------------------------- СЕРИАЛИЗАЦИЯ
+
+    def dumps(self) -> bytes:
+        return pickle.dumps((
+            INDEX_FORMAT,
+            "\0".join(self.names).encode("utf-8"),
+            self.parents.tobytes(), self.dirs.tobytes(), self.sizes.tobytes(),
+            self.child_start.tobytes(), self.child_ids.tobytes(),
+        ), protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def loads(cls, data: bytes):
+        fmt, names, parents, dirs, sizes, child_start, child_ids = pickle.loads(data)
+        if fmt != INDEX_FORMAT:
+            raise ValueError("Неподдерживаемый формат индекса.")
+        index = cls()
+        index.names = names.decode("utf-8").split("\0")
+        for attr, raw in (("parents", parents), ("dirs", dirs), ("sizes", sizes),
+                          ("child_start", child_start), ("child_ids", child_ids)):
+            arr = array(getattr(index, attr).typecode)
+            arr.frombytes(raw)
+            setattr(index, attr, arr)
+        return index
+
+
+class DirListingParser:
+    """
+    Принимает строки вывода `wimlib-imagex dir --detailed` (или обычного
+    `dir` – по одному пути в строке) и наполняет PathIndex.
+    """
+
+    def __init__(self):
+        self.index = PathIndex()
+        self._ids = {"": ROOT_ID}       # путь -> id, только на время построения
+        self._current = None
+        self._have_size = False
+        self.detailed = False
+
+    def _ensure(self, path: str) -> int:
+        node_id = self._ids.get(path)
+        if node_id is not None:
+            return node_id
+        head, _, name = path.rpartition("/")
+        parent = self._ensure(head)
+        index = self.index
+        node_id = len(index.names)
+        index.names.append(name)
+        index.parents.append(parent)
+        index.dirs.append(0)
+        index.sizes.append(0)
+        index.dirs[parent] = 1
+        self._ids[path] = node_id
+        return node_id
+
+    def feed(self, line: str):
+        # дешёвые проверки startswith отсекают большинство строк до регулярок
+        if line.startswith("Full Path:"):
+            m = _FULL_PATH_RE.match(line)
+            self.detailed = True
+            path = m.group(1).replace("\\", "/").strip("/") if m else ""
+            self._current = self._ensure(path) if path else ROOT_ID
+            self._have_size = False
+            return
+        if self.detailed:
+            if self._current is None:
+                return
+            if line.startswith("Attributes:"):
+                m = _ATTR_RE.match(line)
+                if m and int(m.group(1), 16) & ATTR_DIRECTORY:
+                    self.index.dirs[self._current] = 1
+                return
+            if not self._have_size and "Uncompressed size" in line:
+                m = _SIZE_RE.search(line)
+                if m:
+                    self.index.sizes[self._current] = int(m.group(1))
+                    self._have_size = True
+            return
+        # обычный режим: строка – это путь
+        stripped = line.strip()
+        if stripped.startswith(("/", "\\")):
+            path = stripped.replace("\\", "/").strip("/")
+            if path:
+                self._ensure(path)
+
+    def finish(self) -> PathIndex:
+        self._ids = None
+        return self.index.finalize()
+
+
+# -------------------------------------------------------- КЭШ
+
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def _cache_key(wim, guid, image_index):
+    """
+    Ключ индекса: GUID, номер образа, размер и mtime_ns файла. GUID после
+    update/commit не меняется, поэтому без размера и времени изменения в кэше
+    остаётся дерево до правки. None – файл недоступен или нет GUID.
+    """
+    if not guid:
+        return None
+    try:
+        st = os.stat(wim)
+    except OSError:
+        return None
+    return guid, int(image_index), st.st_size, st.st_mtime_ns
+
+
+def _cache_file(key):
+    directory = os.path.join(app_data_dir(), INDEX_CACHE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, "{}-{}-{}-{}.idx".format(*key))
+
+
+def load_cached_index(wim, guid, image_index):
+    """PathIndex из памяти или с диска, либо None."""
+    key = _cache_key(wim, guid, image_index)
+    if key is None:
+        return None
+    with _memory_lock:
+        index = _memory_cache.get(key)
+        if index is not None:
+            _memory_cache.move_to_end(key)
+            return index
+    try:
+        with open(_cache_file(key), "rb") as f:
+            index = PathIndex.loads(f.read())
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+    _remember(key, index)
+    return index
+
+
+def store_cached_index(wim, guid, image_index, index: PathIndex):
+    key = _cache_key(wim, guid, image_index)
+    if key is None:
+        return
+    _remember(key, index)
+    path = _cache_file(key)
+    try:
+        with open(path + ".tmp", "wb") as f:
+            f.write(index.dumps())
+        os.replace(path + ".tmp", path)
+    except OSError:
+        return
+    # индексы того же образа до изменения файла больше не нужны
+    directory, name = os.path.split(path)
+    stale = "{}-{}-*.idx".format(*key[:2])
+    for other in os.listdir(directory):
+        if other != name and fnmatch.fnmatchcase(other, stale):
+            try:
+                os.remove(os.path.join(directory, other))
+            except OSError:
+                pass
+
+
+def _remember(key, index):
+    with _memory_lock:
+        _memory_cache[key] = index
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
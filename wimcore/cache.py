@@ -0,0 +1,214 @@
+"""
+Постоянный кэш метаданных WIM.
+
+Запись привязана к (абсолютный путь, размер, mtime, GUID из заголовка) и
+автоматически становится недействительной, если что-то из этого изменилось.
+Хранится в JSON-файле в каталоге данных пользователя, с LRU-вытеснением и
+ограничением по числу записей и размеру. Файл пишется не на каждое
+изменение, а не раньше чем через SAVE_DELAY_SEC после первого несохранённого
+(и при выходе из процесса).
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .settings import app_data_dir
+from .wiminfo import WimParseError, read_header, wim_info_from_dict, wim_info_to_dict
+
+CACHE_FILE_NAME = "wim_metadata_cache.json"
+CACHE_VERSION = 1
+SAVE_DELAY_SEC = 1.0
+
+
+def wim_cache_key(wim_path: str):
+    """
+    Ключ кэша для файла: (путь, размер, mtime_ns, guid).
+    Для файлов без корректного WIM-заголовка guid пустой.
+    """
+    path = os.path.abspath(wim_path)
+    st = os.stat(path)
+    try:
+        guid = read_header(path).guid
+    except (WimParseError, OSError):
+        guid = ""
+    return path, st.st_size, st.st_mtime_ns, guid
+
+
+class MetadataCache:
+    def __init__(self, cache_file=None, max_entries=256, max_bytes=8 * 1024 * 1024,
+                 save_delay=SAVE_DELAY_SEC):
+        self.cache_file = cache_file or os.path.join(app_data_dir(), CACHE_FILE_NAME)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.save_delay = save_delay
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # сохранения идут по очереди: новее снимок – позже replace
+        self._entries = OrderedDict()   # path -> entry, порядок = LRU
+        self._sizes = {}                # path -> размер записи в JSON
+        self._total_bytes = 0
+        self._loaded = False            # файл читается при первом обращении
+        self._dirty = False
+        self._timer = None
+        atexit.register(self.flush)
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                self._load()
+
+    # -------------------------------------------------------- ХРАНЕНИЕ
+
+    def _load(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != CACHE_VERSION:
+            return
+        for entry in data.get("entries", []):
+            self._put(entry["key"][0], entry)
+
+    def save(self):
+        """Записывает файл сразу (через временный файл с уникальным именем)."""
+        with self._save_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                self._dirty = False
+                # сериализация под блокировкой: записи меняются на месте в _update
+                text = json.dumps({"version": CACHE_VERSION, "entries": list(self._entries.values())},
+                                  ensure_ascii=False)
+            directory, name = os.path.split(self.cache_file)
+            try:
+                fd, tmp = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=directory)
+            except OSError:
+                return
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp, self.cache_file)
+                self.saves += 1
+            except OSError:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+    def flush(self):
+        """Сохраняет отложенные изменения, если они есть."""
+        if self._dirty:
+            self.save()
+
+    def _schedule_save(self):
+        """Вызывается под self._lock: одно сохранение на пачку изменений за save_delay."""
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _put(self, path, entry):
+        """Вставляет или заменяет запись; вызывается под self._lock."""
+        size = len(json.dumps(entry, ensure_ascii=False))
+        self._total_bytes += size - self._sizes.get(path, 0)
+        self._sizes[path] = size
+        self._entries[path] = entry
+
+    def _drop(self, path):
+        self._entries.pop(path, None)
+        self._total_bytes -= self._sizes.pop(path, 0)
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or (
+                self.max_bytes and self._entries and self._total_bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+
+    # -------------------------------------------------------- ДОСТУП
+
+    def _lookup(self, wim_path: str):
+        self._ensure_loaded()
+        try:
+            key = list(wim_cache_key(wim_path))
+        except OSError:
+            return None, None
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is not None and entry["key"] != key:
+                # файл изменился – запись устарела
+                self._drop(key[0])
+                self._schedule_save()
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key[0])
+        return key, entry
+
+    def _update(self, wim_path: str, name: str, value):
+        self._ensure_loaded()
+        try:
+            key = list(wim_cache_key(wim_path))
+        except OSError:
+            return
+        with self._lock:
+            entry = self._entries.get(key[0])
+            if entry is None or entry["key"] != key:
+                entry = {"key": key, "info": None, "outputs": {}}
+            if name == "info":
+                entry["info"] = value
+            else:
+                entry["outputs"][name] = value
+            self._put(key[0], entry)
+            self._entries.move_to_end(key[0])
+            self._evict()
+            self._schedule_save()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_info(self, wim_path: str):
+        """WimInfo из кэша или None."""
+        _, entry = self._lookup(wim_path)
+        data = entry.get("info") if entry else None
+        self._count(data is not None)
+        if data is None:
+            return None
+        try:
+            return wim_info_from_dict(data)
+        except (KeyError, TypeError):
+            return None
+
+    def put_info(self, wim_path: str, info):
+        self._update(wim_path, "info", wim_info_to_dict(info))
+
+    def get_output(self, wim_path: str, backend: str):
+        """Сохранённый вывод бэкенда (wimlib/dism info) или None."""
+        _, entry = self._lookup(wim_path)
+        output = entry["outputs"].get(backend) if entry else None
+        self._count(output is not None)
+        return output
+
+    def put_output(self, wim_path: str, backend: str, output: str):
+        self._update(wim_path, backend, output)
+
+    def clear(self):
+        self._ensure_loaded()
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+        self.save()
+
+    def stats_text(self) -> str:
+        return f"Кэш метаданных: попаданий {self.hits}, промахов {self.misses}, записей {len(self._entries)}"
@@ -0,0 +1,280 @@
+"""
+Каталог библиотеки WIM в SQLite.
+
+Папки из настроек ("catalog_dirs") обходятся в поисках .wim / .esd / .swm;
+заголовок и XML каждого файла разбираются встроенным парсером и
+сохраняются в базе. При повторном сканировании заново разбираются только
+файлы, у которых изменились размер, mtime или GUID. Разбор идёт на пуле
+потоков, запись в базу – одной транзакцией из потока сканирования.
+
+Таблица образов читается постранично (LIMIT/OFFSET по индексированным
+полям), так что интерфейс не зависит от размера библиотеки.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from .settings import app_data_dir, load_settings, update_settings
+from .wiminfo import WimParseError, read_header, read_wim_info
+
+CATALOG_FILE_NAME = "catalog.sqlite3"
+CATALOG_DIRS_KEY = "catalog_dirs"
+EXTENSIONS = (".wim", ".esd", ".swm")
+PAGE_SIZE = 200
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    guid TEXT NOT NULL DEFAULT '',
+    compression TEXT NOT NULL DEFAULT '',
+    part_number INTEGER NOT NULL DEFAULT 1,
+    total_parts INTEGER NOT NULL DEFAULT 1,
+    error TEXT NOT NULL DEFAULT '',
+    scanned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS images (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    edition TEXT NOT NULL DEFAULT '',
+    build TEXT NOT NULL DEFAULT '',
+    version TEXT NOT NULL DEFAULT '',
+    arch TEXT NOT NULL DEFAULT '',
+    languages TEXT NOT NULL DEFAULT '',
+    installation_type TEXT NOT NULL DEFAULT '',
+    total_bytes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (file_id, idx)
+);
+CREATE INDEX IF NOT EXISTS images_edition ON images(edition);
+CREATE INDEX IF NOT EXISTS images_build ON images(build);
+CREATE INDEX IF NOT EXISTS images_arch ON images(arch);
+"""
+
+# поля фильтра -> колонки
+FILTER_COLUMNS = ("edition", "build", "languages", "arch")
+
+
+@dataclass
+class CatalogImage:
+    path: str
+    index: int
+    name: str
+    edition: str
+    build: str
+    version: str
+    arch: str
+    languages: str
+    total_bytes: int
+
+
+@dataclass
+class ScanResult:
+    found: int = 0
+    parsed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    errors: list = field(default_factory=list)    # [(путь, текст ошибки)]
+    elapsed: float = 0.0
+    cancelled: bool = False
+
+    def describe(self) -> str:
+        text = (f"Найдено файлов: {self.found}, разобрано: {self.parsed}, без изменений: "
+                f"{self.unchanged}, удалено из каталога: {self.removed}, ошибок: {len(self.errors)} "
+                f"({self.elapsed:.2f} с)")
+        return text + (" – прервано" if self.cancelled else "")
+
+
+def catalog_dirs():
+    return list(load_settings().get(CATALOG_DIRS_KEY, []))
+
+
+def set_catalog_dirs(dirs):
+    update_settings(**{CATALOG_DIRS_KEY: list(dirs) or None})
+
+
+def find_wim_files(dirs):
+    """(путь, размер, mtime_ns) всех .wim/.esd/.swm в папках (рекурсивно)."""
+    result = []
+    for directory in dirs:
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if not name.lower().endswith(EXTENSIONS):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                result.append((path, st.st_size, st.st_mtime_ns))
+    return result
+
+
+def _probe(path, size, mtime_ns, known):
+    """
+    Выполняется в пуле. known – (размер, mtime_ns, guid) из каталога или None.
+    Возвращает None, если файл не изменился, иначе (WimInfo или None, ошибка).
+    """
+    if known is not None and known[0] == size and known[1] == mtime_ns:
+        try:
+            if read_header(path).guid == known[2]:
+                return None
+        except (OSError, WimParseError):
+            pass
+    try:
+        return read_wim_info(path), ""
+    except (OSError, WimParseError) as e:
+        return None, str(e)
+
+
+def _like(value):
+    return "%" + value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class Catalog:
+    def __init__(self, db_file=None):
+        self.db_file = db_file or os.path.join(app_data_dir(), CATALOG_FILE_NAME)
+        self._write_lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @contextmanager
+    def _connect(self):
+        # соединение на каждую операцию: сканирование и запросы идут из разных потоков
+        db = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA foreign_keys = ON")
+            with db:    # транзакция
+                yield db
+        finally:
+            db.close()
+
+    # -------------------------------------------------------- СКАНИРОВАНИЕ
+
+    def scan(self, dirs=None, workers=None, on_progress=None, cancel_event=None) -> ScanResult:
+        """
+        Обходит папки (по умолчанию из настроек) и обновляет каталог.
+        on_progress(done, total) вызывается в потоке сканирования.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        started = time.perf_counter()
+        dirs = [os.path.abspath(d) for d in (catalog_dirs() if dirs is None else dirs)]
+        files = find_wim_files(dirs)
+        result = ScanResult(found=len(files))
+
+        with self._connect() as db:
+            known = {path: (size, mtime, guid) for path, size, mtime, guid in
+                     db.execute("SELECT path, size, mtime_ns, guid FROM files")}
+
+        updates = []
+        workers = workers or min(8, (os.cpu_count() or 1) * 2)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_probe, path, size, mtime, known.get(path)): (path, size, mtime)
+                       for path, size, mtime in files}
+            for done, future in enumerate(as_completed(futures), 1):
+                probed = future.result()
+                if probed is None:
+                    result.unchanged += 1
+                else:
+                    updates.append(futures[future] + probed)
+                    if probed[1]:
+                        result.errors.append((futures[future][0], probed[1]))
+                    else:
+                        result.parsed += 1
+                if on_progress is not None:
+                    on_progress(done, len(files))
+                if cancel_event is not None and cancel_event.is_set():
+                    result.cancelled = True
+                    for f in futures:
+                        f.cancel()
+                    break
+
+        present = {path for path, _, _ in files}
+        gone = [] if result.cancelled else [
+            path for path in known
+            if path not in present and any(_under(path, d) for d in dirs)
+        ]
+        with self._write_lock, self._connect() as db:
+            for path, size, mtime, info, error in updates:
+                self._store(db, path, size, mtime, info, error)
+            db.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in gone))
+        result.removed = len(gone)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    @staticmethod
+    def _store(db, path, size, mtime, info, error):
+        db.execute("DELETE FROM files WHERE path = ?", (path,))
+        cur = db.execute(
+            "INSERT INTO files (path, size, mtime_ns, guid, compression, part_number, total_parts, "
+            "error, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, size, mtime, info.guid if info else "", info.compression if info else "",
+             info.part_number if info else 1, info.total_parts if info else 1, error, time.time()),
+        )
+        if info is None:
+            return
+        db.executemany(
+            "INSERT OR REPLACE INTO images (file_id, idx, name, edition, build, version, arch, "
+            "languages, installation_type, total_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(cur.lastrowid, img.index, img.name, img.edition, img.build, img.version, img.arch,
+              ",".join(img.languages), img.installation_type, img.total_bytes) for img in info.images],
+        )
+
+    # -------------------------------------------------------- ЗАПРОСЫ
+
+    @staticmethod
+    def _where(text="", **filters):
+        clauses, params = [], []
+        text = text.strip()
+        if text:
+            clauses.append("(i.name LIKE ? ESCAPE '\\' OR i.edition LIKE ? ESCAPE '\\' "
+                           "OR i.build LIKE ? ESCAPE '\\' OR f.path LIKE ? ESCAPE '\\')")
+            params += [_like(text)] * 4
+        for column in FILTER_COLUMNS:
+            value = (filters.get(column) or "").strip()
+            if value:
+                clauses.append(f"i.{column} LIKE ? ESCAPE '\\'")
+                params.append(_like(value))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, text="", **filters) -> int:
+        where, params = self._where(text, **filters)
+        with self._connect() as db:
+            return db.execute(f"SELECT COUNT(*) FROM images i JOIN files f ON f.id = i.file_id{where}",
+                              params).fetchone()[0]
+
+    def query(self, text="", offset=0, limit=PAGE_SIZE, **filters):
+        """Страница образов, отсортированных по пути и индексу."""
+        where, params = self._where(text, **filters)
+        sql = ("SELECT f.path, i.idx, i.name, i.edition, i.build, i.version, i.arch, i.languages, "
+               f"i.total_bytes FROM images i JOIN files f ON f.id = i.file_id{where} "
+               "ORDER BY f.path, i.idx LIMIT ? OFFSET ?")
+        with self._connect() as db:
+            return [CatalogImage(*row) for row in db.execute(sql, params + [limit, offset])]
+
+    def distinct(self, column):
+        """Значения колонки для выпадающих списков фильтра."""
+        if column not in FILTER_COLUMNS:
+            raise ValueError(column)
+        with self._connect() as db:
+            return [row[0] for row in db.execute(
+                f"SELECT DISTINCT {column} FROM images WHERE {column} != '' ORDER BY {column}")]
+
+    def stats(self):
+        with self._connect() as db:
+            files, errors = db.execute("SELECT COUNT(*), COUNT(NULLIF(error, '')) FROM files").fetchone()
+            images = db.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+        return {"files": files, "images": images, "errors": errors}
+
+
+def _under(path, directory):
+    return os.path.normcase(path).startswith(os.path.normcase(directory.rstrip("\\/")) + os.sep)
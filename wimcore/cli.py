@@ -0,0 +1,760 @@
+"""
+Консольный режим без GUI (tkinter не импортируется).
+
+    python -m wimcore info install.wim
+    python -m wimcore mount install.wim 1 C:\\mount
+    python -m wimcore unmount C:\\mount --discard
+    python -m wimcore commit C:\\mount
+    python -m wimcore export install.wim 6 pro.esd --compress lzms-solid --threads 8
+    python -m wimcore split install.wim E:\\sources\\install.swm --size-mb 4000
+    python -m wimcore join E:\\sources\\install.swm install.wim
+    python -m wimcore bench-compress install.wim --index 6
+    python -m wimcore run --manifest ops.json --jobs 4
+    python -m wimcore verify install.wim --workers 8
+    python -m wimcore dedup a.wim b.wim winre.wim [--per-index]
+    python -m wimcore catalog --scan --dir D:\\images --search "Pro" --arch x64
+    python -m wimcore stats --days 7 --prometheus /var/lib/node_exporter/wim.prom
+    python -m wimcore daemon &                    # общая очередь для GUI и CLI
+    python -m wimcore --daemon mount install.wim 1 /mnt/wim
+
+Результат всегда печатается в stdout в виде JSON. Код возврата 0, если все
+операции успешны, 1 – если хотя бы одна завершилась с ошибкой, 2 – при
+ошибке аргументов или манифеста.
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+from . import backend as be
+
+OPERATIONS = ("info", "mount", "unmount", "commit", "mounted", "export", "capture", "apply", "optimize",
+              "split", "join")
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def load_manifest(path):
+    """
+    Читает список операций из JSON или YAML (YAML – если установлен PyYAML).
+    Допускается как список, так и объект {"operations": [...]}.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    if path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ManifestError("Для YAML-манифестов нужен пакет PyYAML (pip install pyyaml).")
+        data = yaml.safe_load(text)
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ManifestError(f"Некорректный JSON: {e}")
+
+    if isinstance(data, dict):
+        data = data.get("operations")
+    if not isinstance(data, list):
+        raise ManifestError("Манифест должен содержать список операций.")
+    for i, op in enumerate(data):
+        if not isinstance(op, dict) or op.get("op") not in OPERATIONS:
+            raise ManifestError(f"Операция #{i + 1}: поле 'op' должно быть одним из {', '.join(OPERATIONS)}.")
+    return data
+
+
+def _split_source(kind, wim):
+    """Первая часть и шаблон --ref / /SWMFile, если wim – часть .swm."""
+    from .wiminfo import WimParseError, split_source
+    try:
+        return split_source(wim)
+    except WimParseError as e:
+        raise ManifestError(f"{kind}: {e}")
+
+
+def _join_parts(wim):
+    """Части набора .swm по любой из них и индексы образов (для DISM)."""
+    from .wiminfo import WimParseError, read_split_set, read_wim_info
+    try:
+        split = read_split_set(wim)
+    except WimParseError as e:
+        raise ManifestError(f"join: {e}")
+    if split is None:
+        raise ManifestError(f"join: {wim} – не часть разделённого WIM.")
+    if not split.complete:
+        raise ManifestError(f"join: {split.describe()}")
+    try:
+        indexes = [img.index for img in read_wim_info(split.first).images]
+    except WimParseError:
+        indexes = []
+    return split.paths(), indexes
+
+
+def build_operation(op, default_backend="auto", registry=None):
+    """
+    Превращает описание операции в (backend, cmd, locks). Для join через
+    DISM cmd – список команд (по одной на образ), они идут по очереди.
+    Бросает BackendError, ManifestError.
+    """
+    from .jobs import mount_lock, path_lock, wim_lock
+
+    kind = op["op"]
+    mode = op.get("backend", default_backend)
+
+    def need(key):
+        value = op.get(key)
+        if value in (None, ""):
+            raise ManifestError(f"{kind}: не задано поле '{key}'.")
+        return str(value)
+
+    if kind == "mounted":
+        return "dism", be.mounted_cmd(), ()
+
+    # профиль – только если сжатие задано явно; дописывание (capture --append)
+    # сохраняет сжатие существующего WIM, как в GUI
+    profile = None
+    requested = op.get("solid") or any(op.get(k) not in (None, "") for k in ("compress", "threads", "chunk_size"))
+    if kind in ("export", "capture", "optimize") and requested and not op.get("append"):
+        from .compression import CompressionError, get_profile
+        try:
+            profile = get_profile(str(op.get("compress") or "lzx").lower(), threads=op.get("threads"),
+                                  chunk_size=op.get("chunk_size"),
+                                  solid=True if op.get("solid") else None)
+        except CompressionError as e:
+            raise ManifestError(f"{kind}: {e}")
+
+    needs = be.operation_features(kind, profile)
+    if registry is not None and needs["wimlib"] and not registry.get("wimlib").probed:
+        # ключи сжатия и FUSE сверяются с матрицей возможностей – версии проверяются сразу
+        registry.start_probe(background=False)
+    backend = be.select_backend(mode, registry=registry, needs=needs)
+    tool = registry.get(backend) if registry is not None else None
+    if kind == "info":
+        wim = need("wim")
+        return backend, be.info_cmd(backend, wim), ()
+    if kind == "mount":
+        wim, mount_dir = need("wim"), need("mount_dir")
+        wim, ref = _split_source(kind, wim)
+        cmd = be.mount_cmd(backend, wim, op.get("index", 1), mount_dir,
+                           read_only=bool(op.get("read_only", False)), ref=ref, tool=tool)
+        return backend, cmd, (wim_lock(wim), mount_lock(mount_dir))
+    if kind == "unmount":
+        mount_dir = need("mount_dir")
+        return backend, be.unmount_cmd(backend, mount_dir, discard=bool(op.get("discard", False))), \
+            (mount_lock(mount_dir),)
+    if kind == "export":
+        src, dest = need("wim"), need("dest")
+        src, ref = _split_source(kind, src)
+        cmd = be.export_cmd(backend, src, op.get("index", 1), dest, profile=profile,
+                            name=op.get("name"), check=bool(op.get("check", False)), ref=ref, tool=tool)
+        return backend, cmd, (wim_lock(dest),)
+    if kind == "capture":
+        source, dest = need("source"), need("dest")
+        cmd = be.capture_cmd(backend, source, dest, need("name"), profile=profile,
+                             description=op.get("description"), append=bool(op.get("append", False)),
+                             check=bool(op.get("check", False)), tool=tool)
+        return backend, cmd, (wim_lock(dest),)
+    if kind == "apply":
+        wim, target = need("wim"), need("target")
+        wim, ref = _split_source(kind, wim)
+        cmd = be.apply_cmd(backend, wim, op.get("index", 1), target, check=bool(op.get("check", False)),
+                           ref=ref, tool=tool)
+        return backend, cmd, (path_lock("dir", target),)
+    if kind == "split":
+        wim, dest = need("wim"), need("dest")
+        try:
+            part_mb = int(op.get("size_mb") or be.DEFAULT_SPLIT_MB)
+        except (TypeError, ValueError):
+            raise ManifestError("split: size_mb должен быть целым числом МБ.")
+        cmd = be.split_cmd(backend, wim, dest, part_mb, check=bool(op.get("check", False)), tool=tool)
+        return backend, cmd, (wim_lock(wim), wim_lock(dest))
+    if kind == "join":
+        dest = need("dest")
+        parts, indexes = _join_parts(need("wim"))
+        cmds = be.join_cmds(backend, parts, dest, indexes=indexes, check=bool(op.get("check", False)),
+                            tool=tool)
+        return backend, cmds if len(cmds) > 1 else cmds[0], (wim_lock(dest),)
+    if kind == "optimize":
+        wim = need("wim")
+        return backend, be.optimize_cmd(backend, wim, profile=profile, check=bool(op.get("check", False)),
+                                        tool=tool), (wim_lock(wim),)
+    mount_dir = need("mount_dir")
+    return backend, be.commit_cmd(backend, mount_dir, tool=tool), (mount_lock(mount_dir),)
+
+
+def native_info(wim, cache=None):
+    """
+    Индексы WIM встроенным парсером или None, если файл не разобран.
+    cache – кэш метаданных (например, службы), который сам разбирает файл при промахе.
+    """
+    from dataclasses import asdict
+    from .wiminfo import WimParseError, read_split_set, read_wim_info
+    if cache is not None:
+        info = cache.get_info(wim)
+        if info is None:
+            return None
+    else:
+        try:
+            info = read_wim_info(wim)
+        except WimParseError:
+            return None
+    result = {
+        "guid": info.guid,
+        "compression": info.compression,
+        "part_number": info.part_number,
+        "total_parts": info.total_parts,
+        "total_bytes": info.total_bytes,
+        "images": [asdict(img) for img in info.images],
+    }
+    if info.header.is_split:
+        split = read_split_set(wim)
+        if split is not None:
+            result["split"] = {"parts": {str(n): p for n, p in sorted(split.parts.items())},
+                               "missing": split.missing, "duplicates": split.duplicates,
+                               "complete": split.complete}
+    return result
+
+
+def run_operations(ops, jobs=2, dism_jobs=1, default_backend="auto", timeout=None, verbose=False,
+                   daemon=False):
+    """
+    Выполняет операции параллельно через JobScheduler.
+    Возвращает список результатов (словарей) в порядке операций.
+    С daemon=True задания ставятся в очередь фоновой службы (лимиты jobs и
+    dism_jobs тогда задаёт она); если служба недоступна – DaemonError.
+    """
+    results = [None] * len(ops)
+    pending = []
+    heads = []      # первые команды операций; остальные ставит on_done
+    cache = client = None
+    if daemon:
+        from .client import DaemonClient, RemoteMetadataCache
+        client = DaemonClient.connect(name="cli")
+        cache = RemoteMetadataCache(client)
+
+    # info встроенным парсером не ставит заданий – планировщик и реестр для него не нужны
+    queued = []
+    for i, op in enumerate(ops):
+        result = {"op": op["op"], "ok": False}
+        results[i] = result
+
+        if op["op"] == "info" and op.get("native", True) and op.get("wim"):
+            t0 = time.perf_counter()
+            info = native_info(op["wim"], cache)
+            if info is not None:
+                result.update(ok=True, backend="native", info=info,
+                              duration=round(time.perf_counter() - t0, 6))
+                continue
+        queued.append((i, op, result))
+    if not queued:
+        if client is not None:
+            client.close()
+        return results
+
+    from .jobs import Job
+    if daemon:
+        from .client import RemoteScheduler, RemoteToolRegistry
+        registry = RemoteToolRegistry(client)
+        scheduler = RemoteScheduler(client)
+    else:
+        from .jobs import JobScheduler
+        from .telemetry import Telemetry
+        from .tools import ToolRegistry
+        registry = ToolRegistry()
+        scheduler = JobScheduler(limits={"dism": dism_jobs, "wimlib": jobs}, default_limit=jobs,
+                                 telemetry=Telemetry())
+    all_done = threading.Event()
+    remaining = [0]
+    lock = threading.Lock()
+
+    def on_done(job, rest=()):
+        # команды одной операции идут цепочкой: следующая ставится только после успеха
+        # предыдущей, после неудачи остальные не запускаются
+        if rest and job.success:
+            scheduler.submit(rest[0])
+            skipped = 0
+        else:
+            skipped = len(rest)
+        with lock:
+            remaining[0] -= 1 + skipped
+            if remaining[0] == 0:
+                all_done.set()
+
+    for i, op, result in queued:
+        try:
+            backend, cmd, locks = build_operation(op, default_backend, registry)
+        except (be.BackendError, ManifestError) as e:
+            result["error"] = str(e)
+            continue
+
+        if verbose:
+            def on_line(line, _i=i):
+                print(f"[{_i + 1}] {line}", file=sys.stderr, flush=True)
+        else:
+            on_line = None
+
+        # несколько команд одной операции держат одни блокировки и идут по очереди
+        cmds = cmd if isinstance(cmd[0], list) else [cmd]
+        steps = [Job(op["op"], c, backend=backend, locks=locks, timeout=op.get("timeout", timeout),
+                     on_line=on_line, creationflags=be.creationflags()) for c in cmds]
+        for k, step in enumerate(steps):
+            step.on_done = functools.partial(on_done, rest=steps[k + 1:])
+            pending.append((result, step))
+        heads.append(steps[0])
+        result.update(backend=backend, cmd=cmd)
+
+    remaining[0] = len(pending)
+    if not pending:
+        all_done.set()
+    for job in heads:
+        scheduler.submit(job)
+
+    try:
+        while not all_done.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        scheduler.cancel_all()
+        all_done.wait()
+    if client is not None:
+        client.close()
+
+    for result, job in pending:
+        if result.get("state") not in (None, "done"):
+            continue        # следующие команды операции после неудачной не смотрим
+        result.update(
+            ok=job.success,
+            state=job.state,
+            code=job.code,
+            duration=round((job.finished_at or 0) - (job.started_at or job.finished_at or 0), 3),
+            queued=round((job.started_at or job.finished_at or 0) - job.submitted_at, 3),
+            output=job.output,
+        )
+        if job.usage is not None:
+            result.update(cpu=round(job.usage.cpu, 3) if job.usage.cpu is not None else None,
+                          read_bytes=job.usage.read_bytes, write_bytes=job.usage.write_bytes)
+    return results
+
+
+def verify(wim, workers=None, resume=True, verbose=False):
+    """Проверка целостности; Ctrl+C прерывает её с сохранением места."""
+    from .verify import verify_wim
+    from .wiminfo import WimParseError
+
+    def on_progress(done, total):
+        if verbose and total:
+            print(f"{done * 100 // total}%", file=sys.stderr)
+
+    try:
+        report = verify_wim(wim, workers=workers, on_progress=on_progress, resume=resume)
+    except (OSError, ValueError, WimParseError) as e:
+        return {"ok": False, "wim": wim, "error": str(e)}
+    result = _verify_result(report)
+    if report.parts:
+        result["incomplete"] = report.incomplete
+        result["parts"] = [dict(_verify_result(part), part_number=part.part_number) for part in report.parts]
+    return result
+
+
+def _verify_result(report):
+    return {
+        "ok": report.ok,
+        "wim": report.path,
+        "bytes_verified": report.bytes_verified,
+        "bytes_total": report.bytes_total,
+        "mb_per_sec": round(report.throughput, 1),
+        "elapsed": round(report.elapsed, 3),
+        "integrity_chunks": report.integrity_chunks,
+        "blobs_checked": report.blobs_checked,
+        "blobs_skipped": report.blobs_skipped,
+        "unverified": report.unverified,
+        "resumed_batches": report.resumed_batches,
+        "cancelled": report.cancelled,
+        "first_corrupt_offset": report.first_corrupt_offset,
+        "corrupt": [{"kind": k, "number": n, "offset": o} for k, n, o in report.corrupt],
+    }
+
+
+def dedup(wims, per_index=False):
+    """Пересечение данных между WIM (по файлам или, с wimlib, по индексам)."""
+    import subprocess
+    from dataclasses import asdict
+    from .browser import dir_cmd
+    from .dedup import DedupAnalyzer
+    from .wiminfo import WimParseError, read_wim_info
+
+    analyzer = DedupAnalyzer()
+    try:
+        for wim in wims:
+            analyzer.add_wim(wim)
+        report = analyzer.report()
+        by_index = None
+        if per_index:
+            if not be.find_wimlib():
+                return {"ok": False, "error": "Для анализа по индексам нужен wimlib-imagex."}
+            indexes = DedupAnalyzer()
+            for wim in wims:
+                for image in read_wim_info(wim).images:
+                    with subprocess.Popen(dir_cmd(wim, image.index), stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL, text=True, encoding="utf-8",
+                                          errors="replace", creationflags=be.creationflags()) as proc:
+                        indexes.add_listing(f"{wim}:{image.index}", proc.stdout)
+            by_index = indexes.report()
+    except (OSError, WimParseError) as e:
+        return {"ok": False, "error": str(e)}
+
+    def sources(rep):
+        return [dict(asdict(s), shared_bytes=s.shared_bytes) for s in rep.sources]
+
+    result = {
+        "ok": True,
+        "wims": sources(report),
+        "distinct_blobs": report.distinct_blobs,
+        "distinct_bytes": report.distinct_bytes,
+        "total_bytes": report.total_bytes,
+        "total_file_bytes": report.total_files,
+        "merged_wim_bytes": report.merged_size,
+        "savings_bytes": report.savings,
+    }
+    if by_index is not None:
+        result["indexes"] = sources(by_index)
+    return result
+
+
+def catalog(scan=False, dirs=None, text="", limit=50, verbose=False, **filters):
+    """Сканирование каталога библиотеки и/или поиск по нему."""
+    from dataclasses import asdict
+    from .catalog import Catalog, catalog_dirs, set_catalog_dirs
+
+    if dirs:
+        known = catalog_dirs()
+        set_catalog_dirs(known + [d for d in map(os.path.abspath, dirs) if d not in known])
+    db = Catalog()
+    result = {"ok": True, "dirs": catalog_dirs()}
+    if scan:
+        def on_progress(done, total):
+            if verbose:
+                print(f"{done}/{total}", file=sys.stderr)
+
+        report = db.scan(on_progress=on_progress)
+        result["scan"] = {
+            "found": report.found, "parsed": report.parsed, "unchanged": report.unchanged,
+            "removed": report.removed, "elapsed": round(report.elapsed, 3),
+            "errors": [{"path": p, "error": e} for p, e in report.errors],
+        }
+    result["total"] = db.count(text, **filters)
+    result["images"] = [asdict(img) for img in db.query(text, limit=limit, **filters)]
+    return result
+
+
+def bench_compress(wim, index=1, profiles=None, threads=None, chunk_size=None, verbose=False):
+    """Прогон образа через профили сжатия (нужен wimlib-imagex)."""
+    from .compression import CompressionError, benchmark_header, benchmark_profiles
+
+    if not be.find_wimlib():
+        return {"ok": False, "error": "Для сравнения профилей нужен wimlib-imagex."}
+
+    def on_result(result):
+        if verbose:
+            print(result.describe(), file=sys.stderr, flush=True)
+
+    if verbose:
+        print(benchmark_header(), file=sys.stderr)
+    try:
+        results = benchmark_profiles(wim, index, profiles=profiles, threads=threads,
+                                     chunk_size=chunk_size, on_result=on_result)
+    except (OSError, CompressionError) as e:
+        return {"ok": False, "error": str(e)}
+    return {
+        "ok": all(r.ok for r in results),
+        "wim": wim,
+        "index": index,
+        "input_bytes": results[0].input_bytes if results else 0,
+        "results": [{
+            "profile": r.profile.name,
+            "options": r.profile.wimlib_args(),
+            "wall": round(r.wall, 3),
+            "cpu": round(r.cpu, 3) if r.cpu is not None else None,
+            "mb_per_sec": round(r.throughput, 1),
+            "output_bytes": r.output_size,
+            "ratio": round(r.ratio, 4),
+            "error": r.error,
+        } for r in results],
+    }
+
+
+def stats(days=None, csv_path=None, prometheus_path=None):
+    """Сводка телеметрии (p50/p95 по операциям) и выгрузка в CSV / Prometheus."""
+    from dataclasses import asdict
+    from .telemetry import load_records, summarize, to_csv, to_prometheus
+
+    records = load_records(since=time.time() - days * 86400 if days else None)
+    try:
+        if csv_path:
+            with open(csv_path, "w", encoding="utf-8", newline="") as f:
+                to_csv(records, f)
+        if prometheus_path:
+            # textfile collector читает файл целиком – пишем атомарно
+            tmp = prometheus_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(to_prometheus(records))
+            os.replace(tmp, prometheus_path)
+    except OSError as e:
+        return {"ok": False, "error": str(e)}
+    return {"ok": True, "records": len(records), "operations": [asdict(s) for s in summarize(records)]}
+
+
+def _add_compression_args(p):
+    from .compression import PROFILES
+    p.add_argument("--compress", type=str.lower, choices=list(PROFILES), default=None,
+                   help="профиль сжатия (lzms-solid – ESD)")
+    p.add_argument("--threads", type=int, default=None, help="потоков сжатия (wimlib)")
+    p.add_argument("--chunk-size", default=None, help="размер блока, например 32K или 1M (wimlib)")
+    p.add_argument("--solid", action="store_true", help="solid-режим (wimlib)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m wimcore",
+        description="WIM Manager Cicada3301 – консольный режим (DISM / wimlib-imagex).",
+    )
+    parser.add_argument("--backend", choices=be.BACKENDS, default="auto")
+    parser.add_argument("--timeout", type=float, default=None, help="таймаут одной операции, с")
+    parser.add_argument("-v", "--verbose", action="store_true", help="печатать вывод команд в stderr")
+    parser.add_argument("--daemon", action="store_true",
+                        help="ставить задания в очередь фоновой службы (python -m wimcore daemon)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("info", help="индексы WIM")
+    p.add_argument("wim")
+    p.add_argument("--no-native", action="store_true", help="не использовать встроенный парсер")
+
+    p = sub.add_parser("mount", help="монтирование")
+    p.add_argument("wim")
+    p.add_argument("index")
+    p.add_argument("mount_dir")
+    p.add_argument("--read-only", action="store_true")
+
+    p = sub.add_parser("unmount", help="размонтирование")
+    p.add_argument("mount_dir")
+    p.add_argument("--discard", action="store_true", help="отбросить изменения (по умолчанию commit)")
+
+    p = sub.add_parser("commit", help="сохранить изменения без размонтирования (DISM)")
+    p.add_argument("mount_dir")
+
+    sub.add_parser("mounted", help="список смонтированных WIM (DISM)")
+    sub.add_parser("tools", help="найденные инструменты, версии и возможности")
+
+    p = sub.add_parser("export", help="экспорт образа (с пересжатием)")
+    p.add_argument("wim")
+    p.add_argument("index")
+    p.add_argument("dest")
+    p.add_argument("--name", default=None, help="имя образа в новом WIM")
+    p.add_argument("--check", action="store_true", help="таблица целостности")
+    _add_compression_args(p)
+
+    p = sub.add_parser("capture", help="захват папки в WIM")
+    p.add_argument("source")
+    p.add_argument("dest")
+    p.add_argument("name")
+    p.add_argument("--description", default=None)
+    p.add_argument("--append", action="store_true", help="добавить образ в существующий WIM")
+    p.add_argument("--check", action="store_true")
+    _add_compression_args(p)
+
+    p = sub.add_parser("apply", help="развёртывание образа в папку")
+    p.add_argument("wim")
+    p.add_argument("index")
+    p.add_argument("target")
+    p.add_argument("--check", action="store_true")
+
+    p = sub.add_parser("optimize", help="пересборка WIM без свободного места (wimlib)")
+    p.add_argument("wim")
+    p.add_argument("--check", action="store_true")
+    _add_compression_args(p)
+
+    p = sub.add_parser("split", help="разбить WIM на части .swm (например, для FAT32)")
+    p.add_argument("wim")
+    p.add_argument("dest", help="имя первой части, например install.swm")
+    p.add_argument("--size-mb", type=int, default=be.DEFAULT_SPLIT_MB,
+                   help=f"наибольший размер части, МБ (по умолчанию {be.DEFAULT_SPLIT_MB})")
+    p.add_argument("--check", action="store_true")
+
+    p = sub.add_parser("join", help="собрать части .swm в один WIM")
+    p.add_argument("wim", help="любая часть набора; остальные находятся по имени и GUID")
+    p.add_argument("dest")
+    p.add_argument("--check", action="store_true")
+
+    p = sub.add_parser("bench-compress", help="сравнить профили сжатия на образе (wimlib)")
+    p.add_argument("wim")
+    p.add_argument("--index", type=int, default=1)
+    p.add_argument("--profiles", default=None, help="через запятую, по умолчанию все")
+    p.add_argument("--threads", type=int, default=None)
+    p.add_argument("--chunk-size", default=None)
+
+    p = sub.add_parser("verify", help="проверка целостности WIM или набора .swm (SHA-1, на всех ядрах)")
+    p.add_argument("wim")
+    p.add_argument("-w", "--workers", type=int, default=None, help="число процессов (по умолчанию – все ядра)")
+    p.add_argument("--restart", action="store_true", help="начать заново, не продолжая прерванную проверку")
+
+    p = sub.add_parser("dedup", help="общие и уникальные данные в наборе WIM, размер объединённого WIM")
+    p.add_argument("wims", nargs="+")
+    p.add_argument("--per-index", action="store_true", help="также по индексам образов (нужен wimlib-imagex)")
+
+    p = sub.add_parser("catalog", help="каталог библиотеки WIM (SQLite): сканирование и поиск")
+    p.add_argument("--scan", action="store_true", help="обновить каталог (только изменившиеся файлы)")
+    p.add_argument("--dir", action="append", default=[], help="добавить папку в каталог (можно несколько)")
+    p.add_argument("--search", default="", help="подстрока в имени, редакции, сборке или пути")
+    for column in ("edition", "build", "arch"):
+        p.add_argument(f"--{column}", default="")
+    p.add_argument("--language", default="")
+    p.add_argument("--limit", type=int, default=50)
+
+    p = sub.add_parser("stats", help="телеметрия операций: p50/p95, выгрузка в CSV / Prometheus")
+    p.add_argument("--days", type=float, default=None, help="только за последние N дней")
+    p.add_argument("--csv", default=None, help="записи в CSV-файл")
+    p.add_argument("--prometheus", default=None, help="сводка в .prom для textfile collector")
+
+    p = sub.add_parser("run", help="выполнить операции из манифеста")
+    p.add_argument("--manifest", required=True, help="JSON/YAML-файл со списком операций")
+    p.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 2,
+                   help="число параллельных операций wimlib")
+    p.add_argument("--dism-jobs", type=int, default=1, help="число параллельных операций DISM")
+
+    p = sub.add_parser("daemon", help="фоновая служба заданий: общая очередь для GUI и CLI")
+    p.add_argument("--listen", default=None,
+                   help="адрес: unix:/путь/к/сокету или tcp:127.0.0.1:порт (по умолчанию – сокет "
+                        "в каталоге данных, в Windows – TCP на свободном порту)")
+    p.add_argument("--tcp", action="store_true", help="TCP на 127.0.0.1 вместо Unix-сокета")
+    p.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 2,
+                   help="число параллельных операций wimlib")
+    p.add_argument("--dism-jobs", type=int, default=1, help="число параллельных операций DISM")
+    p.add_argument("--status", action="store_true", help="состояние запущенной службы")
+    p.add_argument("--stop", action="store_true", help="остановить запущенную службу")
+    return parser
+
+
+def daemon(args):
+    """Подкоманда daemon: запуск службы на переднем плане, --status или --stop."""
+    from .client import DaemonClient
+    from .daemon import DaemonError, run_daemon
+
+    if args.status or args.stop:
+        try:
+            client = DaemonClient.connect(name="cli")
+            result = client.call("shutdown" if args.stop else "stats")
+            client.close()
+        except DaemonError as e:
+            print(json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False))
+            return 1
+        print(json.dumps({"ok": True, "result": result}, ensure_ascii=False, indent=2))
+        return 0
+
+    jobs, dism_jobs = max(1, args.jobs), max(1, args.dism_jobs)
+    address = args.listen or ("tcp:127.0.0.1:0" if args.tcp else None)
+
+    def on_ready(d):
+        print(json.dumps({"ok": True, "pid": os.getpid(), "address": d.address,
+                          "limits": d.scheduler.limits}, ensure_ascii=False), flush=True)
+
+    try:
+        run_daemon(address, limits={"dism": dism_jobs, "wimlib": jobs}, default_limit=jobs,
+                   on_ready=on_ready)
+    except (DaemonError, OSError) as e:
+        print(json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False))
+        return 2
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    jobs, dism_jobs = 1, 1
+    if args.command == "daemon":
+        return daemon(args)
+    if args.command == "tools":
+        if args.daemon:
+            from .client import DaemonClient
+            from .daemon import DaemonError
+            try:
+                client = DaemonClient.connect(name="cli")
+                try:
+                    matrix = client.call("tools", probe=True)
+                finally:
+                    client.close()
+            except DaemonError as e:
+                print(json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False))
+                return 2
+        else:
+            from .tools import ToolRegistry
+            registry = ToolRegistry()
+            registry.start_probe(background=False)
+            matrix = registry.capability_matrix()
+        print(json.dumps(matrix, ensure_ascii=False, indent=2))
+        return 0
+    if args.command == "bench-compress":
+        profiles = args.profiles.split(",") if args.profiles else None
+        result = bench_compress(args.wim, args.index, profiles=profiles, threads=args.threads,
+                                chunk_size=args.chunk_size, verbose=args.verbose)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0 if result["ok"] else 1
+    if args.command == "verify":
+        result = verify(args.wim, workers=args.workers, resume=not args.restart, verbose=args.verbose)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0 if result["ok"] else 1
+    if args.command == "dedup":
+        result = dedup(args.wims, per_index=args.per_index)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0 if result["ok"] else 1
+    if args.command == "catalog":
+        result = catalog(scan=args.scan, dirs=args.dir, text=args.search, limit=args.limit,
+                         verbose=args.verbose, edition=args.edition, build=args.build,
+                         languages=args.language, arch=args.arch)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+    if args.command == "stats":
+        result = stats(args.days, csv_path=args.csv, prometheus_path=args.prometheus)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0 if result["ok"] else 1
+    if args.command == "run":
+        try:
+            ops = load_manifest(args.manifest)
+        except (OSError, ManifestError) as e:
+            print(json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False))
+            return 2
+        jobs, dism_jobs = max(1, args.jobs), max(1, args.dism_jobs)
+    elif args.command == "info":
+        ops = [{"op": "info", "wim": args.wim, "native": not args.no_native}]
+    elif args.command == "mount":
+        ops = [{"op": "mount", "wim": args.wim, "index": args.index,
+                "mount_dir": args.mount_dir, "read_only": args.read_only}]
+    elif args.command in ("export", "capture", "apply", "optimize", "split", "join"):
+        op = {k: v for k, v in vars(args).items()
+              if k not in ("command", "backend", "timeout", "verbose", "daemon")}
+        op["op"] = args.command
+        ops = [op]
+    elif args.command == "unmount":
+        ops = [{"op": "unmount", "mount_dir": args.mount_dir, "discard": args.discard}]
+    else:
+        ops = [{"op": args.command, "mount_dir": getattr(args, "mount_dir", None)}]
+
+    options = dict(jobs=jobs, dism_jobs=dism_jobs, default_backend=args.backend, timeout=args.timeout,
+                   verbose=args.verbose)
+    if not args.daemon:
+        results = run_operations(ops, **options)
+    else:
+        from .daemon import DaemonError
+        try:
+            results = run_operations(ops, daemon=True, **options)
+        except DaemonError as e:
+            print(json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False))
+            return 2
+    ok = all(r["ok"] for r in results)
+    print(json.dumps({"ok": ok, "results": results}, ensure_ascii=False, indent=2))
+    return 0 if ok else 1
@@ -0,0 +1,413 @@
+"""
+Тонкие клиенты фоновой службы заданий (см. daemon).
+
+DaemonClient – соединение JSON-RPC: вызовы из любого потока, ответы и
+события читает отдельный поток. Поверх него – замены локальных объектов с
+тем же интерфейсом, чтобы GUI и CLI не знали, где выполняются задания:
+
+- RemoteScheduler вместо JobScheduler: submit(Job) отправляет команду в
+  службу, а события переводятся обратно в состояние Job и его колбэки
+  (on_line, on_progress, on_done), job.wait() работает как обычно;
+- RemoteToolRegistry вместо ToolRegistry – матрица возможностей службы;
+- RemoteMetadataCache вместо MetadataCache – общий кэш службы.
+"""
+import concurrent.futures
+import itertools
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+from .daemon import DaemonError, parse_address, read_daemon_file
+from .jobs import FAILED, FINISHED_STATES, MAX_FINISHED_JOBS, Job
+from .process import Progress
+from .tools import DISM_FEATURES, WIMLIB, WIMLIB_FEATURES, ToolInfo, ToolRegistry
+
+CONNECT_TIMEOUT_SEC = 5
+CALL_TIMEOUT_SEC = 60
+
+
+class DaemonClient:
+    def __init__(self, address, token, name="", timeout=CALL_TIMEOUT_SEC):
+        self.address = address
+        self.name = name
+        self.timeout = timeout
+        self.hello = None
+        self._listeners = []        # колбэки(method, params) для событий
+        self._close_listeners = []
+        self._pending = {}          # id запроса -> Future
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._sock = _connect(address)
+        self._file = self._sock.makefile("rb")
+        self._reader = threading.Thread(target=self._read_loop, name="wim-daemon-client", daemon=True)
+        self._reader.start()
+        self.hello = self.call("hello", token=token, client=name)
+
+    @classmethod
+    def connect(cls, name="", address=None, state_file=None):
+        """Подключение к запущенной службе по daemon.json (адрес можно задать явно)."""
+        state = read_daemon_file(state_file)
+        if state is None:
+            raise DaemonError("Служба заданий не запущена (python -m wimcore daemon).")
+        return cls(address or state["address"], state.get("token", ""), name=name)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def add_listener(self, fn):
+        """fn(method, params) – в потоке чтения; долгую работу лучше отдать в другой поток."""
+        self._listeners.append(fn)
+
+    def on_close(self, fn):
+        self._close_listeners.append(fn)
+
+    # -------------------------------------------------------- ВЫЗОВЫ
+
+    def call_async(self, method, **params) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        req_id = next(self._ids)
+        data = json.dumps({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params},
+                          ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._closed:
+                raise DaemonError("Соединение со службой закрыто.")
+            self._pending[req_id] = future
+        try:
+            with self._send_lock:
+                self._sock.sendall(data)
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(req_id, None)
+            raise DaemonError(f"Служба недоступна: {e}")
+        return future
+
+    def call(self, method, **params):
+        future = self.call_async(method, **params)
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            raise DaemonError(f"Служба не ответила на {method} за {self.timeout} с.")
+
+    def close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    # -------------------------------------------------------- ЧТЕНИЕ
+
+    def _read_loop(self):
+        try:
+            for line in self._file:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if "id" in message and ("result" in message or "error" in message):
+                    with self._lock:
+                        future = self._pending.pop(message["id"], None)
+                    if future is None:
+                        continue
+                    error = message.get("error")
+                    if error:
+                        future.set_exception(DaemonError(error.get("message", ""), error.get("code")))
+                    else:
+                        future.set_result(message.get("result"))
+                elif "method" in message:
+                    for fn in list(self._listeners):
+                        try:
+                            fn(message["method"], message.get("params") or {})
+                        except Exception:
+                            pass
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(DaemonError("Соединение со службой закрыто."))
+        for fn in list(self._close_listeners):
+            try:
+                fn(self)
+            except Exception:
+                pass
+
+
+def _connect(address):
+    kind, target = parse_address(address)
+    try:
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(CONNECT_TIMEOUT_SEC)
+            sock.connect(target)
+        else:
+            sock = socket.create_connection(target, timeout=CONNECT_TIMEOUT_SEC)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError as e:
+        raise DaemonError(f"Не удалось подключиться к службе {address}: {e}")
+    sock.settimeout(None)
+    return sock
+
+
+class RemoteScheduler:
+    """Тот же интерфейс, что у JobScheduler, но задания выполняет служба."""
+
+    def __init__(self, client: DaemonClient, on_change=None):
+        self.client = client
+        self.on_change = on_change
+        hello = client.hello or {}
+        self.limits = dict(hello.get("limits") or {})
+        self.default_limit = hello.get("default_limit")
+        self._lock = threading.RLock()
+        self._jobs = []
+        self._by_ref = {}           # ref (= локальный id) -> Job
+        self._remote = {}           # локальный id -> id задания в службе
+        # колбэки заданий – в своём потоке: из них можно снова звать службу
+        self._events = queue.Queue()
+        threading.Thread(target=self._event_loop, name="wim-daemon-events", daemon=True).start()
+        client.add_listener(lambda method, params: self._events.put((method, params)))
+        client.on_close(lambda _client: self._events.put(("closed", None)))
+
+    # -------------------------------------------------------- ОЧЕРЕДЬ
+
+    def submit(self, job: Job) -> Job:
+        with self._lock:
+            self._jobs.append(job)
+            self._by_ref[job.id] = job
+            self._trim()
+        self._notify(job)
+        params = {"cmd": job.cmd, "name": job.name, "backend": job.backend, "locks": sorted(job.locks),
+                  "timeout": job.timeout, "stdin_path": job.stdin_path, "ref": job.id,
+                  "lines": job.on_line is not None}
+        if job.deadline is not None:
+            params["deadline_in"] = max(0.0, job.deadline - time.monotonic())
+        try:
+            result = self.client.call("submit", **params)
+        except DaemonError as e:
+            self._events.put(("failed", (job, e)))
+        else:
+            with self._lock:
+                if not job.finished:
+                    self._remote[job.id] = result["job"]
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._jobs:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def cancel(self, job_or_id) -> bool:
+        job = job_or_id if isinstance(job_or_id, Job) else self.get(job_or_id)
+        if job is None or job.finished:
+            return False
+        with self._lock:
+            remote = self._remote.get(job.id)
+        if remote is None:
+            return False
+        try:
+            return bool(self.client.call("cancel", job=remote))
+        except DaemonError:
+            return False
+
+    def cancel_all(self):
+        for job in self.jobs():
+            self.cancel(job)
+
+    def _trim(self):
+        finished = [j for j in self._jobs if j.finished]
+        for job in finished[:-MAX_FINISHED_JOBS]:
+            self._jobs.remove(job)
+
+    # -------------------------------------------------------- СОБЫТИЯ
+
+    def _event_loop(self):
+        while True:
+            method, params = self._events.get()
+            try:
+                if method == "closed":
+                    self._fail_all(DaemonError("Соединение со службой заданий потеряно."))
+                elif method == "failed":
+                    self._complete(*params)
+                else:
+                    self._on_event(method, params)
+            except Exception:
+                pass
+
+    def _on_event(self, method, params):
+        with self._lock:
+            job = self._by_ref.get(params.get("ref"))
+        if job is None or job.finished:
+            return
+        if method == "line":
+            callbacks = job.on_line if isinstance(job.on_line, (list, tuple)) else [job.on_line]
+            for fn in callbacks:
+                if fn is not None:
+                    fn(params["line"])
+        elif method == "progress":
+            progress = Progress(**params["progress"])
+            job.last_progress = progress
+            if job.on_progress is not None:
+                job.on_progress(progress)
+        elif method == "job":
+            job.code = params.get("code")
+            job.started_at = params.get("started_at")
+            if params["state"] in FINISHED_STATES:
+                job.output = params.get("output") or ""
+                job.finished_at = params.get("finished_at")
+                if params.get("usage"):
+                    from .telemetry import ResourceUsage
+                    job.usage = ResourceUsage(**params["usage"])
+                error = params.get("error")
+                self._complete(job, DaemonError(error) if error else None, params["state"])
+            elif params["state"] != job.state:
+                job.state = params["state"]
+                self._notify(job)
+
+    def _complete(self, job, error=None, state=FAILED):
+        if job.finished:
+            return
+        if error is not None:
+            job.error = error
+            job.output = job.output or str(error)
+        if job.finished_at is None:
+            job.finished_at = time.time()
+        with self._lock:
+            job.state = state
+            self._by_ref.pop(job.id, None)
+            self._remote.pop(job.id, None)
+        if job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception:
+                pass
+        self._notify(job)
+        job._finish()
+
+    def _fail_all(self, error):
+        with self._lock:
+            jobs = [job for job in self._jobs if not job.finished]
+        for job in jobs:
+            self._complete(job, error)
+
+    def _notify(self, job):
+        if self.on_change is not None:
+            try:
+                self.on_change(job)
+            except Exception:
+                pass
+
+
+class RemoteToolRegistry(ToolRegistry):
+    """Инструменты, найденные службой: select_backend и GUI читают их как обычно."""
+
+    def __init__(self, client: DaemonClient, on_probed=None):
+        super().__init__(on_probed=on_probed)
+        self.client = client
+        self._fill(client.call("tools"))
+
+    def _fill(self, matrix):
+        tools = {}
+        for name, row in matrix.items():
+            features = WIMLIB_FEATURES if name == WIMLIB else DISM_FEATURES
+            info = ToolInfo(name, path=row.get("path"), version=row.get("version"),
+                            features={f for f in features if row.get(f)}, probed=bool(row.get("probed")))
+            if row.get("path") and not row.get("available"):
+                info.error = "не запускается"
+            tools[name] = info
+        with self._lock:
+            self._tools = tools
+            self._generation += 1
+
+    def _locate(self):
+        self._fill(self.client.call("tools", refresh=True))
+        return self._generation
+
+    def _ensure_fresh(self):
+        pass        # PATH этого процесса не важен: команды запускает служба
+
+    def invalidate(self, background=True):
+        self.start_probe(background=background, refresh=True)
+
+    def start_probe(self, background=True, refresh=False):
+        def worker():
+            try:
+                self._fill(self.client.call("tools", probe=True, refresh=refresh))
+            except DaemonError:
+                return
+            if self.on_probed is not None:
+                self.on_probed(self)
+
+        if background:
+            threading.Thread(target=worker, daemon=True).start()
+        else:
+            worker()
+
+
+class RemoteMetadataCache:
+    """Интерфейс MetadataCache поверх общего кэша службы."""
+
+    def __init__(self, client: DaemonClient):
+        self.client = client
+        self.hits = 0
+        self.misses = 0
+
+    def get_info(self, wim_path):
+        """
+        WimInfo от службы: при промахе она сама разбирает файл и кэширует
+        результат, так что None – файл не разобран.
+        """
+        from .wiminfo import wim_info_from_dict
+        try:
+            data = self.client.call("info", wim=os.path.abspath(wim_path))
+        except DaemonError:
+            data = None
+        self._count(data is not None)
+        return None if data is None else wim_info_from_dict(data)
+
+    def put_info(self, wim_path, info):
+        pass        # служба уже сохранила результат разбора в get_info
+
+    def get_output(self, wim_path, backend):
+        try:
+            output = self.client.call("output_get", wim=os.path.abspath(wim_path), backend=backend)
+        except DaemonError:
+            output = None
+        self._count(output is not None)
+        return output
+
+    def put_output(self, wim_path, backend, output):
+        try:
+            self.client.call("output_put", wim=os.path.abspath(wim_path), backend=backend, output=output)
+        except DaemonError:
+            pass
+
+    def clear(self):
+        self.client.call("cache_clear")
+
+    def save(self):
+        pass
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats_text(self) -> str:
+        try:
+            return self.client.call("cache_stats") + " (служба)"
+        except DaemonError as e:
+            return f"Кэш метаданных службы недоступен: {e}"
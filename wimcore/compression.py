@@ -0,0 +1,233 @@
+"""
+Профили сжатия для export / capture / optimize и их сравнение.
+
+Профиль задаёт тип сжатия wimlib (none / XPRESS / LZX / LZMS), solid-режим,
+размер блока и число потоков и переводится в аргументы wimlib-imagex или
+в /Compress:... для DISM (там, где у DISM есть аналог).
+
+benchmark_profiles() прогоняет один образ через каждый профиль (export во
+временный WIM) и измеряет время, процессорное время, скорость и размер
+результата – чтобы выбрать компромисс под конкретное железо.
+"""
+import os
+import tempfile
+import time
+from dataclasses import dataclass, replace
+
+COMPRESSION_TYPES = ("none", "XPRESS", "LZX", "LZMS")
+
+# допустимые размеры блока (степени двойки), как в wimlib
+CHUNK_LIMITS = {"XPRESS": (1 << 12, 1 << 16), "LZX": (1 << 15, 1 << 21), "LZMS": (1 << 15, 1 << 30)}
+
+# аналоги в DISM: /Compress:{none|fast|max|recovery}
+_DISM_COMPRESS = {"none": "none", "XPRESS": "fast", "LZX": "max"}
+
+_SIZE_SUFFIXES = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+class CompressionError(ValueError):
+    pass
+
+
+def parse_size(text) -> int:
+    """"32768", "32K", "1M" -> байты."""
+    text = str(text).strip().upper().rstrip("B").rstrip("I")
+    multiplier = _SIZE_SUFFIXES.get(text[-1:], 1)
+    digits = text[:-1] if text[-1:] in _SIZE_SUFFIXES else text
+    try:
+        return int(digits) * multiplier
+    except ValueError:
+        raise CompressionError(f"Некорректный размер: {text}")
+
+
+def format_size(size) -> str:
+    for suffix, value in (("G", 1 << 30), ("M", 1 << 20), ("K", 1 << 10)):
+        if size >= value and size % value == 0:
+            return f"{size // value}{suffix}"
+    return str(size)
+
+
+@dataclass(frozen=True)
+class CompressionProfile:
+    name: str
+    compress: str = "LZX"
+    solid: bool = False
+    chunk_size: int = None      # None – по умолчанию wimlib
+    threads: int = None         # None – по числу ядер
+
+    def validate(self):
+        if self.compress not in COMPRESSION_TYPES:
+            raise CompressionError(f"Неизвестный тип сжатия: {self.compress}")
+        if self.solid and self.compress == "none":
+            raise CompressionError("Solid-режим требует сжатия.")
+        if self.chunk_size is not None:
+            size = self.chunk_size
+            lo, hi = CHUNK_LIMITS.get(self.compress, (0, 0))
+            if size & (size - 1) or not lo <= size <= hi:
+                raise CompressionError(
+                    f"Размер блока для {self.compress}: степень двойки от "
+                    f"{format_size(lo)} до {format_size(hi)}." if hi else
+                    "Размер блока задаётся только для сжатых WIM."
+                )
+        if self.threads is not None and self.threads < 1:
+            raise CompressionError("Число потоков должно быть положительным.")
+        return self
+
+    def with_options(self, threads=None, chunk_size=None, solid=None):
+        return replace(
+            self,
+            threads=self.threads if threads is None else threads,
+            chunk_size=self.chunk_size if chunk_size is None else chunk_size,
+            solid=self.solid if solid is None else solid,
+        ).validate()
+
+    def wimlib_args(self):
+        self.validate()
+        if self.solid:
+            args = ["--solid", f"--solid-compress={self.compress}"]
+            if self.chunk_size:
+                args.append(f"--solid-chunk-size={self.chunk_size}")
+        else:
+            args = [f"--compress={self.compress}"]
+            if self.chunk_size:
+                args.append(f"--chunk-size={self.chunk_size}")
+        if self.threads:
+            args.append(f"--threads={self.threads}")
+        return args
+
+    def dism_compress(self, operation="export") -> str:
+        """
+        Значение /Compress для DISM. LZMS+solid – это ESD (/Compress:recovery,
+        только при экспорте); размер блока, число потоков и LZMS без solid
+        DISM не настраивает.
+        """
+        self.validate()
+        if self.chunk_size or self.threads:
+            raise CompressionError("DISM не поддерживает размер блока и число потоков – выберите wimlib.")
+        if self.solid:
+            if self.compress == "LZMS" and operation == "export":
+                return "recovery"
+            raise CompressionError("Solid-сжатие в DISM доступно только при экспорте в ESD (LZMS).")
+        value = _DISM_COMPRESS.get(self.compress)
+        if value is None:
+            raise CompressionError(f"DISM не поддерживает {self.compress} без solid-режима.")
+        return value
+
+    def describe(self) -> str:
+        parts = [self.compress + (" solid" if self.solid else "")]
+        if self.chunk_size:
+            parts.append(f"блок {format_size(self.chunk_size)}")
+        if self.threads:
+            parts.append(f"потоков {self.threads}")
+        return f"{self.name} ({', '.join(parts)})"
+
+
+PROFILES = {p.name: p for p in (
+    CompressionProfile("none", "none"),
+    CompressionProfile("xpress", "XPRESS"),
+    CompressionProfile("lzx", "LZX"),
+    CompressionProfile("lzms", "LZMS"),
+    CompressionProfile("lzms-solid", "LZMS", solid=True),
+)}
+DEFAULT_PROFILE = "lzx"
+
+
+def get_profile(name=DEFAULT_PROFILE, threads=None, chunk_size=None, solid=None) -> CompressionProfile:
+    try:
+        profile = PROFILES[name]
+    except KeyError:
+        raise CompressionError(f"Неизвестный профиль: {name} (есть: {', '.join(PROFILES)})")
+    if isinstance(chunk_size, str):
+        chunk_size = parse_size(chunk_size)
+    return profile.with_options(threads=threads, chunk_size=chunk_size, solid=solid)
+
+
+# -------------------------------------------------------- СРАВНЕНИЕ ПРОФИЛЕЙ
+
+@dataclass
+class ProfileResult:
+    profile: CompressionProfile
+    input_bytes: int
+    wall: float = 0.0
+    cpu: float = None           # user+system wimlib-imagex, с
+    output_size: int = 0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    @property
+    def throughput(self) -> float:
+        """МБ/с несжатых данных образа."""
+        return self.input_bytes / (1 << 20) / self.wall if self.wall > 0 else 0.0
+
+    @property
+    def ratio(self) -> float:
+        return self.output_size / self.input_bytes if self.input_bytes else 0.0
+
+    def describe(self) -> str:
+        if self.error:
+            return f"{self.profile.describe():<36} ошибка: {self.error}"
+        cpu = f"{self.cpu:8.1f} с" if self.cpu is not None else "       ?  "
+        return (f"{self.profile.describe():<36} {self.wall:8.1f} с  CPU {cpu}  "
+                f"{self.throughput:8.1f} МБ/с  {self.output_size / (1 << 20):10.1f} МБ  "
+                f"({self.ratio * 100:5.1f}%)")
+
+
+def benchmark_header() -> str:
+    return f"{'Профиль':<36} {'время':>10}  {'CPU':>14}  {'скорость':>13}  {'размер':>13}  (доля)"
+
+
+def _image_bytes(wim, index):
+    from .wiminfo import WimParseError, read_wim_info
+    try:
+        for image in read_wim_info(wim).images:
+            if image.index == int(index) and image.total_bytes:
+                return image.total_bytes
+    except (OSError, WimParseError):
+        pass
+    return os.path.getsize(wim)
+
+
+def benchmark_profiles(wim, index=1, profiles=None, threads=None, chunk_size=None, workdir=None,
+                       on_result=None, cancel_event=None):
+    """
+    Экспортирует образ wim:index через каждый профиль во временный WIM.
+    on_result(ProfileResult) вызывается после каждого профиля.
+    """
+    import subprocess
+    from .backend import creationflags
+    from .process import wait_with_cpu
+
+    profiles = [get_profile(p, threads=threads, chunk_size=chunk_size) if isinstance(p, str) else p
+                for p in (profiles or list(PROFILES))]
+    input_bytes = _image_bytes(wim, index)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="wimbench-", dir=workdir) as tmp:
+        for profile in profiles:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            result = ProfileResult(profile, input_bytes)
+            dest = os.path.join(tmp, f"{profile.name}.wim")
+            cmd = ["wimlib-imagex", "export", wim, str(index), dest] + profile.wimlib_args()
+            with tempfile.TemporaryFile(dir=tmp) as log:
+                started = time.perf_counter()
+                try:
+                    proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT,
+                                            stdin=subprocess.DEVNULL, creationflags=creationflags())
+                    code, result.cpu = wait_with_cpu(proc)
+                except OSError as e:
+                    code, result.error = -1, str(e)
+                result.wall = time.perf_counter() - started
+                if code != 0 and not result.error:
+                    log.seek(0)
+                    tail = log.read().decode("utf-8", "replace").strip().splitlines()[-1:]
+                    result.error = tail[0] if tail else f"код {code}"
+            if result.ok:
+                result.output_size = os.path.getsize(dest)
+                os.remove(dest)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    return results
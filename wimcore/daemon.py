@@ -0,0 +1,543 @@
+"""
+Фоновая служба заданий: одна очередь, реестр инструментов и кэш метаданных
+на всю машину.
+
+    python -m wimcore daemon [--tcp] [-j 8] [--dism-jobs 1]
+
+GUI и CLI подключаются к ней как тонкие клиенты (см. client): ставят
+задания и получают события о состоянии, прогрессе и выводе. Протокол –
+JSON-RPC 2.0, одно сообщение на строку, через Unix-сокет в каталоге данных
+(в Windows или с --tcp – TCP на 127.0.0.1). Адрес и токен лежат в
+daemon.json (права 0600); первый вызов соединения – hello с этим токеном.
+
+Методы: hello, ping, stats, tools, backend, submit, cancel, jobs,
+subscribe, info, output_get, output_put, cache_clear, cache_stats,
+shutdown. События (уведомления без id):
+
+    job       {"job", "ref", "state", "code", "error", ..., "output" при завершении}
+    progress  {"job", "ref", "progress": {percent, done_bytes, ...}}  – не чаще PROGRESS_INTERVAL
+    line      {"job", "ref", "line"}                                  – если при submit lines=true
+
+Прогресс и строки вывода отбрасываются, если клиент не успевает читать
+(буфер сокета больше MAX_CLIENT_BUFFER); состояния заданий – никогда.
+Задания отключившегося клиента доделываются.
+"""
+import asyncio
+import inspect
+import itertools
+import json
+import os
+import secrets
+import shutil
+import threading
+import time
+from dataclasses import asdict
+
+from . import backend as be
+from .cache import MetadataCache
+from .jobs import DEFAULT_LIMIT, FINISHED_STATES, Job, JobScheduler
+from .settings import app_data_dir
+from .telemetry import Telemetry
+from .tools import DISM, WIMLIB, ToolRegistry
+
+PROTOCOL_VERSION = 1
+DAEMON_FILE_NAME = "daemon.json"
+SOCKET_FILE_NAME = "daemon.sock"
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+# инструменты, которые служба согласна запускать: DISM и wimlib-imagex – по путям из
+# своего реестра, fusermount – найденный на PATH службы
+ALLOWED_TOOLS = ("dism", "wimlib-imagex", "fusermount")
+PROGRESS_INTERVAL = 0.1
+MAX_CLIENT_BUFFER = 1 << 20
+MAX_LINE_BYTES = 1 << 20
+
+# коды ошибок JSON-RPC
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+UNAUTHORIZED = -32001
+NOT_ALLOWED = -32002
+BACKEND_ERROR = -32003
+
+
+class DaemonError(RuntimeError):
+    """Служба недоступна или вернула ошибку (code – код JSON-RPC)."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def daemon_file() -> str:
+    return os.path.join(app_data_dir(), DAEMON_FILE_NAME)
+
+
+def read_daemon_file(path=None):
+    """{"pid", "address", "token", ...} запущенной службы или None."""
+    try:
+        with open(path or daemon_file(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) and data.get("address") else None
+
+
+def default_address() -> str:
+    if os.name == "nt":
+        return "tcp:127.0.0.1:0"
+    return "unix:" + os.path.join(app_data_dir(), SOCKET_FILE_NAME)
+
+
+def parse_address(address: str):
+    """"unix:/path" -> ("unix", path); "tcp:host:port" -> ("tcp", (host, port))."""
+    kind, _, rest = address.partition(":")
+    if kind == "unix" and rest:
+        return "unix", rest
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        host = host.strip("[]")
+        if host and port.isdigit():
+            return "tcp", (host, int(port))
+    raise DaemonError(f"Неверный адрес службы: {address} (ожидается unix:/путь или tcp:127.0.0.1:порт)")
+
+
+def job_to_dict(job: Job, output=False) -> dict:
+    data = {
+        "job": job.id,
+        "name": job.name,
+        "backend": job.backend,
+        "owner": job.owner,
+        "state": job.state,
+        "code": job.code,
+        "error": None if job.error is None else str(job.error),
+        "submitted_at": job.submitted_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if job.last_progress is not None:
+        data["progress"] = asdict(job.last_progress)
+    if output:
+        data["output"] = job.output
+        if job.usage is not None:
+            data["usage"] = asdict(job.usage)
+    return data
+
+
+def _same_file(a, b):
+    return os.path.normcase(os.path.realpath(a)) == os.path.normcase(os.path.realpath(b))
+
+
+class _Connection:
+    """Состояние одного клиента; все методы – в потоке движка."""
+
+    def __init__(self, daemon, client_id, writer):
+        self.daemon = daemon
+        self.id = client_id
+        self.writer = writer
+        self.name = ""
+        self.authenticated = False
+        self.subscribed = False     # события обо всех заданиях, а не только своих
+        self.refs = {}              # job id -> ref клиента
+        self.dropped = 0
+        self._progress = {}         # job id -> отложенное событие progress
+        self._flush_handle = None
+
+    @property
+    def closed(self) -> bool:
+        return self.writer.is_closing()
+
+    def send(self, message, droppable=False):
+        if self.closed:
+            return
+        if droppable and self.writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+            self.dropped += 1
+            return
+        self.writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.daemon.events_sent += 1
+
+    def event(self, method, params, droppable=False):
+        self.send({"jsonrpc": "2.0", "method": method, "params": params}, droppable)
+
+    def post_progress(self, job, progress):
+        self._progress[job.id] = {"job": job.id, "ref": self.refs.get(job.id), "progress": asdict(progress)}
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(PROGRESS_INTERVAL, self.flush_progress)
+
+    def flush_progress(self, job_id=None):
+        if job_id is None:
+            self._flush_handle = None
+            pending, self._progress = self._progress, {}
+        else:
+            pending = {job_id: self._progress.pop(job_id)} if job_id in self._progress else {}
+        for params in pending.values():
+            self.event("progress", params, droppable=True)
+
+    def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self.writer.close()
+
+
+class JobDaemon:
+    def __init__(self, address=None, limits=None, default_limit=DEFAULT_LIMIT, engine=None,
+                 state_file=None):
+        from .engine import default_engine
+        self.engine = engine or default_engine()
+        self.address = address or default_address()
+        self.state_file = state_file or daemon_file()
+        self.token = secrets.token_hex(16)
+        self.tools = ToolRegistry()
+        self.meta_cache = MetadataCache()
+        self.telemetry = Telemetry(info_fn=self.meta_cache.get_info)
+        self.scheduler = JobScheduler(limits, default_limit, on_change=self._on_change,
+                                      engine=self.engine, telemetry=self.telemetry)
+        self.started_at = None
+        self.requests = 0
+        self.events_sent = 0
+        self._clients = {}          # id -> _Connection
+        self._client_ids = itertools.count(1)
+        self._server = None
+        self._socket_path = None
+        self._stopped = threading.Event()
+
+    # -------------------------------------------------------- ЗАПУСК
+
+    def start(self):
+        self._add_installed_wimlib()
+        self.tools.start_probe(background=True)
+        self.engine.submit(self._listen()).result()
+        self.started_at = time.time()
+        self._write_state()
+        return self
+
+    @staticmethod
+    def _add_installed_wimlib():
+        # wimlib, установленный через GUI, – в PATH службы, а не только окна
+        from .installer import add_to_path, installed_wimlib_dir
+        wimlib_dir = installed_wimlib_dir()
+        if wimlib_dir:
+            add_to_path(wimlib_dir)
+
+    async def _listen(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            if os.path.exists(target):
+                if read_daemon_file(self.state_file) and _alive(target):
+                    raise DaemonError(f"Служба уже запущена: {target}")
+                os.remove(target)   # сокет от упавшей службы
+            self._server = await asyncio.start_unix_server(self._serve, target, limit=MAX_LINE_BYTES)
+            os.chmod(target, 0o600)
+            self._socket_path = target
+        else:
+            host, port = target
+            if host not in LOOPBACK_HOSTS:
+                raise DaemonError("Служба слушает только localhost (127.0.0.1 / ::1).")
+            self._server = await asyncio.start_server(self._serve, host, port, limit=MAX_LINE_BYTES)
+            port = self._server.sockets[0].getsockname()[1]
+            self.address = f"tcp:{host}:{port}"
+
+    def _write_state(self):
+        data = {"pid": os.getpid(), "address": self.address, "token": self.token,
+                "protocol": PROTOCOL_VERSION, "started_at": self.started_at}
+        tmp = self.state_file + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.state_file)
+
+    def serve_forever(self):
+        """Ждёт shutdown (или Ctrl+C) и останавливает службу."""
+        try:
+            while not self._stopped.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def stop(self):
+        """Отменяет задания, закрывает соединения и удаляет daemon.json и сокет."""
+        self.scheduler.cancel_all()
+        self.meta_cache.flush()
+        if self._server is not None:
+            try:
+                self.engine.submit(self._close()).result(5)
+            except Exception:
+                pass
+            self._server = None
+        data = read_daemon_file(self.state_file)
+        if data and data.get("token") == self.token:
+            try:
+                os.remove(self.state_file)
+            except OSError:
+                pass
+        if self._socket_path:
+            try:
+                os.remove(self._socket_path)
+            except OSError:
+                pass
+        self._stopped.set()
+
+    async def _close(self):
+        self._server.close()
+        for conn in list(self._clients.values()):
+            conn.close()
+        await self._server.wait_closed()
+
+    # -------------------------------------------------------- СОЕДИНЕНИЯ
+
+    async def _serve(self, reader, writer):
+        conn = _Connection(self, next(self._client_ids), writer)
+        self._clients[conn.id] = conn
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    conn.send(_error(None, INVALID_REQUEST, "Слишком длинное сообщение"))
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await self._handle(conn, line)
+                if response is not None:
+                    conn.send(response)
+        finally:
+            del self._clients[conn.id]
+            conn.close()
+
+    async def _handle(self, conn, line):
+        self.requests += 1
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return _error(None, PARSE_ERROR, "Некорректный JSON")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(None, INVALID_REQUEST, "Ожидается объект JSON-RPC с method")
+        req_id = request.get("id")
+        params = request.get("params") or {}
+        try:
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "params – объект")
+            method = request["method"]
+            if not conn.authenticated and method != "hello":
+                raise RpcError(UNAUTHORIZED, "Сначала hello с токеном из daemon.json")
+            handler = getattr(self, "rpc_" + method, None)
+            if handler is None:
+                raise RpcError(METHOD_NOT_FOUND, f"Неизвестный метод: {method}")
+            try:
+                inspect.signature(handler).bind(conn, **params)
+            except TypeError as e:
+                raise RpcError(INVALID_PARAMS, str(e))
+            result = handler(conn, **params)
+            if inspect.isawaitable(result):
+                result = await result
+        except RpcError as e:
+            return None if req_id is None else _error(req_id, e.code, e.message)
+        except Exception as e:
+            return None if req_id is None else _error(req_id, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+        if req_id is None:
+            return None
+        return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+    async def _in_executor(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    # -------------------------------------------------------- СОБЫТИЯ
+
+    def _on_change(self, job):
+        # из любого потока планировщика; снимок состояния – уже в цикле
+        self.engine.call_soon(self._broadcast, job)
+
+    def _broadcast(self, job):
+        finished = job.state in FINISHED_STATES
+        data = None
+        for conn in list(self._clients.values()):
+            if job.owner != conn.id and not conn.subscribed:
+                continue
+            if data is None:
+                data = job_to_dict(job, output=finished)
+            if finished:
+                conn.flush_progress(job.id)     # прогресс – раньше финального состояния
+            conn.event("job", dict(data, ref=conn.refs.get(job.id)))
+            if finished:
+                conn.refs.pop(job.id, None)
+
+    def _owner(self, job):
+        conn = self._clients.get(job.owner)
+        return conn if conn is not None and not conn.closed else None
+
+    # -------------------------------------------------------- МЕТОДЫ
+
+    def rpc_hello(self, conn, token, client="", protocol=PROTOCOL_VERSION):
+        if not secrets.compare_digest(str(token).encode("utf-8"), self.token.encode("utf-8")):
+            raise RpcError(UNAUTHORIZED, "Неверный токен")
+        if protocol != PROTOCOL_VERSION:
+            raise RpcError(INVALID_REQUEST, f"Версия протокола {protocol} не поддерживается "
+                                            f"(служба: {PROTOCOL_VERSION})")
+        conn.authenticated = True
+        conn.name = str(client)
+        return {"client_id": conn.id, "pid": os.getpid(), "protocol": PROTOCOL_VERSION,
+                "limits": self.scheduler.limits, "default_limit": self.scheduler.default_limit}
+
+    def rpc_ping(self, conn):
+        return {"time": time.time()}
+
+    def rpc_stats(self, conn):
+        jobs = self.scheduler.jobs()
+        states = {}
+        for job in jobs:
+            states[job.state] = states.get(job.state, 0) + 1
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started_at, 3) if self.started_at else 0,
+            "requests": self.requests,
+            "events": self.events_sent,
+            "jobs": states,
+            "clients": [{"id": c.id, "name": c.name, "dropped": c.dropped,
+                         "jobs": sum(1 for j in jobs if j.owner == c.id and not j.finished)}
+                        for c in self._clients.values()],
+        }
+
+    async def rpc_tools(self, conn, probe=False, refresh=False):
+        if refresh:
+            self._add_installed_wimlib()
+            await self._in_executor(self.tools.invalidate, False)
+        elif probe:
+            await self._in_executor(self.tools.start_probe, False)
+        return self.tools.capability_matrix()
+
+    def rpc_backend(self, conn, mode="auto"):
+        try:
+            return be.select_backend(mode, registry=self.tools)
+        except be.BackendError as e:
+            raise RpcError(BACKEND_ERROR, str(e))
+
+    def _resolve_cmd(self, cmd):
+        """
+        Команда с cmd[0], заменённым на путь разрешённого инструмента. Имя без
+        каталога ищется на PATH службы, путь сравнивается как есть; результат
+        должен совпасть с путём DISM/wimlib-imagex из реестра или fusermount.
+        """
+        if not isinstance(cmd, list) or not cmd or not all(isinstance(a, str) for a in cmd):
+            raise RpcError(INVALID_PARAMS, "cmd – непустой список строк")
+        allowed = [self.tools.get(DISM).path, self.tools.get(WIMLIB).path, shutil.which("fusermount")]
+        program = cmd[0] if os.path.dirname(cmd[0]) else shutil.which(cmd[0])
+        if program:
+            for path in allowed:
+                if path and _same_file(program, path):
+                    return [path] + cmd[1:]
+        raise RpcError(NOT_ALLOWED, f"Служба не запускает {cmd[0]}: разрешены только найденные ею "
+                                    f"{', '.join(ALLOWED_TOOLS)}")
+
+    def rpc_submit(self, conn, cmd, name="", backend="", locks=(), timeout=None, deadline_in=None,
+                   stdin_path=None, ref=None, lines=False):
+        cmd = self._resolve_cmd(cmd)
+        if not isinstance(locks, (list, tuple)) or not all(isinstance(lock, str) for lock in locks):
+            raise RpcError(INVALID_PARAMS, "locks – список строк")
+
+        def on_line(line):
+            owner = self._owner(job)
+            if owner is not None:
+                owner.event("line", {"job": job.id, "ref": owner.refs.get(job.id), "line": line},
+                            droppable=True)
+
+        def on_progress(progress):
+            owner = self._owner(job)
+            if owner is not None:
+                owner.post_progress(job, progress)
+
+        deadline = None if deadline_in is None else time.monotonic() + float(deadline_in)
+        job = Job(str(name or os.path.basename(cmd[0])), cmd, backend=str(backend), locks=locks,
+                  timeout=timeout, deadline=deadline, on_line=on_line if lines else None,
+                  on_progress=on_progress, creationflags=be.creationflags(), stdin_path=stdin_path,
+                  owner=conn.id)
+        if ref is not None:
+            conn.refs[job.id] = ref
+        # ответ уходит раньше событий: _on_change доставит их следующим проходом цикла
+        self.scheduler.submit(job)
+        return {"job": job.id}
+
+    async def rpc_cancel(self, conn, job):
+        # отмена ждущего задания сразу пишет телеметрию – не в цикле
+        return await self._in_executor(self.scheduler.cancel, job)
+
+    def rpc_jobs(self, conn, all=True):
+        return [job_to_dict(job) for job in self.scheduler.jobs() if all or job.owner == conn.id]
+
+    def rpc_subscribe(self, conn, all=True):
+        conn.subscribed = bool(all)
+        return True
+
+    async def rpc_info(self, conn, wim):
+        """Встроенный разбор WIM через общий кэш метаданных (None – файл не разобран)."""
+        from .wiminfo import WimParseError, read_wim_info, wim_info_to_dict
+
+        def work():
+            info = self.meta_cache.get_info(wim)
+            if info is None:
+                try:
+                    info = read_wim_info(wim)
+                except (WimParseError, OSError):
+                    return None
+                self.meta_cache.put_info(wim, info)
+            return wim_info_to_dict(info)
+
+        return await self._in_executor(work)
+
+    async def rpc_output_get(self, conn, wim, backend):
+        return await self._in_executor(self.meta_cache.get_output, wim, backend)
+
+    async def rpc_output_put(self, conn, wim, backend, output):
+        await self._in_executor(self.meta_cache.put_output, wim, backend, output)
+        return True
+
+    async def rpc_cache_clear(self, conn):
+        await self._in_executor(self.meta_cache.clear)
+        return True
+
+    def rpc_cache_stats(self, conn):
+        return self.meta_cache.stats_text()
+
+    def rpc_shutdown(self, conn):
+        # ответ записывается раньше, чем сработает call_soon
+        loop = asyncio.get_running_loop()
+        loop.call_soon(lambda: threading.Thread(target=self.stop, daemon=True).start())
+        return True
+
+
+def _error(req_id, code, message):
+    return {"jsonrpc": "2.0", "id": req_id, "error": {"code": code, "message": message}}
+
+
+def _alive(socket_path) -> bool:
+    import socket
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(socket_path)
+    except OSError:
+        return False
+    finally:
+        s.close()
+    return True
+
+
+def run_daemon(address=None, limits=None, default_limit=DEFAULT_LIMIT, on_ready=None):
+    """Запускает службу в текущем процессе и блокируется до shutdown."""
+    daemon = JobDaemon(address, limits, default_limit).start()
+    if on_ready is not None:
+        on_ready(daemon)
+    daemon.serve_forever()
+    return daemon
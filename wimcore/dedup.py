@@ -0,0 +1,291 @@
+"""
+Анализ пересечения данных между WIM-файлами.
+
+Все блобы (ключ – SHA-1) из таблиц блобов набора WIM складываются в один
+индекс с открытой адресацией: хеши лежат подряд в bytearray, размеры и
+счётчики – в array, без словаря на каждый блоб. Память – порядка 100 байт
+на уникальный блоб (с запасом таблицы), сколько бы WIM ни было в наборе.
+
+Источник – это WIM-файл целиком (по таблице блобов) или отдельный индекс
+образа (по хешам из `wimlib-imagex dir --detailed`: метаданные образа
+сжаты, и без wimlib связь «индекс -> блобы» не восстановить).
+
+Блобы внутри solid-ресурсов (ESD, --solid) своего сжатого размера не имеют:
+сжатый размер ресурса делится между его блобами пропорционально их
+несжатому размеру, и оценка объединённого WIM становится приблизительной.
+"""
+import mmap
+import os
+import re
+import struct
+from array import array
+from dataclasses import dataclass, field
+
+from .wiminfo import RES_FLAG_METADATA, RES_FLAG_SOLID, WIM_HEADER_SIZE, WimParseError, parse_header
+
+BLOB_ENTRY = struct.Struct("<QQQHI20s")
+INITIAL_CAPACITY = 1 << 16
+# исходный размер в записи самого solid-ресурса (настоящий – в заголовке ресурса)
+SOLID_RESOURCE_MAGIC = 0x100000000
+MAX_LOAD = 0.7
+
+_SIZE_RE = re.compile(r"Uncompressed size\s*=\s*(\d+)")
+_HASH_RE = re.compile(r"Hash\s*=\s*(?:0x)?([0-9A-Fa-f]{40})")
+
+
+class HashIndex:
+    """Множество SHA-1 с размером, числом источников и первым источником для каждого блоба."""
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._alloc(capacity)
+        self.count = 0
+
+    def _alloc(self, capacity):
+        self.capacity = capacity
+        self.keys = array("Q", [0]) * capacity      # первые 8 байт SHA-1 | 1; 0 – пусто
+        self.digests = bytearray(20 * capacity)
+        self.sizes = array("Q", [0]) * capacity     # несжатый размер
+        self.stored = array("Q", [0]) * capacity    # размер в WIM (сжатый)
+        self.sources = array("H", [0]) * capacity   # в скольких источниках встречается
+        self.first = array("l", [0]) * capacity     # первый источник
+        self.last = array("l", [0]) * capacity      # последний источник (против повторов)
+
+    def _find(self, digest, key):
+        mask = self.capacity - 1
+        slot = key & mask
+        keys, digests = self.keys, self.digests
+        while True:
+            k = keys[slot]
+            if k == 0:
+                return slot, False
+            if k == key and digests[slot * 20:slot * 20 + 20] == digest:
+                return slot, True
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        old = (self.keys, self.digests, self.sizes, self.stored, self.sources, self.first, self.last)
+        self._alloc(self.capacity * 2)
+        keys, digests, sizes, stored, sources, first, last = old
+        for slot in range(len(keys)):
+            key = keys[slot]
+            if not key:
+                continue
+            digest = bytes(digests[slot * 20:slot * 20 + 20])
+            new, _ = self._find(digest, key)
+            self.keys[new] = key
+            self.digests[new * 20:new * 20 + 20] = digest
+            self.sizes[new] = sizes[slot]
+            self.stored[new] = stored[slot]
+            self.sources[new] = sources[slot]
+            self.first[new] = first[slot]
+            self.last[new] = last[slot]
+
+    def add(self, digest: bytes, size: int, stored: int, source: int) -> bool:
+        """
+        Добавляет блоб источника source. Возвращает True, если блоб в этом
+        источнике встретился впервые (повторы внутри источника не считаются).
+        """
+        key = int.from_bytes(digest[:8], "little") | 1
+        slot, found = self._find(digest, key)
+        if found:
+            if self.last[slot] == source:
+                return False
+            self.last[slot] = source
+            if self.sources[slot] < 0xFFFF:
+                self.sources[slot] += 1
+            if stored and (not self.stored[slot] or stored < self.stored[slot]):
+                self.stored[slot] = stored
+            return True
+        if (self.count + 1) > self.capacity * MAX_LOAD:
+            self._grow()
+            slot, _ = self._find(digest, key)
+        self.keys[slot] = key
+        self.digests[slot * 20:slot * 20 + 20] = digest
+        self.sizes[slot] = size
+        self.stored[slot] = stored
+        self.sources[slot] = 1
+        self.first[slot] = source
+        self.last[slot] = source
+        self.count += 1
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def memory_bytes(self) -> int:
+        arrays = (self.keys, self.sizes, self.stored, self.sources, self.first, self.last)
+        return len(self.digests) + sum(a.itemsize * len(a) for a in arrays)
+
+
+@dataclass
+class SourceStats:
+    label: str
+    blobs: int = 0
+    bytes: int = 0          # несжатый объём уникальных в источнике блобов
+    unique_bytes: int = 0   # только в этом источнике
+    metadata_bytes: int = 0
+    overhead_bytes: int = 0  # заголовок, XML и пр. (для оценки объединённого WIM)
+    solid_blobs: int = 0     # блобы solid-ресурсов: сжатый размер – оценка по доле ресурса
+
+    @property
+    def shared_bytes(self) -> int:
+        return self.bytes - self.unique_bytes
+
+
+@dataclass
+class DedupReport:
+    sources: list = field(default_factory=list)
+    distinct_blobs: int = 0
+    distinct_bytes: int = 0     # несжатый объём без повторов
+    distinct_stored: int = 0    # объём в WIM без повторов
+    total_bytes: int = 0        # сумма по источникам (с повторами)
+    total_files: int = 0        # суммарный размер WIM-файлов на диске
+    merged_size: int = 0        # оценка размера объединённого WIM
+    index_memory: int = 0
+
+    @property
+    def savings(self) -> int:
+        return max(0, self.total_files - self.merged_size)
+
+    def describe(self) -> str:
+        mb = 1 << 20
+        lines = [f"{'Источник':<40} {'блобов':>9} {'всего, МБ':>11} {'общих, МБ':>11} {'своих, МБ':>11}"]
+        for s in self.sources:
+            lines.append(f"{s.label[-40:]:<40} {s.blobs:>9} {s.bytes / mb:>11.1f} "
+                         f"{s.shared_bytes / mb:>11.1f} {s.unique_bytes / mb:>11.1f}")
+        lines.append(f"Уникальных блобов: {self.distinct_blobs:,}, "
+                     f"объём без повторов: {self.distinct_bytes / mb:.1f} МБ "
+                     f"(с повторами {self.total_bytes / mb:.1f} МБ)")
+        if self.total_files:
+            lines.append(f"Объединённый WIM: ~{self.merged_size / mb:.1f} МБ против "
+                         f"{self.total_files / mb:.1f} МБ по отдельности "
+                         f"(экономия ~{self.savings / mb:.1f} МБ)")
+            solid = sum(s.solid_blobs for s in self.sources)
+            if solid:
+                lines.append(f"  {solid:,} блобов в solid-ресурсах: их сжатый размер оценён долей ресурса, "
+                             f"пересжатие в общий WIM может дать другой размер")
+        lines.append(f"Память индекса: {self.index_memory / mb:.1f} МБ")
+        return "\n".join(lines)
+
+
+class DedupAnalyzer:
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.index = HashIndex(capacity)
+        self.sources = []
+        self.file_sizes = 0
+
+    def _source(self, label) -> int:
+        self.sources.append(SourceStats(label))
+        return len(self.sources) - 1
+
+    def add_wim(self, path, label=None) -> SourceStats:
+        """Источник – весь WIM-файл: читается только таблица блобов."""
+        source = self._source(label or path)
+        stats = self.sources[source]
+        index = self.index
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header = parse_header(mm[:WIM_HEADER_SIZE])
+            table = header.offset_table
+            if table.is_compressed:
+                raise WimParseError("Сжатая таблица блобов не поддерживается.")
+            if table.offset + table.size > len(mm):
+                raise WimParseError("Таблица блобов выходит за пределы файла.")
+            end = table.offset + table.size // BLOB_ENTRY.size * BLOB_ENTRY.size
+            # записи solid-ресурсов идут перед их блобами; подряд идущие ресурсы – одна группа
+            groups = []         # [сжатый размер, сумма исходных размеров блобов]
+            solid = []          # (SHA-1, исходный размер, номер группы или -1)
+            in_resources = False
+            for size_flags, _, original, _, _, digest in BLOB_ENTRY.iter_unpack(mm[table.offset:end]):
+                flags = size_flags >> 56
+                stored = size_flags & 0x00FFFFFFFFFFFFFF
+                if flags & RES_FLAG_SOLID:
+                    if original == SOLID_RESOURCE_MAGIC:
+                        if not in_resources:
+                            groups.append([0, 0])
+                            in_resources = True
+                        groups[-1][0] += stored
+                        continue
+                    in_resources = False
+                    if groups:
+                        groups[-1][1] += original
+                    solid.append((digest, original, len(groups) - 1))
+                    continue
+                in_resources = False
+                if flags & RES_FLAG_METADATA:
+                    stats.metadata_bytes += stored or original
+                if index.add(digest, original, stored, source):
+                    stats.blobs += 1
+                    stats.bytes += original
+            # блоб вне группы (необычный порядок записей) – по доле всех solid-ресурсов файла
+            overall = [sum(g[0] for g in groups), sum(g[1] for g in groups)]
+            for digest, original, group in solid:
+                packed, unpacked = groups[group] if group >= 0 else overall
+                stored = max(1, original * packed // unpacked) if packed and unpacked else 0
+                if index.add(digest, original, stored, source):
+                    stats.blobs += 1
+                    stats.bytes += original
+                    stats.solid_blobs += 1
+            stats.overhead_bytes = WIM_HEADER_SIZE + header.xml_data.size
+        size = os.path.getsize(path)
+        self.file_sizes += size
+        return stats
+
+    def add_listing(self, label, lines) -> SourceStats:
+        """
+        Источник – один индекс образа: строки `wimlib-imagex dir --detailed`
+        (пары «Uncompressed size = N» / «Hash = ...» для каждого потока).
+        """
+        source = self._source(label)
+        stats = self.sources[source]
+        size = 0
+        for line in lines:
+            if "Uncompressed size" in line:
+                m = _SIZE_RE.search(line)
+                size = int(m.group(1)) if m else 0
+            elif "Hash" in line:
+                m = _HASH_RE.search(line)
+                if m is None:
+                    continue
+                digest = bytes.fromhex(m.group(1))
+                if digest != bytes(20) and self.index.add(digest, size, 0, source):
+                    stats.blobs += 1
+                    stats.bytes += size
+                size = 0
+        return stats
+
+    def report(self) -> DedupReport:
+        index = self.index
+        for stats in self.sources:
+            stats.unique_bytes = 0
+        distinct_bytes = distinct_stored = 0
+        keys, sizes, stored, counts, first = index.keys, index.sizes, index.stored, index.sources, index.first
+        for slot in range(index.capacity):
+            if not keys[slot]:
+                continue
+            size = sizes[slot]
+            distinct_bytes += size
+            distinct_stored += stored[slot] or size
+            if counts[slot] == 1:
+                self.sources[first[slot]].unique_bytes += size
+
+        report = DedupReport(
+            sources=list(self.sources),
+            distinct_blobs=len(index),
+            distinct_bytes=distinct_bytes,
+            distinct_stored=distinct_stored,
+            total_bytes=sum(s.bytes for s in self.sources),
+            total_files=self.file_sizes,
+            index_memory=index.memory_bytes(),
+        )
+        if self.file_sizes:
+            # заголовок + данные без повторов + таблица блобов + XML всех образов
+            report.merged_size = (WIM_HEADER_SIZE + distinct_stored + BLOB_ENTRY.size * len(index)
+                                  + sum(s.overhead_bytes - WIM_HEADER_SIZE for s in self.sources))
+        return report
+
+
+def analyze_wims(paths) -> DedupReport:
+    analyzer = DedupAnalyzer()
+    for path in paths:
+        analyzer.add_wim(path)
+    return analyzer.report()
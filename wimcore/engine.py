@@ -0,0 +1,90 @@
+"""
+Один цикл asyncio в фоновом потоке для всех внешних команд.
+
+Вместо потока и блокирующего subprocess на каждую команду задания
+выполняются корутинами (asyncio.create_subprocess_exec) в общем цикле.
+Остальные потоки (Tk, CLI) общаются с циклом только через submit() /
+call_soon(), которые потокобезопасны.
+"""
+import asyncio
+import os
+import threading
+
+_default = None
+_default_lock = threading.Lock()
+
+
+class ProcessEngine:
+    def __init__(self, name="wim-engine"):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._main, name=self.name, daemon=True)
+                self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _main(self):
+        if os.name == "nt":
+            # подпроцессы asyncio в Windows работают только в Proactor-цикле
+            loop = asyncio.ProactorEventLoop()
+        else:
+            loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.loop = loop
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_loop(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """Запускает корутину в цикле; возвращает concurrent.futures.Future."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, fn, *args):
+        self.start()
+        if self.in_loop():
+            return self.loop.call_soon(fn, *args)
+        return self.loop.call_soon_threadsafe(fn, *args)
+
+    def stop(self, timeout=5):
+        """Отменяет оставшиеся задачи и останавливает цикл."""
+        if not self.running:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        try:
+            future.result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+    async def _shutdown(self):
+        tasks = [t for t in asyncio.all_tasks(self.loop) if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def default_engine() -> ProcessEngine:
+    """Общий движок процесса (запускается при первом обращении)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ProcessEngine()
+    return _default.start()
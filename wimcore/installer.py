@@ -0,0 +1,227 @@
+"""
+Установка wimlib-imagex: потоковая загрузка с докачкой (HTTP Range),
+проверка SHA-256, выборочная распаковка только нужных файлов и
+запоминание каталога установки между запусками.
+
+Всё выполняется в вызывающем потоке – GUI запускает install_wimlib()
+в фоне и получает прогресс через колбэк.
+"""
+import os
+import time
+
+from .process import Progress
+from .settings import app_data_dir, load_settings, update_settings
+
+WIMLIB_VERSION = "1.14.4"
+WIMLIB_URL = f"https://wimlib.net/downloads/wimlib-{WIMLIB_VERSION}-windows-x86_64-bin.zip"
+# SHA-256 архивов по URL. Архив с другого URL без известной контрольной суммы не
+# устанавливается; зеркала и другие версии закрепляются в settings.json:
+# "wimlib_sha256": {"<url>": "<sha256>"}. Для WIMLIB_URL без закреплённого хэша
+# сумма архива, скачанного по HTTPS с wimlib.net, запоминается при первой установке
+# и сверяется при повторных.
+PINNED_SHA256 = {}
+
+# из архива берём только сам бинарник и библиотеки
+WIMLIB_MEMBERS = ("wimlib-imagex.exe", "wimlib-imagex", "*.dll")
+
+CHUNK_SIZE = 256 * 1024
+SETTINGS_DIR_KEY = "wimlib_dir"
+SETTINGS_SHA_KEY = "wimlib_sha256"      # {url: sha256}
+
+
+class InstallError(Exception):
+    pass
+
+
+class InstallCancelled(InstallError):
+    pass
+
+
+def _make_progress(done, total, start, start_done):
+    elapsed = time.monotonic() - start
+    rate = (done - start_done) / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if total and rate > 0 else None
+    percent = done * 100.0 / total if total else 0.0
+    return Progress(percent=percent, done_bytes=done, total_bytes=total, rate=rate, eta=eta)
+
+
+def download(url, dest, on_progress=None, cancel_event=None, chunk_size=CHUNK_SIZE, timeout=60):
+    """
+    Скачивает url в dest. Недокачанный файл хранится как dest + ".part" и при
+    повторном вызове докачивается через заголовок Range (если сервер умеет).
+    """
+    import http.client
+    import urllib.error
+    import urllib.request
+
+    part = dest + ".part"
+    have = os.path.getsize(part) if os.path.exists(part) else 0
+
+    request = urllib.request.Request(url, headers={"User-Agent": "WIMManager-Cicada3301"})
+    if have:
+        request.add_header("Range", f"bytes={have}-")
+
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and have:
+            # уже всё скачано
+            os.replace(part, dest)
+            return dest
+        raise InstallError(f"Ошибка загрузки {url}: HTTP {e.code}") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise InstallError(f"Ошибка загрузки {url}: {e}") from e
+
+    with response:
+        status = getattr(response, "status", None)
+        if have and status != 206:
+            have = 0    # сервер (или file://) не поддерживает Range – качаем заново
+        length = response.headers.get("Content-Length")
+        total = have + int(length) if length and length.isdigit() else 0
+
+        start = time.monotonic()
+        done = have
+        with open(part, "ab" if have else "wb") as f:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise InstallCancelled("Загрузка отменена.")
+                try:
+                    chunk = response.read(chunk_size)
+                except (http.client.IncompleteRead, OSError) as e:
+                    # обрыв соединения: полученное остаётся в .part для докачки
+                    raise InstallError(f"Загрузка прервана: получено {done} из {total} байт ({e}).") from e
+                if not chunk:
+                    break
+                f.write(chunk)
+                done += len(chunk)
+                if on_progress is not None:
+                    on_progress(_make_progress(done, total, start, have))
+
+    if total and done < total:
+        raise InstallError(f"Загрузка прервана: получено {done} из {total} байт.")
+    os.replace(part, dest)
+    return dest
+
+
+def sha256_file(path, chunk_size=1024 * 1024) -> str:
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def extract_selected(zip_path, target_dir, patterns=WIMLIB_MEMBERS):
+    """
+    Распаковывает из архива только файлы, чьи имена подходят под patterns,
+    без структуры каталогов. Возвращает список распакованных путей.
+    """
+    import fnmatch
+    import shutil
+    import zipfile
+
+    extracted = []
+    os.makedirs(target_dir, exist_ok=True)
+    try:
+        with zipfile.ZipFile(zip_path, "r") as z:
+            for member in z.infolist():
+                if member.is_dir():
+                    continue
+                name = os.path.basename(member.filename)
+                if not any(fnmatch.fnmatch(name.lower(), p.lower()) for p in patterns):
+                    continue
+                dest = os.path.join(target_dir, name)
+                with z.open(member) as src, open(dest, "wb") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                if name == "wimlib-imagex":
+                    os.chmod(dest, 0o755)
+                extracted.append(dest)
+    except zipfile.BadZipFile as e:
+        raise InstallError(f"Повреждённый архив: {e}") from e
+    return extracted
+
+
+def _binary_in(path):
+    for name in ("wimlib-imagex.exe", "wimlib-imagex"):
+        if path and os.path.isfile(os.path.join(path, name)):
+            return True
+    return False
+
+
+def installed_wimlib_dir():
+    """Каталог ранее установленного wimlib-imagex или None."""
+    path = load_settings().get(SETTINGS_DIR_KEY)
+    return path if _binary_in(path) else None
+
+
+def add_to_path(bin_dir):
+    """Добавляет каталог в PATH текущего процесса (если его там ещё нет)."""
+    paths = os.environ.get("PATH", "").split(os.pathsep)
+    norm = os.path.normcase(os.path.abspath(bin_dir))
+    if any(os.path.normcase(os.path.abspath(p)) == norm for p in paths if p):
+        return False
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    return True
+
+
+def expected_sha256(url, sha256=None):
+    """
+    Эталонный SHA-256 архива: явно заданный, закреплённый в PINNED_SHA256 или
+    в settings.json для этого URL. None – эталона нет.
+    """
+    if sha256:
+        return sha256.lower()
+    if url in PINNED_SHA256:
+        return PINNED_SHA256[url].lower()
+    pinned = load_settings().get(SETTINGS_SHA_KEY)
+    if isinstance(pinned, dict) and pinned.get(url):
+        return str(pinned[url]).lower()
+    return None
+
+
+def install_wimlib(url=WIMLIB_URL, sha256=None, target_dir=None,
+                   on_progress=None, on_log=None, cancel_event=None):
+    """
+    Скачивает, проверяет и распаковывает wimlib-imagex. Возвращает каталог
+    с бинарником (уже добавленный в PATH). Бросает InstallError, в том числе
+    если для url, отличного от WIMLIB_URL, нет эталонной контрольной суммы.
+    """
+    log = on_log or (lambda text: None)
+    expected = expected_sha256(url, sha256)
+    if not expected and url == WIMLIB_URL:
+        log("Контрольная сумма архива не закреплена – SHA-256 будет запомнен после загрузки.")
+    elif not expected:
+        raise InstallError(f"Для {url} не задана контрольная сумма SHA-256 – архив не будет "
+                           f"установлен. Укажите её в settings.json: "
+                           f"\"{SETTINGS_SHA_KEY}\": {{\"{url}\": \"...\"}}.")
+    base = app_data_dir()
+    target_dir = target_dir or os.path.join(base, "wimlib", WIMLIB_VERSION)
+    downloads = os.path.join(base, "downloads")
+    os.makedirs(downloads, exist_ok=True)
+    archive = os.path.join(downloads, os.path.basename(url.split("?")[0]) or "wimlib.zip")
+
+    if os.path.exists(archive):
+        log(f"Архив уже скачан: {archive}")
+    else:
+        log(f"Скачивание {url} -> {archive}")
+        download(url, archive, on_progress=on_progress, cancel_event=cancel_event)
+
+    actual = sha256_file(archive)
+    if expected and actual != expected:
+        os.remove(archive)
+        raise InstallError(f"Контрольная сумма не совпадает:\nожидалось {expected}\nполучено {actual}")
+    log(f"SHA-256 проверен: {actual}")
+
+    log(f"Распаковка wimlib-imagex в {target_dir}")
+    files = extract_selected(archive, target_dir)
+    if not _binary_in(target_dir):
+        raise InstallError("В архиве не найден wimlib-imagex.")
+    log(f"Распаковано файлов: {len(files)}")
+
+    pinned = load_settings().get(SETTINGS_SHA_KEY)
+    pinned = dict(pinned) if isinstance(pinned, dict) else {}   # старое значение-строка не привязано к URL
+    pinned[url] = actual
+    update_settings(**{SETTINGS_DIR_KEY: target_dir, SETTINGS_SHA_KEY: pinned})
+    add_to_path(target_dir)
+    return target_dir
@@ -0,0 +1,358 @@
+"""
+Планировщик заданий для внешних команд.
+
+- ограниченное число одновременно работающих заданий, отдельно для
+  каждого бэкенда (dism / wimlib / прочее);
+- таблица блокировок: задания, затрагивающие одну папку монтирования или
+  один WIM-файл, выполняются строго по очереди;
+- видимая очередь с состояниями заданий;
+- отмена (с завершением всего дерева процессов), таймауты и дедлайны;
+- честная очередь между владельцами заданий (клиентами службы, см. daemon).
+
+Задания выполняются корутинами в общем цикле asyncio (см. engine), а не
+потоком на команду. Job – ожидаемый объект: job.wait() из любого потока
+или `await job` из корутины.
+"""
+import asyncio
+import concurrent.futures
+import itertools
+import os
+import threading
+import time
+
+from .process import run_streaming_async
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMEOUT = "timeout"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED, TIMEOUT)
+
+STATE_TITLES = {
+    QUEUED: "в очереди",
+    RUNNING: "выполняется",
+    DONE: "готово",
+    FAILED: "ошибка",
+    CANCELLED: "отменено",
+    TIMEOUT: "таймаут",
+}
+
+DEFAULT_LIMITS = {"dism": 1, "wimlib": 4}
+DEFAULT_LIMIT = 2
+MAX_FINISHED_JOBS = 100
+
+_job_ids = itertools.count(1)
+
+
+def path_lock(kind: str, path: str) -> str:
+    """Ключ блокировки для пути (папки монтирования или WIM-файла)."""
+    return f"{kind}:{os.path.normcase(os.path.abspath(path))}"
+
+
+def mount_lock(mount_dir: str) -> str:
+    return path_lock("mount", mount_dir)
+
+
+def wim_lock(wim_path: str) -> str:
+    return path_lock("wim", wim_path)
+
+
+class Job:
+    def __init__(self, name, cmd, backend="", locks=(), timeout=None,
+                 on_line=None, on_progress=None, on_done=None, creationflags=0, stdin_path=None,
+                 deadline=None, owner=None):
+        self.id = next(_job_ids)
+        self.name = name
+        self.cmd = list(cmd)
+        self.backend = backend
+        self.locks = frozenset(locks)
+        self.timeout = timeout       # секунды с момента запуска
+        self.deadline = deadline     # момент по time.monotonic(), включая время в очереди
+        self.on_line = on_line
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.creationflags = creationflags
+        self.stdin_path = stdin_path
+        self.owner = owner           # клиент службы; None – локальное задание
+        self._start_tag = 0          # виртуальное время начала для честной очереди
+
+        self.state = QUEUED
+        self.code = None
+        self.output = ""
+        self.error = None
+        self.proc = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._stop_state = None     # CANCELLED / TIMEOUT, если задание остановлено
+        self._done = concurrent.futures.Future()
+        self._task = None
+        self._in_process = False    # корутина ждёт процесс – отмена снимает его
+        self._timer = None
+        self.usage = None           # ResourceUsage от телеметрии (если включена)
+        self.last_progress = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    @property
+    def success(self) -> bool:
+        return self.state == DONE
+
+    @property
+    def queue_time(self):
+        """Секунды в очереди (None, пока задание не запущено)."""
+        return None if self.started_at is None else self.started_at - self.submitted_at
+
+    def describe(self) -> str:
+        return f"#{self.id} {self.name}: {STATE_TITLES.get(self.state, self.state)}"
+
+    def wait(self, timeout=None) -> bool:
+        """Ждёт завершения (из любого потока, кроме потока движка)."""
+        try:
+            self._done.result(timeout)
+        except concurrent.futures.TimeoutError:
+            return False
+        return True
+
+    def __await__(self):
+        return asyncio.wrap_future(self._done).__await__()
+
+    def _finish(self):
+        if not self._done.done():
+            self._done.set_result(self)
+
+
+class JobScheduler:
+    def __init__(self, limits=None, default_limit=DEFAULT_LIMIT, on_change=None, engine=None,
+                 telemetry=None):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.default_limit = default_limit
+        self.on_change = on_change
+        self._engine = engine       # движок запускается при первом задании
+        self.telemetry = telemetry  # telemetry.Telemetry: запись каждого завершённого задания
+        self._lock = threading.RLock()
+        self._jobs = []             # все задания в порядке поступления
+        self._held_locks = set()
+        self._running = {}          # backend -> число работающих
+        # честная очередь (start-time fair queuing): виртуальное время и тег
+        # окончания последнего задания каждого владельца
+        self._vtime = 0
+        self._owner_tags = {}
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from .engine import default_engine
+            self._engine = default_engine()
+        return self._engine
+
+    # -------------------------------------------------------- ОЧЕРЕДЬ
+
+    def submit(self, job: Job) -> Job:
+        with self._lock:
+            job._start_tag = max(self._vtime, self._owner_tags.get(job.owner, 0))
+            self._owner_tags[job.owner] = job._start_tag + 1
+            self._jobs.append(job)
+        if job.deadline is not None:
+            self.engine.call_soon(self._arm_deadline, job)
+        self._notify(job)
+        self._dispatch()
+        return job
+
+    def _arm_deadline(self, job):
+        # в потоке движка: loop.time() – это time.monotonic()
+        if not job.finished and job._timer is None:
+            job._timer = self.engine.loop.call_at(job.deadline, self._stop, job, TIMEOUT)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._jobs:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def _limit(self, backend):
+        return self.limits.get(backend, self.default_limit)
+
+    def _can_start(self, job):
+        if self._running.get(job.backend, 0) >= self._limit(job.backend):
+            return False
+        return not (job.locks & self._held_locks)
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            blocked = set()
+            for job in self._queue_order():
+                # задание не обгоняет более раннее, ждущее те же блокировки
+                if job.locks & blocked or not self._can_start(job):
+                    blocked |= job.locks
+                    continue
+                job.state = RUNNING
+                job.started_at = time.time()
+                self._held_locks |= job.locks
+                self._running[job.backend] = self._running.get(job.backend, 0) + 1
+                self._vtime = max(self._vtime, job._start_tag)
+                started.append(job)
+
+        for job in started:
+            self._notify(job)
+            self.engine.submit(self._run(job))
+
+    def _queue_order(self):
+        """
+        Ждущие задания в порядке обслуживания. Каждое задание при постановке
+        получает тег «не раньше текущего виртуального времени и после
+        предыдущего задания того же владельца», поэтому владельцы (клиенты
+        службы) чередуются: клиент, поставивший сотню заданий, не задерживает
+        клиента с одним. У одного владельца (GUI, CLI) теги растут в порядке
+        поступления – это обычный FIFO.
+        """
+        queued = [job for job in self._jobs if job.state == QUEUED]
+        queued.sort(key=lambda job: job._start_tag)     # сортировка устойчива
+        return queued
+
+    async def _run(self, job: Job):
+        loop = asyncio.get_running_loop()
+        job._task = asyncio.current_task()
+        if job.timeout:
+            deadline = loop.time() + job.timeout
+            if job.deadline is None or deadline < job.deadline:
+                if job._timer is not None:
+                    job._timer.cancel()
+                job._timer = loop.call_at(deadline, self._stop, job, TIMEOUT)
+
+        monitor = None
+
+        def on_start(proc):
+            nonlocal monitor
+            job.proc = proc
+            if self.telemetry is not None:
+                monitor = loop.create_task(self.telemetry.monitor(job, proc.pid))
+
+        def on_progress(progress):
+            job.last_progress = progress
+            if job.on_progress is not None:
+                job.on_progress(progress)
+
+        try:
+            if job._stop_state is None:
+                job._in_process = True
+                job.code, job.output = await run_streaming_async(
+                    job.cmd,
+                    on_line=job.on_line,
+                    on_progress=on_progress,
+                    on_start=on_start,
+                    creationflags=job.creationflags,
+                    stdin_path=job.stdin_path,
+                )
+        except asyncio.CancelledError:
+            # отмена самим планировщиком (_stop) или остановка движка
+            if job._stop_state is None:
+                job._stop_state = CANCELLED
+            if hasattr(job._task, "uncancel"):
+                job._task.uncancel()
+        except Exception as e:
+            job.error = e
+            job.output = str(e)
+        finally:
+            job._in_process = False
+            if job._timer is not None:
+                job._timer.cancel()
+            if monitor is not None:
+                monitor.cancel()
+
+        with self._lock:
+            if job._stop_state is not None:
+                job.state = job._stop_state
+            elif job.error is None and job.code == 0:
+                job.state = DONE
+            else:
+                job.state = FAILED
+            job.finished_at = time.time()
+            self._held_locks -= job.locks
+            self._running[job.backend] -= 1
+            self._trim()
+
+        # колбэки могут быть тяжёлыми – не держим ими цикл
+        await loop.run_in_executor(None, self._call_done, job)
+        self._notify(job)
+        job._finish()
+        self._dispatch()
+
+    def _call_done(self, job):
+        if self.telemetry is not None:
+            try:
+                self.telemetry.record(job)
+            except Exception:
+                pass
+        if job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception:
+                pass
+
+    def _trim(self):
+        finished = [j for j in self._jobs if j.finished]
+        for job in finished[:-MAX_FINISHED_JOBS]:
+            self._jobs.remove(job)
+        # владельцы, отставшие от виртуального времени, больше ничего не меняют
+        for owner in [o for o, tag in self._owner_tags.items() if tag <= self._vtime]:
+            del self._owner_tags[owner]
+
+    # -------------------------------------------------------- ОТМЕНА
+
+    def _stop(self, job: Job, state):
+        with self._lock:
+            if job.finished:
+                return False
+            if job.state == QUEUED:
+                job.state = state
+                job.finished_at = time.time()
+                queued = True
+            else:
+                job._stop_state = state
+                queued = False
+
+        if queued:
+            if job._timer is not None:
+                self.engine.call_soon(job._timer.cancel)
+            self._call_done(job)
+            self._notify(job)
+            job._finish()
+            self._dispatch()
+        else:
+            self.engine.call_soon(self._cancel_task, job)
+        return True
+
+    @staticmethod
+    def _cancel_task(job):
+        # в потоке движка; отменённая корутина завершает дерево процессов
+        if job._in_process and job._task is not None:
+            job._task.cancel()
+
+    def cancel(self, job_or_id) -> bool:
+        job = job_or_id if isinstance(job_or_id, Job) else self.get(job_or_id)
+        if job is None:
+            return False
+        return self._stop(job, CANCELLED)
+
+    def cancel_all(self):
+        for job in self.jobs():
+            self.cancel(job)
+
+    def _notify(self, job):
+        if self.on_change is not None:
+            try:
+                self.on_change(job)
+            except Exception:
+                pass
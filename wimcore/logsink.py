@@ -0,0 +1,143 @@
+"""
+Потокобезопасный лог для GUI.
+
+Рабочие потоки только кладут строки в очередь (LogSink.write), а поток Tk
+раз в DRAIN_INTERVAL_MS забирает их пачкой и вставляет в текстовый виджет
+одной операцией (TextLogView). Видимая часть лога ограничена, полный лог
+пишется в файл с ротацией.
+
+Модуль не импортирует tkinter: TextLogView работает с любым объектом,
+у которого есть методы Text-виджета (configure/insert/delete/see/index).
+"""
+import os
+import queue
+import threading
+import time
+
+DRAIN_INTERVAL_MS = 50
+MAX_BATCH_LINES = 5000
+MAX_VISIBLE_LINES = 5000
+LOG_FILE_MAX_BYTES = 2 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+
+class RotatingLogFile:
+    """Простая запись в файл с ротацией: app.log, app.log.1, ... app.log.N."""
+
+    def __init__(self, path, max_bytes=LOG_FILE_MAX_BYTES, backups=LOG_FILE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write_lines(self, lines):
+        if not lines:
+            return
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        data = "".join(f"{stamp} {line}\n" for line in lines)
+        with self._lock:
+            try:
+                f = self._open()
+                f.write(data)
+                f.flush()
+                if f.tell() >= self.max_bytes:
+                    self._rotate()
+            except OSError:
+                pass
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class LogSink:
+    """Очередь строк лога: писать можно из любого потока."""
+
+    def __init__(self, log_file=None):
+        self._queue = queue.SimpleQueue()
+        self.log_file = log_file
+
+    def write(self, text: str):
+        self._queue.put(text)
+
+    def drain(self, max_lines=MAX_BATCH_LINES):
+        """Забирает до max_lines строк (без блокировки) и пишет их в файл."""
+        lines = []
+        get = self._queue.get_nowait
+        try:
+            while len(lines) < max_lines:
+                lines.extend(get().split("\n"))
+        except queue.Empty:
+            pass
+        if self.log_file is not None:
+            self.log_file.write_lines(lines)
+        return lines
+
+    def pending(self) -> bool:
+        return not self._queue.empty()
+
+
+class TextLogView:
+    """
+    Переносит строки из LogSink в Text-виджет. Метод drain() вызывается
+    только в потоке Tk (см. schedule()).
+    """
+
+    def __init__(self, widget, sink: LogSink, max_lines=MAX_VISIBLE_LINES):
+        self.widget = widget
+        self.sink = sink
+        self.max_lines = max_lines
+        self._lines = 0
+        self.dropped = 0        # строк, не показанных в виджете (остались только в файле)
+
+    def drain(self) -> int:
+        lines = self.sink.drain()
+        if not lines:
+            return 0
+        if len(lines) > self.max_lines:
+            skipped = len(lines) - self.max_lines + 1
+            self.dropped += skipped
+            lines = [f"... пропущено строк: {skipped} (всего {self.dropped}), полный лог – в файле"] \
+                + lines[skipped:]
+
+        w = self.widget
+        w.configure(state="normal")
+        w.insert("end", "\n".join(lines) + "\n")
+        self._lines += len(lines)
+        excess = self._lines - self.max_lines
+        if excess > 0:
+            w.delete("1.0", f"{excess + 1}.0")
+            self._lines -= excess
+        w.see("end")
+        w.configure(state="disabled")
+        return len(lines)
+
+    def schedule(self, root, interval_ms=DRAIN_INTERVAL_MS):
+        """Периодический сброс очереди через root.after."""
+        def tick():
+            try:
+                self.drain()
+            finally:
+                root.after(interval_ms, tick)
+
+        root.after(interval_ms, tick)
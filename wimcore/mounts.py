@@ -0,0 +1,340 @@
+"""
+Список смонтированных образов в виде записей и их фоновый опрос.
+
+- DISM: разбор вывода `dism /Get-MountedWimInfo`;
+- wimlib: FUSE-монтирования из /proc/self/mounts, дополненные журналом
+  монтирований, которые выполнила сама программа (индекс и режим в
+  /proc не видны).
+
+Монитор опрашивает список редко (по умолчанию раз в 30 с) и сообщает
+только об изменениях. Брошенные и «зависшие» монтирования помечаются, для
+них строится пакет команд восстановления (/Cleanup-Wim, /Remount-Wim,
+fusermount -u).
+"""
+import errno
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field, replace
+
+from . import backend as be
+from .settings import app_data_dir
+
+POLL_INTERVAL_SEC = 30
+LIST_TIMEOUT_SEC = 60
+TRACKER_FILE_NAME = "mounts.json"
+
+STATUS_OK = "Ok"
+STATUS_NEEDS_REMOUNT = "Needs Remount"
+STATUS_INVALID = "Invalid"
+STATUS_STALE = "Stale"          # FUSE-точка без процесса wimlib
+STATUS_ORPHANED = "Orphaned"    # нет папки или WIM, либо запись журнала без монтирования
+
+WIMLIB_FS_TYPES = ("fuse.wimfs", "fuse.wimlib-imagex", "fuse.wimlib")
+
+_DISM_KEYS = {
+    "mount dir": "mount_dir",
+    "image file": "image_file",
+    "image index": "index",
+    "mounted read/write": "read_write",
+    "status": "status",
+}
+
+
+@dataclass(frozen=True)
+class MountRecord:
+    mount_dir: str
+    image_file: str = ""
+    index: int = 0
+    read_write: bool = False
+    status: str = STATUS_OK
+    backend: str = "dism"
+
+    @property
+    def key(self) -> str:
+        return os.path.normcase(os.path.normpath(self.mount_dir))
+
+    @property
+    def healthy(self) -> bool:
+        return self.status == STATUS_OK
+
+    def describe(self) -> str:
+        mode = "RW" if self.read_write else "RO"
+        return f"{self.mount_dir} <- {self.image_file}:{self.index} [{mode}, {self.backend}] {self.status}"
+
+
+@dataclass
+class MountDiff:
+    added: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+@dataclass
+class RepairAction:
+    title: str
+    cmd: list = None            # None – действие без внешней команды
+    backend: str = ""
+    mount_dir: str = ""
+
+
+# -------------------------------------------------------- РАЗБОР
+
+def parse_dism_mounted(text: str):
+    """Записи из вывода `dism /English /Get-MountedWimInfo`."""
+    records, current = [], None
+    for line in text.splitlines():
+        key, sep, value = line.partition(" : ")
+        if not sep:
+            continue
+        field_name = _DISM_KEYS.get(key.strip().lower())
+        if field_name is None:
+            continue
+        value = value.strip()
+        if field_name == "mount_dir":
+            if current:
+                records.append(current)
+            current = {"mount_dir": value}
+        elif current is not None:
+            if field_name == "index":
+                current["index"] = int(value) if value.isdigit() else 0
+            elif field_name == "read_write":
+                current["read_write"] = value.lower() == "yes"
+            else:
+                current[field_name] = value
+    if current:
+        records.append(current)
+    return [MountRecord(backend="dism", **r) for r in records]
+
+
+def _unescape_mount_field(value: str) -> str:
+    # пробелы и пр. в /proc/mounts записаны как \040
+    if "\\" not in value:
+        return value
+    out, i = [], 0
+    while i < len(value):
+        if value[i] == "\\" and value[i + 1:i + 4].isdigit():
+            out.append(chr(int(value[i + 1:i + 4], 8)))
+            i += 4
+        else:
+            out.append(value[i])
+            i += 1
+    return "".join(out)
+
+
+def parse_proc_mounts(text: str):
+    """FUSE-монтирования wimlib из содержимого /proc/self/mounts."""
+    records = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 4 or parts[2] not in WIMLIB_FS_TYPES:
+            continue
+        options = parts[3].split(",")
+        records.append(MountRecord(
+            mount_dir=_unescape_mount_field(parts[1]),
+            image_file=_unescape_mount_field(parts[0]),
+            read_write="rw" in options,
+            backend="wimlib",
+        ))
+    return records
+
+
+# -------------------------------------------------------- ЖУРНАЛ МОНТИРОВАНИЙ
+
+class MountTracker:
+    """Монтирования, выполненные программой (нужны для wimlib: индекс и режим)."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_data_dir(), TRACKER_FILE_NAME)
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return [MountRecord(**r) for r in data if isinstance(r, dict)]
+
+    def _save(self, records):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump([asdict(r) for r in records], f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def records(self):
+        with self._lock:
+            return self._load()
+
+    def add(self, record: MountRecord):
+        with self._lock:
+            records = [r for r in self._load() if r.key != record.key]
+            records.append(record)
+            self._save(records)
+
+    def remove(self, mount_dir):
+        key = MountRecord(mount_dir).key
+        with self._lock:
+            self._save([r for r in self._load() if r.key != key])
+
+
+# -------------------------------------------------------- СОСТОЯНИЕ
+
+def _dir_state(path):
+    """'ok', 'missing' или 'stale' (FUSE без процесса: ENOTCONN)."""
+    try:
+        os.stat(path)
+    except OSError as e:
+        return "stale" if e.errno == errno.ENOTCONN else "missing"
+    return "ok"
+
+
+def annotate(records, tracker_records=(), dir_state=_dir_state, file_exists=os.path.isfile):
+    """
+    Дополняет записи данными журнала и помечает брошенные/зависшие монтирования.
+    Записи журнала wimlib, которых нет среди смонтированных, возвращаются как Orphaned.
+    """
+    tracked = {r.key: r for r in tracker_records}
+    result, seen = [], set()
+    for record in records:
+        seen.add(record.key)
+        known = tracked.get(record.key)
+        if record.backend == "wimlib" and known is not None:
+            record = replace(record, index=known.index, read_write=known.read_write,
+                             image_file=known.image_file or record.image_file)
+        if record.status == STATUS_OK:
+            state = dir_state(record.mount_dir)
+            if state == "stale":
+                record = replace(record, status=STATUS_STALE)
+            elif state == "missing" or (record.image_file and not file_exists(record.image_file)):
+                record = replace(record, status=STATUS_ORPHANED)
+        result.append(record)
+    for key, record in tracked.items():
+        if key not in seen and record.backend == "wimlib":
+            result.append(replace(record, status=STATUS_ORPHANED))
+    return result
+
+
+def diff_records(old, new) -> MountDiff:
+    old_map = {r.key: r for r in old}
+    new_map = {r.key: r for r in new}
+    diff = MountDiff()
+    for key, record in new_map.items():
+        if key not in old_map:
+            diff.added.append(record)
+        elif old_map[key] != record:
+            diff.changed.append(record)
+    diff.removed = [r for k, r in old_map.items() if k not in new_map]
+    return diff
+
+
+def plan_repairs(records):
+    """
+    Пакет восстановления: один /Cleanup-Wim на все брошенные монтирования
+    DISM, /Remount-Wim на каждое «Needs Remount», fusermount -u на зависшие
+    точки wimlib и удаление устаревших записей журнала.
+    """
+    actions = []
+    if any(r.backend == "dism" and r.status in (STATUS_INVALID, STATUS_ORPHANED) for r in records):
+        actions.append(RepairAction("DISM: очистка брошенных монтирований", be.cleanup_cmd(), "dism"))
+    for r in records:
+        if r.backend == "dism" and r.status == STATUS_NEEDS_REMOUNT:
+            actions.append(RepairAction(f"DISM: перемонтирование {r.mount_dir}",
+                                        be.remount_cmd(r.mount_dir), "dism", r.mount_dir))
+        elif r.backend == "wimlib" and r.status == STATUS_STALE:
+            actions.append(RepairAction(f"Снятие зависшей точки {r.mount_dir}",
+                                        be.fuse_unmount_cmd(r.mount_dir), "", r.mount_dir))
+        elif r.backend == "wimlib" and r.status == STATUS_ORPHANED:
+            actions.append(RepairAction(f"Удаление записи журнала {r.mount_dir}", None, "wimlib",
+                                        r.mount_dir))
+    return actions
+
+
+# -------------------------------------------------------- ОПРОС
+
+class MountListError(RuntimeError):
+    """DISM не выдал список монтирований (нет прав администратора, сбой DISM)."""
+
+
+def _dism_failure(proc) -> str:
+    if proc.returncode == 740:
+        return "DISM: для списка монтирований нужны права администратора (код 740)."
+    lines = [line.strip() for line in (proc.stdout or "").splitlines() + (proc.stderr or "").splitlines()
+             if line.strip()]
+    detail = f": {lines[-1]}" if lines else ""
+    return f"DISM /Get-MountedWimInfo завершился с кодом {proc.returncode}{detail}"
+
+
+def list_mounts(tracker=None, use_dism=None, proc_mounts="/proc/self/mounts"):
+    """
+    Текущие монтирования DISM и wimlib с пометками о состоянии. Бросает
+    MountListError, если DISM завершился с ошибкой, и OSError, если не
+    читается proc_mounts – пустой список означает, что монтирований нет.
+    """
+    import subprocess
+
+    records = []
+    if use_dism is None:
+        use_dism = be.is_windows() and bool(be.find_dism())
+    if use_dism:
+        proc = subprocess.run(be.mounted_cmd(), capture_output=True, text=True, errors="replace",
+                              timeout=LIST_TIMEOUT_SEC, creationflags=be.creationflags())
+        if proc.returncode != 0:
+            raise MountListError(_dism_failure(proc))
+        records += parse_dism_mounted(proc.stdout)
+    if os.path.exists(proc_mounts):
+        with open(proc_mounts, "r", encoding="utf-8", errors="replace") as f:
+            records += parse_proc_mounts(f.read())
+    return annotate(records, tracker.records() if tracker is not None else ())
+
+
+class MountMonitor:
+    """
+    Фоновый опрос list_fn() раз в interval секунд. on_change(records, diff)
+    вызывается (в потоке монитора) при первом опросе и затем только при
+    изменениях; on_error(exc) – при ошибке опроса.
+    """
+
+    def __init__(self, list_fn, on_change, on_error=None, interval=POLL_INTERVAL_SEC):
+        self.list_fn = list_fn
+        self.on_change = on_change
+        self.on_error = on_error
+        self.interval = interval
+        self.records = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def refresh(self):
+        """Опросить немедленно (например, после монтирования)."""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                records = self.list_fn()
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+            else:
+                diff = diff_records(self.records or [], records)
+                if self.records is None or diff:
+                    self.records = records
+                    self.on_change(records, diff)
+            self._wake.wait(self.interval)
+            self._wake.clear()
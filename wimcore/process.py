@@ -0,0 +1,292 @@
+"""
+Потоковый запуск внешних команд (DISM, wimlib-imagex).
+
+Вывод читается по мере появления, построчно (строкой считается всё, что
+заканчивается на \\n или \\r – DISM перерисовывает прогресс через \\r).
+В памяти хранится только хвост вывода ограниченной длины, а строки и
+прогресс отдаются в колбэки. Команды запускает run_streaming_async в цикле
+asyncio (см. engine, jobs).
+"""
+import codecs
+import locale
+import os
+import re
+import signal
+import subprocess
+import time
+from collections import deque
+from dataclasses import dataclass
+
+# DISM: "[=====                      10.0%                          ]"
+_DISM_PROGRESS_RE = re.compile(r"\[[=\s]*?(\d{1,3}(?:[.,]\d+)?)%[=\s]*\]")
+# wimlib: "Writing resources: 123 MiB of 456 MiB (27%) done"
+_WIMLIB_PROGRESS_RE = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(B|KiB|MiB|GiB|TiB)\s+of\s+(\d+(?:\.\d+)?)\s*(B|KiB|MiB|GiB|TiB)\s*\((\d{1,3})%\)"
+)
+# wimlib без объёмов: "Applying ... (42%)"
+_PERCENT_RE = re.compile(r"\((\d{1,3})%\)")
+
+_UNITS = {"B": 1, "KiB": 1 << 10, "MiB": 1 << 20, "GiB": 1 << 30, "TiB": 1 << 40}
+
+READ_CHUNK = 4096
+DEFAULT_TAIL_LINES = 500
+
+
+@dataclass
+class Progress:
+    percent: float
+    done_bytes: int = 0
+    total_bytes: int = 0
+    rate: float = 0.0       # байт/с (если известны объёмы), иначе %/с
+    eta: float = None       # секунды до завершения или None
+
+    def describe(self) -> str:
+        parts = [f"{self.percent:.1f}%"]
+        if self.total_bytes:
+            parts.append(f"{self.rate / (1 << 20):.1f} MiB/s")
+        if self.eta is not None:
+            minutes, seconds = divmod(int(self.eta), 60)
+            hours, minutes = divmod(minutes, 60)
+            parts.append(f"ETA {hours:d}:{minutes:02d}:{seconds:02d}" if hours
+                         else f"ETA {minutes:02d}:{seconds:02d}")
+        return " | ".join(parts)
+
+
+def parse_progress_line(line: str):
+    """
+    Распознаёт строку прогресса DISM или wimlib.
+    Возвращает (percent, done_bytes, total_bytes) или None.
+    """
+    m = _WIMLIB_PROGRESS_RE.search(line)
+    if m:
+        done = int(float(m.group(1)) * _UNITS[m.group(2)])
+        total = int(float(m.group(3)) * _UNITS[m.group(4)])
+        percent = done * 100.0 / total if total else float(m.group(5))
+        return min(percent, 100.0), done, total
+
+    m = _DISM_PROGRESS_RE.search(line)
+    if m:
+        return min(float(m.group(1).replace(",", ".")), 100.0), 0, 0
+
+    m = _PERCENT_RE.search(line)
+    if m:
+        return min(float(m.group(1)), 100.0), 0, 0
+    return None
+
+
+class ProgressTracker:
+    """Считает скорость и ETA по последовательности значений прогресса."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._start = None
+        self._start_percent = 0.0
+        self._start_bytes = 0
+        self.last = None
+
+    def feed(self, line: str):
+        parsed = parse_progress_line(line)
+        if parsed is None:
+            return None
+        percent, done, total = parsed
+        now = self._clock()
+
+        if self._start is None or (self.last and percent < self.last.percent):
+            # первая точка или бэкенд начал новую фазу
+            self._start = now
+            self._start_percent = percent
+            self._start_bytes = done
+
+        elapsed = now - self._start
+        rate = 0.0
+        eta = None
+        if elapsed > 0:
+            if total:
+                rate = (done - self._start_bytes) / elapsed
+                if rate > 0:
+                    eta = (total - done) / rate
+            else:
+                rate = (percent - self._start_percent) / elapsed
+                if rate > 0:
+                    eta = (100.0 - percent) / rate
+
+        self.last = Progress(percent=percent, done_bytes=done, total_bytes=total, rate=rate, eta=eta)
+        return self.last
+
+
+def _split_lines(decoder_buf: str):
+    """Отделяет завершённые строки (\\n или \\r) от незавершённого хвоста."""
+    parts = re.split(r"\r\n|\r|\n", decoder_buf)
+    return parts[:-1], parts[-1]
+
+
+def _exited(proc) -> bool:
+    # subprocess.Popen или asyncio.subprocess.Process
+    poll = getattr(proc, "poll", None)
+    return (poll() if poll is not None else proc.returncode) is not None
+
+
+def kill_process_tree(proc):
+    """
+    Завершает процесс вместе с дочерними. На POSIX процесс должен быть
+    запущен в своей группе (run_streaming_async так запускает всегда).
+    Принимает и subprocess.Popen, и asyncio.subprocess.Process.
+    """
+    if _exited(proc):
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+            )
+        else:
+            os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+    except (OSError, ProcessLookupError):
+        pass
+    if not _exited(proc):
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+
+def _windows_cpu_time(proc):
+    import ctypes
+    from ctypes import wintypes
+
+    times = [wintypes.FILETIME() for _ in range(4)]
+    ok = ctypes.windll.kernel32.GetProcessTimes(
+        wintypes.HANDLE(int(proc._handle)), *(ctypes.byref(t) for t in times)
+    )
+    if not ok:
+        return None
+    _, _, kernel, user = ((t.dwHighDateTime << 32 | t.dwLowDateTime) for t in times)
+    return (kernel + user) / 1e7     # FILETIME – интервалы по 100 нс
+
+
+def wait_with_cpu(proc):
+    """
+    Ждёт завершения процесса. Возвращает (код возврата, процессорное время
+    user+system в секундах или None, если его не удалось узнать).
+    """
+    if os.name == "nt":
+        code = proc.wait()
+        try:
+            return code, _windows_cpu_time(proc)
+        except (OSError, AttributeError, ValueError):
+            return code, None
+    if proc.returncode is None:
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        except ChildProcessError:
+            return proc.wait(), None
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return proc.returncode, usage.ru_utime + usage.ru_stime
+    return proc.returncode, None
+
+
+class OutputReader:
+    """
+    Разбор потока вывода команды: декодирование, деление на строки,
+    прогресс, хвост ограниченной длины и колбэки.
+    """
+
+    def __init__(self, on_line=None, on_progress=None, tail_lines=DEFAULT_TAIL_LINES, encoding=None):
+        if on_line is None:
+            self.line_callbacks = []
+        elif callable(on_line):
+            self.line_callbacks = [on_line]
+        else:
+            self.line_callbacks = list(on_line)
+        self.on_progress = on_progress
+        self.tail = deque(maxlen=tail_lines)
+        self.tracker = ProgressTracker()
+        encoding = encoding or locale.getpreferredencoding(False)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._pending = ""
+
+    def _handle(self, line: str):
+        line = line.rstrip()
+        if not line:
+            return
+        progress = self.tracker.feed(line)
+        if progress is not None:
+            if self.on_progress is not None:
+                self.on_progress(progress)
+            return
+        self.tail.append(line)
+        for cb in self.line_callbacks:
+            cb(line)
+
+    def feed(self, chunk: bytes):
+        lines, self._pending = _split_lines(self._pending + self._decoder.decode(chunk))
+        for line in lines:
+            self._handle(line)
+
+    def finish(self) -> str:
+        """Дочитывает незавершённую строку и возвращает хвост вывода."""
+        self._pending += self._decoder.decode(b"", final=True)
+        if self._pending:
+            self._handle(self._pending)
+            self._pending = ""
+        return "\n".join(self.tail)
+
+
+async def run_streaming_async(cmd, on_line=None, on_progress=None, tail_lines=DEFAULT_TAIL_LINES,
+                              creationflags=0, encoding=None, on_start=None, stdin_path=None):
+    """
+    Запускает команду в цикле asyncio и читает её stdout+stderr потоково.
+
+    on_line      – колбэк (или список колбэков) для каждой непустой строки;
+    on_progress  – колбэк с объектом Progress при каждой строке прогресса;
+    on_start     – колбэк с процессом сразу после запуска;
+    stdin_path   – файл, подаваемый на stdin (например, команды wimlib-imagex update).
+
+    Возвращает (код возврата, последние tail_lines строк вывода одной строкой).
+    Процесс всегда запускается в своей группе; при отмене корутины всё дерево
+    процессов завершается, и только после этого CancelledError уходит выше.
+    """
+    import asyncio
+
+    stdin = open(stdin_path, "rb") if stdin_path else subprocess.DEVNULL
+    spawn = asyncio.ensure_future(asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        stdin=stdin,
+        creationflags=creationflags,
+        start_new_session=os.name != "nt",
+    ))
+    try:
+        proc = await asyncio.shield(spawn)
+    except asyncio.CancelledError:
+        # отмена пришла во время запуска: дождаться процесса и снять его
+        try:
+            proc = await spawn
+        except OSError:
+            raise asyncio.CancelledError
+        kill_process_tree(proc)
+        await proc.wait()
+        raise
+    finally:
+        if stdin_path:
+            stdin.close()
+    if on_start is not None:
+        on_start(proc)
+
+    reader = OutputReader(on_line, on_progress, tail_lines, encoding)
+    try:
+        while True:
+            chunk = await proc.stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+            reader.feed(chunk)
+        code = await proc.wait()
+    except asyncio.CancelledError:
+        kill_process_tree(proc)
+        await proc.wait()
+        raise
+    return code, reader.finish()
@@ -0,0 +1,65 @@
+"""
+Каталог данных приложения и небольшие постоянные настройки (settings.json).
+"""
+import json
+import os
+import sys
+import threading
+
+APP_DIR_NAME = "WIMManager-Cicada3301"
+SETTINGS_FILE_NAME = "settings.json"
+DAEMON_ENV = "WIMMANAGER_DAEMON"
+
+_lock = threading.Lock()
+
+
+def app_data_dir() -> str:
+    """Каталог данных приложения (создаётся при необходимости)."""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    path = os.path.join(base, APP_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def settings_path() -> str:
+    return os.path.join(app_data_dir(), SETTINGS_FILE_NAME)
+
+
+def load_settings() -> dict:
+    try:
+        with open(settings_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def update_settings(**values) -> dict:
+    """Обновляет указанные ключи (None – удалить ключ) и сохраняет файл атомарно."""
+    with _lock:
+        data = load_settings()
+        for key, value in values.items():
+            if value is None:
+                data.pop(key, None)
+            else:
+                data[key] = value
+        path = settings_path()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return data
+
+
+def daemon_requested(argv=None, settings=None) -> bool:
+    """Работать через службу: --daemon, WIMMANAGER_DAEMON=1 или "daemon": true в settings.json."""
+    if "--daemon" in (sys.argv if argv is None else argv):
+        return True
+    if os.environ.get(DAEMON_ENV, "").strip() not in ("", "0"):
+        return True
+    return bool((settings or {}).get("daemon"))
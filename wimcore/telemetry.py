@@ -0,0 +1,421 @@
+"""
+Телеметрия операций: сколько на самом деле длятся mount / commit / export
+на этой машине.
+
+Для каждого задания планировщика записывается строка JSON в
+telemetry.jsonl (каталог данных приложения): тип операции, бэкенд, WIM,
+индекс и размер образа, время в очереди и выполнения, процессорное время,
+прочитанные и записанные байты, объём по строкам прогресса и код возврата.
+
+Процессорное время и ввод-вывод всего дерева процессов снимаются раз в
+SAMPLE_INTERVAL_SEC через psutil (если установлен) или /proc (Linux);
+последний интервал перед выходом процесса не учитывается. Где нет ни
+того, ни другого (Windows без psutil), эти поля пустые.
+
+summarize() считает p50/p95 по типам операций; to_csv() и to_prometheus()
+выгружают записи и сводку для внешних панелей.
+"""
+import asyncio
+import csv
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+
+from .settings import app_data_dir, load_settings
+
+TELEMETRY_FILE_NAME = "telemetry.jsonl"
+TELEMETRY_MAX_BYTES = 10 * 1024 * 1024
+SAMPLE_INTERVAL_SEC = 0.25
+TELEMETRY_KEY = "telemetry"     # в settings.json: false – не записывать
+
+_DISM_SKIP = ("/english", "/quiet", "/norestart", "/loglevel")
+_WIMLIB_WIM_ARG = ("info", "mount", "mountrw", "export", "apply", "extract", "dir", "verify",
+                   "optimize", "update", "split")
+
+
+@dataclass
+class ResourceUsage:
+    cpu: float = None           # user+system, с (всё дерево процессов)
+    read_bytes: int = None
+    write_bytes: int = None
+    peak_rss: int = None
+
+
+@dataclass
+class JobRecord:
+    time: float                 # момент завершения (unix time)
+    job_id: int
+    operation: str
+    name: str
+    backend: str
+    state: str
+    code: int = None
+    wim: str = ""
+    index: int = None
+    image_bytes: int = None     # несжатый размер образа (из XML WIM)
+    wim_bytes: int = None       # размер WIM-файла
+    queue: float = 0.0          # с в очереди
+    wall: float = 0.0           # с выполнения
+    cpu: float = None
+    read_bytes: int = None
+    write_bytes: int = None
+    peak_rss: int = None
+    progress_bytes: int = None  # объём по строкам прогресса wimlib
+
+    @property
+    def throughput(self):
+        """МБ/с по объёму образа или прогресса, если он известен."""
+        size = self.progress_bytes or self.image_bytes
+        return size / (1 << 20) / self.wall if size and self.wall > 0 else None
+
+
+RECORD_FIELDS = [f.name for f in fields(JobRecord)]
+
+
+# -------------------------------------------------------- РАЗБОР КОМАНД
+
+def describe_command(cmd):
+    """(операция, WIM, индекс) по командной строке dism / wimlib-imagex."""
+    if not cmd:
+        return "", "", None
+    tool = re.split(r"[\\/]", cmd[0])[-1].lower()
+    if tool.startswith("dism"):
+        operation, wim, index = "", "", None
+        for arg in cmd[1:]:
+            key, _, value = arg.partition(":")
+            key = key.lower()
+            if key in ("/wimfile", "/imagefile", "/sourceimagefile"):
+                wim = value
+            elif key in ("/index", "/sourceindex") and value.isdigit():
+                index = int(value)
+            elif not operation and key.startswith("/") and key not in _DISM_SKIP:
+                operation = key[1:]
+        return operation or "dism", wim, index
+    args = cmd[1:]
+    operation = args[0] if args else tool
+    wim, index = "", None
+    if operation in _WIMLIB_WIM_ARG and len(args) > 1:
+        wim = args[1]
+        if len(args) > 2 and args[2].isdigit():
+            index = int(args[2])
+    elif operation in ("capture", "append") and len(args) > 2:
+        wim = args[2]
+    elif operation == "join":
+        wim = next((a for a in args[1:] if not a.startswith("--")), "")
+    return operation, wim, index
+
+
+# -------------------------------------------------------- СНЯТИЕ ПОКАЗАТЕЛЕЙ
+
+def _proc_tree(pid):
+    pids, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        pids.append(p)
+        try:
+            for task in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{task}/children") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _sample_proc(pid):
+    tick = os.sysconf("SC_CLK_TCK")
+    page = os.sysconf("SC_PAGE_SIZE")
+    cpu, read, written, rss, seen = 0.0, 0, 0, 0, False
+    for p in _proc_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                stat = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        seen = True
+        # utime, stime, cutime, cstime (поля 14–17): cutime/cstime – уже завершённые потомки
+        cpu += sum(int(v) for v in stat[11:15]) / tick
+        rss += int(stat[21]) * page
+        try:
+            with open(f"/proc/{p}/io") as f:
+                io = dict(line.split(": ") for line in f.read().splitlines())
+            read += int(io.get("read_bytes", 0))
+            written += int(io.get("write_bytes", 0))
+        except (OSError, ValueError):
+            pass
+    return (cpu, read, written, rss) if seen else None
+
+
+def _sample_psutil(psutil, pid):
+    try:
+        root = psutil.Process(pid)
+        procs = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return None
+    cpu, read, written, rss = 0.0, 0, 0, 0
+    for p in procs:
+        try:
+            with p.oneshot():
+                t = p.cpu_times()
+                cpu += t.user + t.system + getattr(t, "children_user", 0) + getattr(t, "children_system", 0)
+                rss += p.memory_info().rss
+                try:
+                    io = p.io_counters()
+                    read += io.read_bytes
+                    written += io.write_bytes
+                except (psutil.Error, AttributeError):
+                    pass
+        except psutil.Error:
+            continue
+    return cpu, read, written, rss
+
+
+def make_sampler():
+    """Функция pid -> (cpu, read, write, rss) или None, если снимать нечем."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return lambda pid: _sample_psutil(psutil, pid)
+    if os.path.isdir("/proc/self/task"):
+        return _sample_proc
+    return None
+
+
+# -------------------------------------------------------- ЖУРНАЛ
+
+class Telemetry:
+    def __init__(self, path=None, info_fn=None, max_bytes=TELEMETRY_MAX_BYTES, enabled=None):
+        """
+        info_fn(wim) -> WimInfo или None: откуда сначала брать размер образа
+        (например, MetadataCache.get_info); если там пусто – встроенный парсер.
+        """
+        self.path = path or os.path.join(app_data_dir(), TELEMETRY_FILE_NAME)
+        self.info_fn = info_fn
+        self.max_bytes = max_bytes
+        self.enabled = load_settings().get(TELEMETRY_KEY, True) if enabled is None else enabled
+        self.sampler = make_sampler()
+        self._lock = threading.Lock()
+
+    async def monitor(self, job, pid):
+        """Корутина (в цикле движка): снимает показатели дерева процессов задания."""
+        if self.sampler is None:
+            return
+        usage = job.usage = ResourceUsage()
+        while True:
+            sample = self.sampler(pid)
+            if sample is not None:
+                cpu, read, written, rss = sample
+                # значения только растут; у завершившихся потомков счётчики пропадают
+                usage.cpu = max(usage.cpu or 0.0, cpu)
+                usage.read_bytes = max(usage.read_bytes or 0, read)
+                usage.write_bytes = max(usage.write_bytes or 0, written)
+                usage.peak_rss = max(usage.peak_rss or 0, rss)
+            await asyncio.sleep(SAMPLE_INTERVAL_SEC)
+
+    def record(self, job) -> JobRecord:
+        """Строит запись по завершённому заданию и дописывает её в журнал."""
+        operation, wim, index = describe_command(job.cmd)
+        usage = getattr(job, "usage", None) or ResourceUsage()
+        progress = getattr(job, "last_progress", None)
+        record = JobRecord(
+            time=job.finished_at or time.time(),
+            job_id=job.id,
+            operation=operation,
+            name=job.name,
+            backend=job.backend,
+            state=job.state,
+            code=job.code,
+            wim=os.path.abspath(wim) if wim else "",
+            index=index,
+            queue=round(job.queue_time if job.queue_time is not None
+                        else (job.finished_at or time.time()) - job.submitted_at, 3),
+            wall=round((job.finished_at - job.started_at) if job.started_at and job.finished_at else 0.0, 3),
+            cpu=round(usage.cpu, 3) if usage.cpu is not None else None,
+            read_bytes=usage.read_bytes,
+            write_bytes=usage.write_bytes,
+            peak_rss=usage.peak_rss,
+            progress_bytes=(progress.total_bytes or None) if progress is not None else None,
+        )
+        if wim:
+            record.wim_bytes, record.image_bytes = self._sizes(wim, index)
+        if self.enabled:
+            self.append(record)
+        return record
+
+    def _sizes(self, wim, index):
+        try:
+            wim_bytes = os.path.getsize(wim)
+        except OSError:
+            return None, None
+        image_bytes = None
+        info = (self.info_fn(wim) if self.info_fn is not None else None) or _read_info(wim)
+        if info is not None:
+            for image in info.images:
+                if index is None or image.index == index:
+                    image_bytes = (image_bytes or 0) + image.total_bytes
+        return wim_bytes, image_bytes or None
+
+    def append(self, record: JobRecord):
+        line = json.dumps(asdict(record), ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+    def load(self, since=None):
+        """Записи из журнала (вместе с предыдущим файлом ротации)."""
+        return load_records(self.path, since)
+
+
+def _read_info(wim):
+    from .wiminfo import WimParseError, read_wim_info
+    try:
+        return read_wim_info(wim)
+    except (OSError, WimParseError):
+        return None
+
+
+def load_records(path=None, since=None):
+    path = path or os.path.join(app_data_dir(), TELEMETRY_FILE_NAME)
+    records = []
+    for name in (path + ".1", path):
+        try:
+            with open(name, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        data = json.loads(line)
+                    except ValueError:
+                        continue
+                    record = JobRecord(**{k: v for k, v in data.items() if k in RECORD_FIELDS})
+                    if since is None or record.time >= since:
+                        records.append(record)
+        except (OSError, TypeError):
+            continue
+    return records
+
+
+# -------------------------------------------------------- СВОДКА И ВЫГРУЗКА
+
+def percentile(values, p):
+    """Перцентиль с линейной интерполяцией (как numpy.percentile)."""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return round(values[lo] + (values[hi] - values[lo]) * (k - lo), 3)
+
+
+@dataclass
+class OperationStats:
+    operation: str
+    backend: str
+    count: int = 0
+    failed: int = 0
+    wall_p50: float = None
+    wall_p95: float = None
+    queue_p50: float = None
+    queue_p95: float = None
+    cpu_p50: float = None
+    mb_per_sec_p50: float = None
+    read_bytes: int = 0
+    write_bytes: int = 0
+
+    def describe(self) -> str:
+        def sec(v):
+            return f"{v:7.1f} с" if v is not None else "      – "
+        speed = f"{self.mb_per_sec_p50:7.1f} МБ/с" if self.mb_per_sec_p50 is not None else ""
+        return (f"{self.operation:<14} {self.backend:<7} n={self.count:<4} ошибок {self.failed:<3} "
+                f"p50 {sec(self.wall_p50)}  p95 {sec(self.wall_p95)}  очередь p95 {sec(self.queue_p95)} "
+                f"{speed}")
+
+
+def summarize(records):
+    """Сводка по (операция, бэкенд), отсортированная по операции."""
+    groups = {}
+    for r in records:
+        groups.setdefault((r.operation, r.backend), []).append(r)
+    result = []
+    for (operation, backend), group in sorted(groups.items()):
+        done = [r for r in group if r.state == "done"]
+        walls = [r.wall for r in done]
+        result.append(OperationStats(
+            operation=operation,
+            backend=backend,
+            count=len(group),
+            failed=len(group) - len(done),
+            wall_p50=percentile(walls, 50),
+            wall_p95=percentile(walls, 95),
+            queue_p50=percentile([r.queue for r in group], 50),
+            queue_p95=percentile([r.queue for r in group], 95),
+            cpu_p50=percentile([r.cpu for r in done], 50),
+            mb_per_sec_p50=percentile([r.throughput for r in done], 50),
+            read_bytes=sum(r.read_bytes or 0 for r in group),
+            write_bytes=sum(r.write_bytes or 0 for r in group),
+        ))
+    return result
+
+
+def to_csv(records, f):
+    writer = csv.writer(f)
+    writer.writerow(RECORD_FIELDS)
+    for r in records:
+        writer.writerow(["" if v is None else v for v in (getattr(r, name) for name in RECORD_FIELDS)])
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(records) -> str:
+    """Текстовый формат Prometheus (для textfile collector node_exporter)."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if value is None:
+                continue
+            text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{text}}} {value}")
+
+    stats = summarize(records)
+    by_key = {}
+    for r in records:
+        by_key.setdefault((r.operation, r.backend), []).append(r)
+
+    def labels(s, **extra):
+        return dict(operation=s.operation, backend=s.backend, **extra)
+
+    metric("wimmanager_job_duration_seconds", "summary", "Время выполнения успешных операций.",
+           [(labels(s, quantile="0.5"), s.wall_p50) for s in stats] +
+           [(labels(s, quantile="0.95"), s.wall_p95) for s in stats])
+    lines += [f'wimmanager_job_duration_seconds_sum{{operation="{_label(s.operation)}",'
+              f'backend="{_label(s.backend)}"}} '
+              f'{sum(r.wall for r in by_key[(s.operation, s.backend)] if r.state == "done"):.3f}'
+              for s in stats]
+    lines += [f'wimmanager_job_duration_seconds_count{{operation="{_label(s.operation)}",'
+              f'backend="{_label(s.backend)}"}} '
+              f'{sum(r.state == "done" for r in by_key[(s.operation, s.backend)])}'
+              for s in stats]
+    metric("wimmanager_job_queue_p95_seconds", "gauge", "Время в очереди, p95.",
+           [(labels(s), s.queue_p95) for s in stats])
+    metric("wimmanager_jobs_total", "counter", "Число операций.",
+           [(labels(s), s.count) for s in stats])
+    metric("wimmanager_jobs_failed_total", "counter", "Операции, завершившиеся не успешно.",
+           [(labels(s), s.failed) for s in stats])
+    metric("wimmanager_job_read_bytes_total", "counter", "Прочитано байт (дисковый ввод-вывод).",
+           [(labels(s), s.read_bytes) for s in stats])
+    metric("wimmanager_job_write_bytes_total", "counter", "Записано байт (дисковый ввод-вывод).",
+           [(labels(s), s.write_bytes) for s in stats])
+    return "\n".join(lines) + "\n"
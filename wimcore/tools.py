@@ -0,0 +1,185 @@
+"""
+Реестр внешних инструментов (DISM, wimlib-imagex).
+
+Пути ищутся один раз и кэшируются до изменения PATH (или явного
+invalidate(), например после установки wimlib). Версии и поддерживаемые
+возможности (--threads, --solid и т.п.) определяются запуском самих
+инструментов в фоновом потоке и доступны как матрица возможностей.
+"""
+import os
+import re
+import subprocess
+import threading
+from dataclasses import dataclass, field
+
+from .backend import find_dism, find_wimlib, is_windows
+
+DISM = "dism"
+WIMLIB = "wimlib"
+TOOLS = (DISM, WIMLIB)
+
+# возможности, которые ищем в справке wimlib-imagex (help capture / export / optimize),
+# и "fuse" – монтирование (mount/mountrw) через FUSE
+WIMLIB_FEATURES = ("--threads", "--solid", "--compress", "--chunk-size",
+                   "--solid-compress", "--solid-chunk-size", "--pipable", "--unsafe-compact", "fuse")
+# возможности DISM, которые ищем в общей справке
+DISM_FEATURES = ("/Export-Image", "/Capture-Image", "/Apply-Image", "/Split-Image",
+                 "/Cleanup-Wim", "/Remount-Image", "/Commit-Image")
+
+PROBE_TIMEOUT_SEC = 15
+
+_WIMLIB_VERSION_RE = re.compile(r"wimlib-imagex\s+(\d+(?:\.\d+)+)")
+_DISM_VERSION_RE = re.compile(r"Version:\s*(\d+(?:\.\d+)+)")
+
+
+@dataclass
+class ToolInfo:
+    name: str
+    path: str = None
+    version: str = None
+    features: set = field(default_factory=set)
+    probed: bool = False        # версия/возможности уже определены
+    error: str = None           # инструмент найден, но не запускается
+
+    @property
+    def available(self) -> bool:
+        return bool(self.path) and self.error is None
+
+    def supports(self, feature: str) -> bool:
+        return feature in self.features
+
+    def describe(self) -> str:
+        if not self.path:
+            return f"{self.name}: не найден"
+        if self.error:
+            return f"{self.name}: ошибка запуска ({self.error})"
+        version = f" {self.version}" if self.version else ""
+        return f"{self.name}{version}: {self.path}"
+
+
+def _run(cmd):
+    flags = subprocess.CREATE_NO_WINDOW if is_windows() else 0  # type: ignore
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            stdin=subprocess.DEVNULL, text=True, errors="replace",
+                            timeout=PROBE_TIMEOUT_SEC, creationflags=flags)
+    return result.stdout
+
+
+def fuse_available() -> bool:
+    """wimlib монтирует образы только через FUSE: в Windows и без /dev/fuse – нет."""
+    return not is_windows() and os.path.exists("/dev/fuse")
+
+
+def probe_wimlib(path) -> ToolInfo:
+    info = ToolInfo(WIMLIB, path=path)
+    try:
+        m = _WIMLIB_VERSION_RE.search(_run([path, "--version"]))
+        info.version = m.group(1) if m else None
+        text = "".join(_run([path, "help", cmd]) for cmd in ("capture", "export", "optimize"))
+    except (OSError, subprocess.SubprocessError) as e:
+        info.error = str(e)
+    else:
+        info.features = {f for f in WIMLIB_FEATURES if f.startswith("--") and f in text}
+        if fuse_available():
+            info.features.add("fuse")
+    info.probed = True
+    return info
+
+
+def probe_dism(path) -> ToolInfo:
+    info = ToolInfo(DISM, path=path)
+    try:
+        text = _run([path, "/English", "/?"])
+    except (OSError, subprocess.SubprocessError) as e:
+        info.error = str(e)
+    else:
+        m = _DISM_VERSION_RE.search(text)
+        info.version = m.group(1) if m else None
+        info.features = {f for f in DISM_FEATURES if f.lower() in text.lower()}
+    info.probed = True
+    return info
+
+
+class ToolRegistry:
+    def __init__(self, on_probed=None):
+        self.on_probed = on_probed      # колбэк(registry) после фоновой проверки версий
+        self._lock = threading.Lock()
+        self._tools = {}
+        self._path_env = None
+        self._generation = 0
+
+    # -------------------------------------------------------- ПОИСК
+
+    def _locate(self):
+        """Находит пути (быстро, без запуска инструментов)."""
+        tools = {
+            DISM: ToolInfo(DISM, path=find_dism()),
+            WIMLIB: ToolInfo(WIMLIB, path=find_wimlib()),
+        }
+        with self._lock:
+            self._tools = tools
+            self._path_env = os.environ.get("PATH", "")
+            self._generation += 1
+            return self._generation
+
+    def _ensure_fresh(self):
+        if self._path_env != os.environ.get("PATH", ""):
+            self._locate()
+
+    def invalidate(self, background=True):
+        """Сбрасывает кэш (например, после установки wimlib) и перепроверяет инструменты."""
+        self._locate()
+        self.start_probe(background=background)
+
+    def start_probe(self, background=True):
+        """Определяет версии и возможности найденных инструментов."""
+        self._ensure_fresh()
+        with self._lock:
+            generation = self._generation
+            pending = [(name, t.path) for name, t in self._tools.items() if t.path and not t.probed]
+
+        def worker():
+            results = {}
+            for name, path in pending:
+                results[name] = probe_wimlib(path) if name == WIMLIB else probe_dism(path)
+            with self._lock:
+                if generation != self._generation:
+                    return      # PATH успел смениться – результат устарел
+                self._tools.update(results)
+            if self.on_probed is not None:
+                self.on_probed(self)
+
+        if background:
+            threading.Thread(target=worker, daemon=True).start()
+        else:
+            worker()
+
+    # -------------------------------------------------------- ДОСТУП
+
+    def get(self, name) -> ToolInfo:
+        self._ensure_fresh()
+        with self._lock:
+            return self._tools[name]
+
+    def path(self, name):
+        info = self.get(name)
+        return info.path if info.available else None
+
+    def tools(self):
+        self._ensure_fresh()
+        with self._lock:
+            return dict(self._tools)
+
+    def capability_matrix(self) -> dict:
+        """{инструмент: {"available", "version", "path", возможность: bool, ...}}"""
+        matrix = {}
+        for name, info in self.tools().items():
+            all_features = WIMLIB_FEATURES if name == WIMLIB else DISM_FEATURES
+            row = {"available": info.available, "version": info.version,
+                   "path": info.path, "probed": info.probed}
+            row.update({f: info.supports(f) for f in all_features})
+            matrix[name] = row
+        return matrix
+
+    def describe(self) -> str:
+        return " / ".join(t.describe() for t in self.tools().values())
@@ -0,0 +1,78 @@
+"""
+Мост «рабочие потоки -> поток Tk».
+
+Вместо root.after(0, ...) из каждого потока (по вызову Tcl на каждое
+событие) обновления кладутся в очередь, а поток Tk раз в
+DRAIN_INTERVAL_MS выполняет их пачкой. Обновления с ключом (прогресс,
+строка задания) схлопываются: до Tk доходит только последнее.
+
+Модуль не импортирует tkinter: schedule() принимает любой объект с
+методом after(ms, fn).
+"""
+import threading
+import traceback
+from collections import OrderedDict
+
+DRAIN_INTERVAL_MS = 50
+MAX_BATCH_CALLS = 2000
+
+
+class UiBridge:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = []                    # [(fn, args)]
+        self._latest = OrderedDict()        # ключ -> (fn, args)
+        self._pollers = []
+        self.errors = 0
+
+    def post(self, fn, *args):
+        """Выполнить fn(*args) в потоке Tk (в порядке поступления)."""
+        with self._lock:
+            self._calls.append((fn, args))
+
+    def post_latest(self, key, fn, *args):
+        """Как post, но из нескольких вызовов с одним ключом выполнится последний."""
+        with self._lock:
+            self._latest.pop(key, None)
+            self._latest[key] = (fn, args)
+
+    def add_poller(self, fn):
+        """fn() вызывается на каждом такте (например, сброс лога)."""
+        self._pollers.append(fn)
+
+    def pending(self) -> bool:
+        with self._lock:
+            return bool(self._calls or self._latest)
+
+    def drain(self, max_calls=MAX_BATCH_CALLS) -> int:
+        """Выполняет накопленные вызовы. Только в потоке Tk."""
+        with self._lock:
+            calls, self._calls = self._calls[:max_calls], self._calls[max_calls:]
+            latest, self._latest = list(self._latest.values()), OrderedDict()
+        for fn in self._pollers:
+            self._call(fn, ())
+        # схлопнутые обновления (прогресс) – раньше разовых событий вроде
+        # «задание завершено», чтобы не затереть итоговое состояние
+        for fn, args in latest:
+            self._call(fn, args)
+        for fn, args in calls:
+            self._call(fn, args)
+        return len(calls) + len(latest)
+
+    def _call(self, fn, args):
+        try:
+            fn(*args)
+        except Exception:
+            # ошибка одного обновления не должна останавливать мост
+            self.errors += 1
+            traceback.print_exc()
+
+    def schedule(self, root, interval_ms=DRAIN_INTERVAL_MS):
+        """Периодический сброс очереди через root.after."""
+        def tick():
+            try:
+                self.drain()
+            finally:
+                root.after(interval_ms, tick)
+
+        root.after(interval_ms, tick)
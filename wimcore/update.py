@@ -0,0 +1,170 @@
+"""
+Обслуживание образа без монтирования: пакет операций add / delete / rename
+записывается в один командный файл и применяется одним вызовом
+`wimlib-imagex update` на каждый индекс.
+
+Цикл mount -> правка -> unmount --commit заменяется одним проходом, в
+котором wimlib дописывает в WIM только новые данные и метаданные.
+"""
+import os
+import tempfile
+from dataclasses import dataclass
+
+ADD = "add"
+DELETE = "delete"
+RENAME = "rename"
+
+
+class UpdateError(ValueError):
+    pass
+
+
+def quote(path: str) -> str:
+    """Экранирование пути для командного файла wimlib (двойные или одинарные кавычки)."""
+    if path and not any(c in path for c in " \t\"'"):
+        return path
+    if '"' not in path:
+        return f'"{path}"'
+    if "'" not in path:
+        return f"'{path}'"
+    raise UpdateError(f"Путь содержит оба вида кавычек: {path}")
+
+
+def image_path(path: str) -> str:
+    """Путь внутри образа: прямые слеши, от корня."""
+    path = path.replace("\\", "/").strip()
+    return "/" + path.lstrip("/")
+
+
+@dataclass
+class UpdateOp:
+    kind: str
+    source: str
+    target: str = ""
+
+    def command(self) -> str:
+        if self.kind == ADD:
+            return f"add {quote(self.source)} {quote(image_path(self.target))}"
+        if self.kind == DELETE:
+            return f"delete --force --recursive {quote(image_path(self.source))}"
+        return f"rename {quote(image_path(self.source))} {quote(image_path(self.target))}"
+
+
+def _tree_size(path):
+    if os.path.isfile(path):
+        return 1, os.path.getsize(path)
+    files = size = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+                files += 1
+            except OSError:
+                pass
+    return files, size
+
+
+class UpdateBatch:
+    def __init__(self):
+        self.ops = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def add(self, source, target):
+        """Добавить файл или папку source (на диске) в образ по пути target."""
+        if not os.path.exists(source):
+            raise UpdateError(f"Не найден источник: {source}")
+        self.ops.append(UpdateOp(ADD, os.path.abspath(source), target))
+
+    def delete(self, path):
+        self.ops.append(UpdateOp(DELETE, path))
+
+    def rename(self, source, target):
+        self.ops.append(UpdateOp(RENAME, source, target))
+
+    def remove(self, position):
+        del self.ops[position]
+
+    def clear(self):
+        self.ops.clear()
+
+    def render(self) -> str:
+        return "".join(op.command() + "\n" for op in self.ops)
+
+    def write_command_file(self, path=None) -> str:
+        """Пишет командный файл и возвращает его путь."""
+        if not self.ops:
+            raise UpdateError("Список операций пуст.")
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="wimupdate-", suffix=".txt")
+            os.close(fd)
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(self.render())
+        return path
+
+    def preview(self, indexes=()) -> str:
+        """Текст «сухого прогона»: что изменится, сколько данных будет добавлено."""
+        lines = []
+        total_files = total_bytes = 0
+        for op in self.ops:
+            if op.kind == ADD:
+                files, size = _tree_size(op.source)
+                total_files += files
+                total_bytes += size
+                lines.append(f"+ {image_path(op.target)}  <-  {op.source} "
+                             f"({files} файл(ов), {size:,} байт)")
+            elif op.kind == DELETE:
+                lines.append(f"- {image_path(op.source)}")
+            else:
+                lines.append(f"~ {image_path(op.source)}  ->  {image_path(op.target)}")
+        if indexes:
+            lines.append(f"Индексы: {', '.join(str(i) for i in indexes)}")
+        lines.append(f"Итого: {len(self.ops)} операций, будет добавлено {total_files} файл(ов), "
+                     f"{total_bytes:,} байт")
+        return "\n".join(lines)
+
+
+def parse_indexes(text: str, available=()):
+    """
+    "1", "1,3", "2-4", "*" (все индексы из available) -> отсортированный список.
+    """
+    text = text.strip()
+    if text in ("*", "all"):
+        if not available:
+            raise UpdateError("Список индексов WIM неизвестен – укажите индексы явно.")
+        return sorted(available)
+
+    result = set()
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                lo, hi = (int(x) for x in part.split("-", 1))
+                result.update(range(lo, hi + 1))
+            else:
+                result.add(int(part))
+        except ValueError:
+            raise UpdateError(f"Некорректный индекс: {part}")
+    if not result or min(result) < 1:
+        raise UpdateError("Индексы должны быть положительными числами.")
+    missing = result - set(available) if available else set()
+    if missing:
+        raise UpdateError(f"В WIM нет индексов: {', '.join(map(str, sorted(missing)))}")
+    return sorted(result)
+
+
+def update_cmd(wim, index, threads=None, rebuild=False, check=False):
+    """
+    Команда `wimlib-imagex update`; командный файл подаётся на stdin
+    (Job(..., stdin_path=...)).
+    """
+    cmd = ["wimlib-imagex", "update", wim, str(index)]
+    if threads:
+        cmd.append(f"--threads={int(threads)}")
+    if rebuild:
+        cmd.append("--rebuild")
+    if check:
+        cmd.append("--check")
+    return cmd
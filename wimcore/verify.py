@@ -0,0 +1,368 @@
+"""
+Параллельная проверка целостности WIM.
+
+Таблица блобов читается через mmap, после чего на пуле процессов
+пересчитываются:
+- SHA-1 кусков таблицы целостности (если она есть в WIM);
+- SHA-1 несжатых блобов (сжатые требуют распаковки и пропускаются –
+  их покрывает таблица целостности; без неё такой WIM считается
+  непроверенным, а не целым).
+
+Работа делится на пакеты примерно по BATCH_BYTES; выполненные пакеты
+запоминаются, так что прерванную проверку можно продолжить.
+
+У разделённого WIM (.swm) каждая часть хранит свои блобы и свою таблицу
+целостности, поэтому пакеты всех частей набора ставятся в один пул и
+хешируются одновременно, а не часть за частью.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+
+from .settings import app_data_dir
+from .wiminfo import (
+    RES_FLAG_COMPRESSED, RES_FLAG_SOLID, WIM_HEADER_SIZE, WimParseError, parse_header, parse_reshdr,
+    read_split_set,
+)
+
+BLOB_ENTRY_SIZE = 50
+BATCH_BYTES = 64 * 1024 * 1024
+HASH_BLOCK = 1024 * 1024
+STATE_DIR = "verify"
+
+INTEGRITY = "integrity"
+BLOB = "blob"
+
+
+@dataclass
+class BlobTable:
+    """Таблица блобов в компактном виде: параллельные списки + SHA-1 одной строкой байт."""
+    offsets: list
+    sizes: list
+    original_sizes: list
+    flags: list
+    parts: list
+    refcounts: list
+    hashes: bytes       # 20 * count
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def sha1(self, i) -> bytes:
+        return self.hashes[i * 20:(i + 1) * 20]
+
+
+@dataclass
+class VerifyReport:
+    path: str
+    bytes_total: int = 0
+    bytes_verified: int = 0
+    blobs_checked: int = 0
+    blobs_skipped: int = 0          # сжатые/solid – только через таблицу целостности
+    integrity_chunks: int = 0
+    has_integrity: bool = False
+    corrupt: list = field(default_factory=list)   # [(тип, номер, смещение)]
+    elapsed: float = 0.0
+    resumed_batches: int = 0
+    cancelled: bool = False
+    part_number: int = 1
+    parts: list = field(default_factory=list)     # отчёты по частям разделённого WIM
+    incomplete: str = ""                          # чего не хватает в наборе частей
+
+    @property
+    def unverified(self) -> bool:
+        """Сжатые блобы пропущены, а таблицы целостности, которая их покрывает, нет."""
+        if self.parts:
+            return any(part.unverified for part in self.parts)
+        return self.blobs_skipped > 0 and not self.has_integrity
+
+    @property
+    def ok(self) -> bool:
+        return (not self.corrupt and not self.cancelled and not self.incomplete
+                and not self.unverified and all(part.ok for part in self.parts))
+
+    @property
+    def first_corrupt_offset(self):
+        return min(c[2] for c in self.corrupt) if self.corrupt else None
+
+    @property
+    def throughput(self) -> float:
+        """МБ/с."""
+        return self.bytes_verified / (1 << 20) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def describe(self) -> str:
+        if self.parts:
+            return self._describe_split()
+        lines = [
+            f"Проверено: {self.bytes_verified:,} из {self.bytes_total:,} байт "
+            f"за {self.elapsed:.2f} с ({self.throughput:.1f} МБ/с)",
+            f"Таблица целостности: {'есть, кусков ' + str(self.integrity_chunks) if self.has_integrity else 'нет'}",
+            f"Блобов проверено: {self.blobs_checked}, пропущено (сжатые): {self.blobs_skipped}",
+        ]
+        if self.resumed_batches:
+            lines.append(f"Продолжено с сохранённого места: пакетов пропущено {self.resumed_batches}")
+        if self.cancelled:
+            lines.append("Проверка прервана – её можно продолжить.")
+        if self.corrupt:
+            lines.append(f"ОБНАРУЖЕНЫ ПОВРЕЖДЕНИЯ: {len(self.corrupt)}, "
+                         f"первое смещение {self.first_corrupt_offset:#x}")
+        elif self.unverified and not self.cancelled:
+            lines.append(f"ЦЕЛОСТНОСТЬ НЕ ПОДТВЕРЖДЕНА: {self.blobs_skipped} сжатых блобов не проверено, "
+                         f"а таблицы целостности нет (проверьте через wimlib-imagex verify или "
+                         f"пересоберите WIM с --check).")
+        elif not self.cancelled:
+            lines.append("Повреждений не найдено.")
+        return "\n".join(lines)
+
+    def _describe_split(self) -> str:
+        lines = [f"Разделённый WIM: проверено частей {len(self.parts)}, {self.bytes_verified:,} из "
+                 f"{self.bytes_total:,} байт за {self.elapsed:.2f} с ({self.throughput:.1f} МБ/с)"]
+        if self.incomplete:
+            lines.append(f"НАБОР ЧАСТЕЙ НЕПОЛНЫЙ: {self.incomplete}")
+        for part in self.parts:
+            lines.append("")
+            lines.append(f"Часть {part.part_number}: {part.path}")
+            lines.append(part.describe())
+        return "\n".join(lines)
+
+
+def read_blob_table(mm, header) -> BlobTable:
+    res = header.offset_table
+    if res.is_compressed:
+        raise WimParseError("Сжатая таблица блобов не поддерживается.")
+    end = res.offset + res.size
+    if end > len(mm):
+        raise WimParseError("Таблица блобов выходит за пределы файла.")
+    count = res.size // BLOB_ENTRY_SIZE
+    offsets, sizes, original_sizes, flags, parts, refcounts = [], [], [], [], [], []
+    hashes = bytearray()
+    for pos in range(res.offset, res.offset + count * BLOB_ENTRY_SIZE, BLOB_ENTRY_SIZE):
+        r = parse_reshdr(mm, pos)
+        part, refcount = struct.unpack_from("<HI", mm, pos + 24)
+        offsets.append(r.offset)
+        sizes.append(r.size)
+        original_sizes.append(r.original_size)
+        flags.append(r.flags)
+        parts.append(part)
+        refcounts.append(refcount)
+        hashes += mm[pos + 30:pos + 50]
+    return BlobTable(offsets, sizes, original_sizes, flags, parts, refcounts, bytes(hashes))
+
+
+def _integrity_items(mm, header):
+    res = header.integrity
+    if res.is_empty or res.size < 12:
+        return []
+    _, count, chunk_size = struct.unpack_from("<III", mm, res.offset)
+    start = WIM_HEADER_SIZE
+    end = header.offset_table.offset + header.offset_table.size
+    items = []
+    for i in range(count):
+        offset = start + i * chunk_size
+        size = min(chunk_size, end - offset)
+        if size <= 0:
+            break
+        expected = bytes(mm[res.offset + 12 + i * 20:res.offset + 32 + i * 20])
+        items.append((INTEGRITY, i, offset, size, expected))
+    return items
+
+
+def _blob_items(table: BlobTable, part_number, file_size):
+    items, skipped = [], 0
+    for i in range(len(table)):
+        if table.parts[i] != part_number:
+            continue
+        flags = table.flags[i]
+        size = table.sizes[i]
+        if flags & (RES_FLAG_COMPRESSED | RES_FLAG_SOLID) or size != table.original_sizes[i]:
+            skipped += 1
+            continue
+        if size == 0 or table.offsets[i] + size > file_size:
+            continue
+        items.append((BLOB, i, table.offsets[i], size, table.sha1(i)))
+    return items, skipped
+
+
+def plan(path):
+    """
+    Разбивает проверку на пакеты. Возвращает (header, batches, skipped, has_integrity),
+    где batches – список списков элементов (тип, номер, смещение, размер, sha1).
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header = parse_header(mm[:WIM_HEADER_SIZE])
+        integrity = _integrity_items(mm, header)
+        table = read_blob_table(mm, header)
+        blobs, skipped = _blob_items(table, header.part_number, len(mm))
+
+    batches, current, current_bytes = [], [], 0
+    for item in integrity + blobs:
+        current.append(item)
+        current_bytes += item[3]
+        if current_bytes >= BATCH_BYTES:
+            batches.append(current)
+            current, current_bytes = [], 0
+    if current:
+        batches.append(current)
+    return header, batches, skipped, bool(integrity)
+
+
+def verify_batch(path, batch_id, items):
+    """Выполняется в процессе пула: SHA-1 каждого элемента пакета."""
+    bad = []
+    done = 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)   # срезы без копирования
+        try:
+            for kind, number, offset, size, expected in items:
+                h = hashlib.sha1()
+                pos, end = offset, offset + size
+                while pos < end:
+                    step = min(HASH_BLOCK, end - pos)
+                    h.update(view[pos:pos + step])
+                    pos += step
+                if h.digest() != expected:
+                    bad.append((kind, number, offset))
+                done += size
+        finally:
+            view.release()
+    return batch_id, done, bad
+
+
+# -------------------------------------------------------- СОСТОЯНИЕ ДЛЯ ПРОДОЛЖЕНИЯ
+
+def _state_file(path, header):
+    directory = os.path.join(app_data_dir(), STATE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{header.guid}-{header.part_number}.json")
+
+
+def _state_key(path):
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns, BATCH_BYTES]
+
+
+def _load_state(path, header):
+    try:
+        with open(_state_file(path, header), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return set(), []
+    if state.get("key") != _state_key(path):
+        return set(), []
+    return set(state.get("done", [])), [tuple(c) for c in state.get("corrupt", [])]
+
+
+def _save_state(path, header, done, corrupt):
+    state = {"key": _state_key(path), "done": sorted(done), "corrupt": corrupt}
+    try:
+        with open(_state_file(path, header), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+    except OSError:
+        pass
+
+
+def _clear_state(path, header):
+    try:
+        os.remove(_state_file(path, header))
+    except OSError:
+        pass
+
+
+# -------------------------------------------------------- ЗАПУСК
+
+def _prepare(path, resume):
+    """План и сохранённое состояние одного файла: (header, batches, report, done, todo)."""
+    header, batches, skipped, has_integrity = plan(path)
+    report = VerifyReport(path=path, blobs_skipped=skipped, has_integrity=has_integrity,
+                          part_number=header.part_number)
+    report.bytes_total = sum(item[3] for batch in batches for item in batch)
+    report.integrity_chunks = sum(1 for b in batches for item in b if item[0] == INTEGRITY)
+    report.blobs_checked = sum(1 for b in batches for item in b if item[0] == BLOB)
+
+    done, corrupt = _load_state(path, header) if resume else (set(), [])
+    report.resumed_batches = len(done)
+    report.corrupt = list(corrupt)
+    todo = [i for i in range(len(batches)) if i not in done]
+    return header, batches, report, done, todo
+
+
+def verify_wim(path, workers=None, on_progress=None, cancel_event=None, resume=True):
+    """
+    Проверяет WIM на пуле из workers процессов (по умолчанию – все ядра).
+    Для части .swm проверяется весь набор частей с тем же GUID, все части
+    сразу. on_progress(bytes_done, bytes_total) вызывается в вызывающем потоке.
+    Возвращает VerifyReport (у набора частей – с отчётами по частям в parts);
+    при отмене report.cancelled = True, а выполненные пакеты сохраняются
+    для продолжения.
+    """
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+    started = time.perf_counter()
+    split = read_split_set(path)
+    paths = split.paths() if split is not None else [path]
+    targets = [_prepare(p, resume) for p in paths]
+    reports = [t[2] for t in targets]
+
+    bytes_total = sum(r.bytes_total for r in reports)
+    done_bytes = sum(item[3] for _, batches, _, done, _ in targets for i in done for item in batches[i])
+    todo_count = sum(len(t[4]) for t in targets)
+    cancelled = False
+
+    workers = max(1, min(workers or os.cpu_count() or 1, todo_count or 1))
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # пакеты частей чередуются, чтобы все файлы набора читались одновременно
+        queue = []
+        for round_ in range(max((len(t[4]) for t in targets), default=0)):
+            for n, (_, batches, _, _, todo) in enumerate(targets):
+                if round_ < len(todo):
+                    queue.append((n, todo[round_]))
+        pending = {executor.submit(verify_batch, paths[n], i, targets[n][1][i]): n for n, i in queue}
+        while pending:
+            finished, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in finished:
+                n = pending.pop(future)
+                batch_id, size, bad = future.result()
+                targets[n][3].add(batch_id)
+                reports[n].corrupt.extend(bad)
+                reports[n].bytes_verified += size
+                done_bytes += size
+            if finished and on_progress is not None:
+                on_progress(done_bytes, bytes_total)
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                break
+    except KeyboardInterrupt:
+        cancelled = True
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    for (header, _, report, done, _), part_path in zip(targets, paths):
+        report.elapsed = elapsed
+        report.cancelled = cancelled
+        if cancelled:
+            _save_state(part_path, header, done, report.corrupt)
+        else:
+            _clear_state(part_path, header)
+
+    if split is None:
+        return reports[0]
+    return VerifyReport(
+        path=path,
+        bytes_total=bytes_total,
+        bytes_verified=sum(r.bytes_verified for r in reports),
+        blobs_checked=sum(r.blobs_checked for r in reports),
+        blobs_skipped=sum(r.blobs_skipped for r in reports),
+        integrity_chunks=sum(r.integrity_chunks for r in reports),
+        has_integrity=all(r.has_integrity for r in reports),
+        elapsed=elapsed,
+        resumed_batches=sum(r.resumed_batches for r in reports),
+        cancelled=cancelled,
+        parts=reports,
+        incomplete="" if split.complete else split.describe(),
+    )
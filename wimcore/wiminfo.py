@@ -0,0 +1,488 @@
+"""
+Быстрое чтение заголовка WIM и XML-метаданных без запуска DISM/wimlib.
+
+Читаются только 208 байт заголовка и XML-ресурс (через mmap), поэтому
+список индексов даже для многогигабайтного install.wim получается за
+миллисекунды.
+"""
+import mmap
+import os
+import re
+import struct
+import uuid
+from dataclasses import asdict, dataclass, field
+
+WIM_MAGIC = b"MSWIM\x00\x00\x00"
+WIM_PIPABLE_MAGIC = b"WLPWM\x00\x00\x00"
+WIM_HEADER_SIZE = 208
+SPLIT_EXTENSION = ".swm"
+
+# флаги заголовка
+HDR_FLAG_COMPRESSION = 0x00000002
+HDR_FLAG_READONLY = 0x00000004
+HDR_FLAG_SPANNED = 0x00000008
+HDR_FLAG_WRITE_IN_PROGRESS = 0x00000040
+HDR_FLAG_COMPRESS_XPRESS = 0x00020000
+HDR_FLAG_COMPRESS_LZX = 0x00040000
+HDR_FLAG_COMPRESS_LZMS = 0x00080000
+HDR_FLAG_COMPRESS_XPRESS2 = 0x00200000
+
+# флаги ресурса
+RES_FLAG_FREE = 0x01
+RES_FLAG_METADATA = 0x02
+RES_FLAG_COMPRESSED = 0x04
+RES_FLAG_SPANNED = 0x08
+RES_FLAG_SOLID = 0x10
+
+# magic(8) cbSize dwVersion dwFlags chunkSize guid(16) part total imageCount
+_HEADER_STRUCT = struct.Struct("<8sIIII16sHHI")
+_RESHDR_STRUCT = struct.Struct("<QQQ")
+RESHDR_SIZE = _RESHDR_STRUCT.size
+
+_OFFSET_TABLE_POS = 48
+_XML_POS = 72
+_BOOT_METADATA_POS = 96
+_BOOT_INDEX_POS = 120
+_INTEGRITY_POS = 124
+
+_ARCH_NAMES = {"0": "x86", "5": "arm", "6": "ia64", "9": "x64", "12": "arm64"}
+
+
+class WimParseError(Exception):
+    """Файл не является WIM или его заголовок/XML повреждены."""
+
+
+@dataclass
+class ResourceHeader:
+    size: int           # размер ресурса в файле (56 бит)
+    flags: int
+    offset: int
+    original_size: int  # размер после распаковки
+
+    @property
+    def is_compressed(self) -> bool:
+        return bool(self.flags & RES_FLAG_COMPRESSED)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.size == 0 and self.offset == 0
+
+
+@dataclass
+class WimHeader:
+    magic: bytes
+    header_size: int
+    version: int
+    flags: int
+    chunk_size: int
+    guid: str
+    part_number: int
+    total_parts: int
+    image_count: int
+    offset_table: ResourceHeader
+    xml_data: ResourceHeader
+    boot_metadata: ResourceHeader
+    boot_index: int
+    integrity: ResourceHeader
+
+    @property
+    def compression(self) -> str:
+        return compression_name(self.flags)
+
+    @property
+    def is_pipable(self) -> bool:
+        return self.magic == WIM_PIPABLE_MAGIC
+
+    @property
+    def is_split(self) -> bool:
+        return self.total_parts > 1
+
+
+@dataclass
+class WimImageInfo:
+    index: int
+    name: str = ""
+    description: str = ""
+    display_name: str = ""
+    edition: str = ""
+    product_name: str = ""
+    installation_type: str = ""
+    arch: str = ""
+    languages: list = field(default_factory=list)
+    version: str = ""
+    build: str = ""
+    dir_count: int = 0
+    file_count: int = 0
+    total_bytes: int = 0
+
+
+@dataclass
+class WimInfo:
+    path: str
+    header: WimHeader
+    images: list
+    total_bytes: int = 0
+
+    @property
+    def compression(self) -> str:
+        return self.header.compression
+
+    @property
+    def part_number(self) -> int:
+        return self.header.part_number
+
+    @property
+    def total_parts(self) -> int:
+        return self.header.total_parts
+
+    @property
+    def guid(self) -> str:
+        return self.header.guid
+
+
+@dataclass
+class SplitSet:
+    """Части одного разделённого WIM (.swm): общий GUID, номер части, всего частей."""
+    guid: str
+    total_parts: int
+    parts: dict = field(default_factory=dict)       # номер части -> путь
+    duplicates: list = field(default_factory=list)  # второй файл с тем же номером части
+    invalid: list = field(default_factory=list)     # [(путь, причина)]: номер вне 1..total и т.п.
+
+    @property
+    def missing(self) -> list:
+        return [n for n in range(1, self.total_parts + 1) if n not in self.parts]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing and not self.duplicates and not self.invalid
+
+    @property
+    def first(self):
+        """Путь первой части – его передают DISM/wimlib вместе с шаблоном остальных."""
+        return self.parts.get(1)
+
+    def paths(self) -> list:
+        return [self.parts[n] for n in sorted(self.parts)]
+
+    def describe(self) -> str:
+        text = f"Разделённый WIM {self.guid}: частей {len(self.parts)} из {self.total_parts}"
+        if self.missing:
+            text += f", нет частей: {', '.join(map(str, self.missing))}"
+        for path in self.duplicates:
+            text += f"\nПовтор части: {path}"
+        for path, reason in self.invalid:
+            text += f"\n{path}: {reason}"
+        return text
+
+
+def compression_name(flags: int) -> str:
+    if not flags & HDR_FLAG_COMPRESSION:
+        return "None"
+    if flags & HDR_FLAG_COMPRESS_LZMS:
+        return "LZMS"
+    if flags & HDR_FLAG_COMPRESS_LZX:
+        return "LZX"
+    if flags & (HDR_FLAG_COMPRESS_XPRESS | HDR_FLAG_COMPRESS_XPRESS2):
+        return "XPRESS"
+    return "Unknown"
+
+
+def parse_reshdr(buf, pos: int = 0) -> ResourceHeader:
+    size_flags, offset, original_size = _RESHDR_STRUCT.unpack_from(buf, pos)
+    return ResourceHeader(
+        size=size_flags & 0x00FFFFFFFFFFFFFF,
+        flags=size_flags >> 56,
+        offset=offset,
+        original_size=original_size,
+    )
+
+
+def parse_header(buf) -> WimHeader:
+    if len(buf) < WIM_HEADER_SIZE:
+        raise WimParseError("Файл слишком мал для WIM-заголовка.")
+
+    magic, cb_size, version, flags, chunk_size, guid, part, total, count = \
+        _HEADER_STRUCT.unpack_from(buf, 0)
+    if magic not in (WIM_MAGIC, WIM_PIPABLE_MAGIC):
+        raise WimParseError("Неверная сигнатура WIM.")
+    if cb_size < WIM_HEADER_SIZE:
+        raise WimParseError(f"Неверный размер заголовка: {cb_size}")
+
+    return WimHeader(
+        magic=magic,
+        header_size=cb_size,
+        version=version,
+        flags=flags,
+        chunk_size=chunk_size,
+        guid=str(uuid.UUID(bytes_le=guid)),
+        part_number=part,
+        total_parts=total,
+        image_count=count,
+        offset_table=parse_reshdr(buf, _OFFSET_TABLE_POS),
+        xml_data=parse_reshdr(buf, _XML_POS),
+        boot_metadata=parse_reshdr(buf, _BOOT_METADATA_POS),
+        boot_index=struct.unpack_from("<I", buf, _BOOT_INDEX_POS)[0],
+        integrity=parse_reshdr(buf, _INTEGRITY_POS),
+    )
+
+
+def read_header(path: str) -> WimHeader:
+    with open(path, "rb") as f:
+        return parse_header(f.read(WIM_HEADER_SIZE))
+
+
+def split_part_stem(path: str, part_number: int) -> str:
+    """
+    Общее начало имён частей: install.swm, install2.swm, ... -> ".../install".
+    Так части называют и DISM /Split-Image, и wimlib-imagex split.
+    """
+    root, _ = os.path.splitext(path)
+    suffix = str(part_number)
+    if part_number > 1 and root.endswith(suffix):
+        root = root[:-len(suffix)]
+    return root
+
+
+def split_part_path(first: str, part_number: int) -> str:
+    """Имя части part_number по имени первой части."""
+    if part_number == 1:
+        return first
+    root, ext = os.path.splitext(first)
+    return f"{root}{part_number}{ext or SPLIT_EXTENSION}"
+
+
+def split_ref_pattern(first: str) -> str:
+    """Шаблон всех частей для /SWMFile (DISM) и --ref (wimlib): install*.swm."""
+    root, ext = os.path.splitext(first)
+    return f"{root}*{ext or SPLIT_EXTENSION}"
+
+
+def group_split_parts(paths) -> dict:
+    """
+    Читает только заголовки (208 байт) файлов и группирует части
+    разделённых WIM по GUID. Возвращает {guid: SplitSet}; обычные
+    (неразделённые) и нечитаемые файлы пропускаются.
+    """
+    sets = {}
+    for path in paths:
+        try:
+            header = read_header(path)
+        except (OSError, WimParseError):
+            continue
+        if not header.is_split:
+            continue
+        split = sets.setdefault(header.guid, SplitSet(header.guid, header.total_parts))
+        if header.total_parts != split.total_parts:
+            split.invalid.append((path, f"всего частей {header.total_parts}, а не {split.total_parts}"))
+        elif not 1 <= header.part_number <= header.total_parts:
+            split.invalid.append((path, f"номер части {header.part_number} вне 1..{header.total_parts}"))
+        elif header.part_number in split.parts:
+            split.duplicates.append(path)
+        else:
+            split.parts[header.part_number] = path
+    return sets
+
+
+def read_split_set(path: str):
+    """
+    Набор частей, к которому относится path (любая часть). Соседние файлы
+    ищутся по имени (install.swm, install2.swm, ...), принадлежность
+    проверяется по GUID из заголовка. None, если файл не разделённый WIM.
+    """
+    try:
+        header = read_header(path)
+    except OSError as e:
+        raise WimParseError(str(e)) from e
+    if not header.is_split:
+        return None
+
+    stem = split_part_stem(path, header.part_number)
+    directory = os.path.dirname(stem) or "."
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r"\d*" + re.escape(SPLIT_EXTENSION), re.IGNORECASE)
+    try:
+        names = [n for n in os.listdir(directory) if pattern.fullmatch(n)]
+    except OSError:
+        names = []
+    candidates = {os.path.join(directory, n) for n in names} | {os.path.join(directory, os.path.basename(path))}
+    return group_split_parts(sorted(candidates)).get(header.guid)
+
+
+def split_source(path: str):
+    """
+    Что передать DISM/wimlib вместо path: (первая часть, шаблон частей) для
+    части .swm и (path, None) для обычного WIM или нечитаемого файла (его
+    разберёт сам инструмент). WimParseError – если набор частей неполный.
+    """
+    try:
+        split = read_split_set(path)
+    except WimParseError:
+        return path, None
+    if split is None:
+        return path, None
+    if not split.complete:
+        raise WimParseError(split.describe())
+    return split.first, split_ref_pattern(split.first)
+
+
+def _text(elem, tag: str) -> str:
+    if elem is None:
+        return ""
+    child = elem.find(tag)
+    if child is None or child.text is None:
+        return ""
+    return child.text.strip()
+
+
+def _int(elem, tag: str) -> int:
+    try:
+        return int(_text(elem, tag) or 0)
+    except ValueError:
+        return 0
+
+
+def decode_xml(data: bytes) -> str:
+    # XML в WIM всегда в UTF-16LE, обычно с BOM
+    if data[:2] == b"\xff\xfe":
+        data = data[2:]
+    return data.decode("utf-16-le", errors="replace").rstrip("\x00")
+
+
+def parse_xml(text: str):
+    """
+    Разбирает XML-ресурс WIM. Возвращает (total_bytes, [WimImageInfo, ...]).
+    """
+    import xml.etree.ElementTree as ET
+
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError as e:
+        raise WimParseError(f"Повреждённый XML WIM: {e}") from e
+
+    images = []
+    for img in root.findall("IMAGE"):
+        try:
+            index = int(img.get("INDEX", "0"))
+        except ValueError:
+            index = 0
+
+        windows = img.find("WINDOWS")
+        version = windows.find("VERSION") if windows is not None else None
+        langs = windows.find("LANGUAGES") if windows is not None else None
+
+        build = _text(version, "BUILD")
+        spbuild = _text(version, "SPBUILD")
+        version_str = ""
+        if version is not None:
+            version_str = ".".join(
+                p for p in (_text(version, "MAJOR"), _text(version, "MINOR"), build, spbuild) if p
+            )
+
+        arch = _text(windows, "ARCH")
+        images.append(WimImageInfo(
+            index=index,
+            name=_text(img, "NAME"),
+            description=_text(img, "DESCRIPTION"),
+            display_name=_text(img, "DISPLAYNAME"),
+            edition=_text(windows, "EDITIONID") or _text(img, "FLAGS"),
+            product_name=_text(windows, "PRODUCTNAME"),
+            installation_type=_text(windows, "INSTALLATIONTYPE"),
+            arch=_ARCH_NAMES.get(arch, arch),
+            languages=[e.text.strip() for e in langs.findall("LANGUAGE") if e.text] if langs is not None else [],
+            version=version_str,
+            build=build,
+            dir_count=_int(img, "DIRCOUNT"),
+            file_count=_int(img, "FILECOUNT"),
+            total_bytes=_int(img, "TOTALBYTES"),
+        ))
+
+    images.sort(key=lambda i: i.index)
+    return _int(root, "TOTALBYTES"), images
+
+
+def read_wim_info(path: str) -> WimInfo:
+    """
+    Читает заголовок и XML-метаданные WIM через mmap.
+    Бросает WimParseError, если файл разобрать не удалось.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError as e:
+        raise WimParseError(str(e)) from e
+
+    with f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size < WIM_HEADER_SIZE:
+            raise WimParseError("Файл слишком мал для WIM-заголовка.")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header = parse_header(mm[:WIM_HEADER_SIZE])
+            if header.is_pipable:
+                # в pipable WIM XML лежит в конце и дублируется в потоке
+                raise WimParseError("Pipable WIM не поддерживается встроенным парсером.")
+
+            xml_res = header.xml_data
+            if xml_res.is_empty or xml_res.size == 0:
+                raise WimParseError("В WIM нет XML-метаданных.")
+            if xml_res.is_compressed:
+                raise WimParseError("Сжатый XML-ресурс не поддерживается.")
+            end = xml_res.offset + xml_res.size
+            if xml_res.offset < header.header_size or end > file_size:
+                raise WimParseError("XML-ресурс выходит за пределы файла.")
+
+            total_bytes, images = parse_xml(decode_xml(mm[xml_res.offset:end]))
+
+    return WimInfo(path=path, header=header, images=images, total_bytes=total_bytes)
+
+
+def format_wim_info(info: WimInfo) -> str:
+    """Текстовое представление для лога, в духе вывода dism /Get-WimInfo."""
+    lines = [
+        f"GUID: {info.guid}",
+        f"Сжатие: {info.compression}, часть {info.part_number}/{info.total_parts}, "
+        f"образов: {info.header.image_count}",
+    ]
+    if info.header.is_split:
+        try:
+            split = read_split_set(info.path)
+        except WimParseError:
+            split = None
+        if split is not None:
+            lines.append(split.describe())
+    for img in info.images:
+        lines.append("")
+        lines.append(f"Index : {img.index}")
+        lines.append(f"Name : {img.name}")
+        if img.description:
+            lines.append(f"Description : {img.description}")
+        if img.edition:
+            lines.append(f"Edition : {img.edition}")
+        if img.arch:
+            lines.append(f"Architecture : {img.arch}")
+        if img.version:
+            lines.append(f"Version : {img.version}")
+        if img.languages:
+            lines.append(f"Languages : {', '.join(img.languages)}")
+        lines.append(f"Files / Dirs : {img.file_count} / {img.dir_count}")
+        lines.append(f"Size : {img.total_bytes:,} bytes")
+    return "\n".join(lines)
+
+
+def wim_info_to_dict(info: WimInfo) -> dict:
+    """Сериализация WimInfo в JSON-совместимый словарь (для кэша)."""
+    data = asdict(info)
+    data["header"]["magic"] = info.header.magic.decode("latin-1")
+    return data
+
+
+def wim_info_from_dict(data: dict) -> WimInfo:
+    h = dict(data["header"])
+    h["magic"] = h["magic"].encode("latin-1")
+    for name in ("offset_table", "xml_data", "boot_metadata", "integrity"):
+        h[name] = ResourceHeader(**h[name])
+    return WimInfo(
+        path=data["path"],
+        header=WimHeader(**h),
+        images=[WimImageInfo(**img) for img in data["images"]],
+        total_bytes=data.get("total_bytes", 0),
+    )